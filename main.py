@@ -1,92 +1,275 @@
+import json
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 import pandas as pd
 
-from recap.recap_page import (load_multiple_recaps, get_header_from_url,)
+from recap.recap_page import get_header_from_url
+from recap.crawl import DEFAULT_WORKERS, iter_round_recaps
+from recap.category import category_urls_from_rows, concat_category_frames
+from recap.chunked import DEFAULT_CHUNK_ROWS, ChunkedCsvWriter, compact_recap, concat_compact, iter_csv_chunks
 
 from recap.UMEA_api import (
     SEASON_GUID_DICT,
-    collect_scores_and_round_guids,
+    collect_scores_rows,
 )
 
-# -------------------------------------------------------------------
-# Config
-# -------------------------------------------------------------------
+from recap.metadata import MetadataIndex
+from recap.validate import flag_invalid_rows
+from recap.rating import RatingEngine
+from recap.normalize import NormalizedTables, long_from_recaps
+from recap.headtohead import HeadToHeadIndex
+from recap.revalidate import VALIDATOR_CACHE
+from recap.throttle import CONCURRENCY
+from recap.diff import RECAPS_KEY, SCORES_KEY, DatasetDiff, add_row_hash, diff_files, keep_previous
 
-BASE_RECAP_URL = "https://recaps.competitionsuite.com"
-SCORES_CSV_PATH = Path("umea_marching_band_scores_all_seasons.csv")
-ROUND_GUIDS_CSV_PATH = Path("umea_recap_guids.csv")
-ALL_RECAPS_CSV_PATH = Path("umea_all_recaps.csv")
+from recap.config import (
+    BASE_RECAP_URL,
+    SCORES_CSV_PATH,
+    ROUND_GUIDS_CSV_PATH,
+    ALL_RECAPS_CSV_PATH,
+    CATEGORY_RECAPS_CSV_PATH,
+    RATINGS_STATE_PATH,
+    NORMALIZED_CSV_PATH,
+    HEAD_TO_HEAD_PATH,
+    SCORE_CHANGES_PATH,
+    HTTP_CACHE_PATH,
+    RUN_METRICS_PATH,
+)
 
 
 def build_recap_url(round_guids: List[str]) -> List[str]:
     """Turn a round GUID into a full recap URL."""
     return [f"{BASE_RECAP_URL}/{guid}.htm" for guid in round_guids]
 
-def build_all_recaps_with_metadata(
-        recap_urls: List[str], 
-        scores_csv_path: Path,
-  ) -> pd.DataFrame:
+def iter_recap_tables(
+        recap_urls: List[str],
+        metadata: MetadataIndex,
+        category_urls: Optional[Dict[str, str]] = None,
+        workers: int = DEFAULT_WORKERS,
+) -> Iterator[Tuple[pd.DataFrame, Optional[pd.DataFrame]]]:
     """
-    1) Load all recap tables (detail rows) from recap URLs.
-    2) Load high-level scores/metadata from the UMEA_api CSV.
-    3) Join on round_guid, adding season / competition / division metadata
+    Stream (full recap, category recap or None) per round from one crawl
+    pass. The full recap is coerced to compact dtypes as soon as it is
+    parsed, and both get season / competition / division metadata attached
+    before they are yielded.
     """
-    # 1) Detail scores from recap pages
     header_cols = get_header_from_url(recap_urls[0])
-    recap_df = load_multiple_recaps(recap_urls, header_cols=header_cols)
-  
-    # 2) High-Level scores and metadata from API
-    scores_df = pd.read_csv(scores_csv_path)
+    for rnd in iter_round_recaps(recap_urls, header_cols, category_urls=category_urls, workers=workers):
+        categories = rnd.categories
+        if categories is not None and not categories.empty:
+            categories = metadata.attach(categories)
+        else:
+            categories = None
+        yield metadata.attach(compact_recap(rnd.full)), categories
+
 
+def build_recap_tables(
+        recap_urls: List[str],
+        scores_csv_path: Path,
+        metadata: Optional[MetadataIndex] = None,
+        category_urls: Optional[Dict[str, str]] = None,
+        workers: int = DEFAULT_WORKERS,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    1) Build a round_guid -> metadata index (from the crawl rows if given,
+       otherwise from a column-selective read of the UMEA_api CSV).
+    2) Stream full recap tables (detail rows) and, for rounds in
+       `category_urls`, category recap tables, in one crawl pass.
+    3) Attach season / competition / division metadata to each table as it
+       is loaded, so there is no full-frame merge at the end.
+    Returns (full recaps, category recaps) in memory; fetch_recaps streams
+    the same tables to disk in chunks instead.
+    """
+    # 1) Metadata index
+    if metadata is None:
+        metadata = MetadataIndex.from_csv(scores_csv_path)
 
-    meta_cols = [
-        'round_guid',
-        'season_name',
-        'competition_name',
-        'competition_date',
-        'competition_location',
-        'division_name',
-    ]
+    # 2) + 3) Both recap kinds from one pass, enriched one round at a time
+    full_list, category_list = [], []
+    for full, categories in iter_recap_tables(recap_urls, metadata, category_urls=category_urls, workers=workers):
+        full_list.append(full)
+        if categories is not None:
+            category_list.append(categories)
 
-    meta_df = scores_df[meta_cols].drop_duplicates(subset='round_guid')
+    return concat_compact(full_list), concat_category_frames(category_list)
 
-    # 4) Join detail rows with metadata
-    final_df = recap_df.merge(meta_df, on='round_guid', how='left')
 
-    return final_df
+def build_all_recaps_with_metadata(
+        recap_urls: List[str], 
+        scores_csv_path: Path,
+        metadata: Optional[MetadataIndex] = None,
+  ) -> pd.DataFrame:
+    """Full recaps only (no category pages), with metadata attached."""
+    full, _ = build_recap_tables(recap_urls, scores_csv_path, metadata=metadata)
+    return full
 
 # -------------------------------------------------------------------
 # Main pipeline
 # -------------------------------------------------------------------
 
 
-def main() -> None:
-    # 1) Call UMEA_api helper:
-    #    - writes SCORES_CSV_PATH (with the header you showed)
-    #    - writes ROUND_GUIDS_CSV_PATH
-    #    - returns the list of round GUIDs
-
-    round_guid_list = collect_scores_and_round_guids(
+def crawl_scores() -> Tuple[List[str], List[dict]]:
+    """
+    Call UMEA_api helper:
+        - writes SCORES_CSV_PATH
+        - writes ROUND_GUIDS_CSV_PATH
+        - returns the list of round GUIDs and the flattened score rows
+    """
+    all_rows, round_guid_list = collect_scores_rows(
         season_guid_dict=SEASON_GUID_DICT,
         scores_out_path=str(SCORES_CSV_PATH),
         round_guids_out_path=str(ROUND_GUIDS_CSV_PATH),
     )
+    return round_guid_list, all_rows
+
 
-    # 2) Build recap URLs from the round GUIDs
+def fetch_recaps(
+        round_guid_list: List[str],
+        metadata: Optional[MetadataIndex] = None,
+        category_urls: Optional[Dict[str, str]] = None,
+        workers: int = DEFAULT_WORKERS,
+        chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> int:
+    """
+    Build recap URLs from the round GUIDs, load every recap (and category
+    recap, where `category_urls` has one) with metadata, and write them to
+    ALL_RECAPS_CSV_PATH / CATEGORY_RECAPS_CSV_PATH in chunks of about
+    `chunk_rows` rows, so memory is bounded by the chunk, not the crawl.
+    Rows whose totals/ranks don't add up are flagged and row hashes added
+    per chunk (a chunk always holds whole rounds). Returns recap rows written.
+    """
     recap_urls = build_recap_url(round_guid_list)
+    if metadata is None:
+        metadata = MetadataIndex.from_csv(SCORES_CSV_PATH)
 
-    header_cols = get_header_from_url(recap_urls[0])
+    invalid = 0
 
-    # 3)Build a single recap DataFrame with metadata
-    all_recaps_df = build_all_recaps_with_metadata(
-        recap_urls=recap_urls, 
-        scores_csv_path=SCORES_CSV_PATH,
-    )
+    def prepare(chunk: pd.DataFrame) -> pd.DataFrame:
+        nonlocal invalid
+        flag_invalid_rows(chunk)
+        invalid += int((~chunk["valid"]).sum())
+        return add_row_hash(chunk, RECAPS_KEY)
+
+    with ChunkedCsvWriter(ALL_RECAPS_CSV_PATH, chunk_rows, prepare=prepare) as recaps_out, \
+            ChunkedCsvWriter(CATEGORY_RECAPS_CSV_PATH, chunk_rows, index=False) as categories_out:
+        for full, categories in iter_recap_tables(recap_urls, metadata, category_urls=category_urls, workers=workers):
+            recaps_out.add(full)
+            categories_out.add(categories)
+
+    if categories_out.rows_written:
+        print(f"Wrote {categories_out.rows_written} category recap rows to {CATEGORY_RECAPS_CSV_PATH}")
+    if invalid:
+        print(f"{invalid} of {recaps_out.rows_written} recap rows failed validation (see validation_failures)")
+    return recaps_out.rows_written
+
+
+def update_ratings(scores_df: pd.DataFrame, corrected_rounds: Iterable[str] = ()) -> RatingEngine:
+    """Load the saved rating state, process only rounds it hasn't seen (replaying if an already rated round was corrected), save it back."""
+    engine = RatingEngine.load(RATINGS_STATE_PATH)
+    processed = engine.update(scores_df, corrected_rounds=corrected_rounds)
+    engine.save(RATINGS_STATE_PATH)
+    print(f"Rated {processed} new round(s), {len(engine.ratings)} bands")
+    return engine
+
+
+def update_normalized(recap_chunks: Iterable[pd.DataFrame], rebuild: bool = False) -> NormalizedTables:
+    """Load the materialized normalized tables (or start empty to rebuild), refresh the groups touched by the recap chunks, save them back."""
+    tables = NormalizedTables() if rebuild else NormalizedTables.load(NORMALIZED_CSV_PATH)
+    # Only the caption totals are kept, so the long rows are much smaller than the chunks
+    longs = [long_from_recaps(chunk) for chunk in recap_chunks if chunk is not None and not chunk.empty]
+    groups = tables.refresh(pd.concat(longs, ignore_index=True)) if longs else 0
+    tables.save(NORMALIZED_CSV_PATH)
+    print(f"Refreshed {groups} normalized group(s)")
+    return tables
+
+
+def update_head_to_head(recap_chunks: Iterable[pd.DataFrame], corrected_rounds: Iterable[str] = (),
+                        rebuild: bool = False) -> HeadToHeadIndex:
+    """Load the head-to-head matrices / rank-movement index (or start over), redo the groups of corrected rounds, fold in rounds they haven't seen, save them back."""
+    index = HeadToHeadIndex() if rebuild else HeadToHeadIndex.load(HEAD_TO_HEAD_PATH)
+    redone = index.forget(corrected_rounds)
+    added = sum(index.update(chunk) for chunk in recap_chunks)
+    index.save(HEAD_TO_HEAD_PATH)
+    print(f"Head-to-head: added {added} round(s) ({len(redone)} redone for corrections) "
+          f"across {len(index.groups)} season/division group(s)")
+    return index
+
+
+def log_changes(previous: Optional[Path], path: Path, key_cols: List[str]) -> Optional[DatasetDiff]:
+    """Diff the copy kept before this run against what was just written to `path`, append the change log, drop the copy. Returns the diff."""
+    if previous is None:
+        return None
+    try:
+        if not path.exists():
+            return None
+        # Reads only keys + row_hash of both files whole; changed rows are pulled out chunk by chunk
+        diff = diff_files(previous, path, key_cols)
+    finally:
+        previous.unlink(missing_ok=True)
+    written = diff.write_jsonl(SCORE_CHANGES_PATH)
+    print(f"{path}: {diff.summary()}" + (f", logged to {SCORE_CHANGES_PATH}" if written else ""))
+    return diff
+
+
+def write_run_metrics(path: Path) -> None:
+    """This run's fetch metrics (revalidation counters, adaptive concurrency limit and its history) as JSON."""
+    metrics = {
+        "revalidation": VALIDATOR_CACHE.stats_dict(),
+        "concurrency": CONCURRENCY.stats_dict(),
+    }
+    path.write_text(json.dumps(metrics, indent=2), encoding="utf-8")
+
+
+@contextmanager
+def fetch_session() -> Iterator[None]:
+    """Wraps crawl_scores / fetch_recaps: loads last run's validators + parses, and afterwards (even if the fetch failed) saves them, prints the revalidation and concurrency summaries and writes the run metrics."""
+    VALIDATOR_CACHE.load(HTTP_CACHE_PATH)
+    try:
+        yield
+    finally:
+        VALIDATOR_CACHE.save(HTTP_CACHE_PATH)
+        print(f"Revalidation: {VALIDATOR_CACHE.stats.summary()}")
+        print(f"Concurrency: {CONCURRENCY.summary()}")
+        write_run_metrics(RUN_METRICS_PATH)
+
+
+def main() -> None:
+    # 0) Keep a copy of the previous outputs on disk to diff against (score corrections)
+    previous_scores = keep_previous(SCORES_CSV_PATH)
+    previous_recaps = keep_previous(ALL_RECAPS_CSV_PATH)
+
+    # Validators + previous parses from the last run, for conditional re-fetches
+    with fetch_session():
+        # 1) Crawl the API for scores + round GUIDs
+        round_guid_list, all_rows = crawl_scores()
+
+        # 2) Index metadata straight from the crawl rows (no CSV re-read)
+        metadata = MetadataIndex.from_rows(all_rows)
+
+        # 3) Fetch every recap + category recap, attach metadata and write to disk
+        fetch_recaps(round_guid_list, metadata=metadata, category_urls=category_urls_from_rows(all_rows))
+
+    scores_diff = log_changes(previous_scores, SCORES_CSV_PATH, SCORES_KEY)
+    recaps_diff = log_changes(previous_recaps, ALL_RECAPS_CSV_PATH, RECAPS_KEY)
+
+    # 3b) Refresh z-score / percentile tables for the groups the added / changed recap rows touch;
+    # with nothing to diff against, or rows gone, rebuild them from the whole table (read back in whole-round chunks)
+    if ALL_RECAPS_CSV_PATH.exists():
+        if recaps_diff is None or not recaps_diff.removed.empty or not NORMALIZED_CSV_PATH.exists():
+            update_normalized(iter_csv_chunks(ALL_RECAPS_CSV_PATH), rebuild=True)
+        else:
+            update_normalized([recaps_diff.added, recaps_diff.changed_rows])
+
+        # 3c) Head-to-head matrices and caption rank movement for the new rounds, redoing the
+        # season/division groups of rounds whose rows changed (from scratch with nothing to diff against)
+        update_head_to_head(iter_csv_chunks(ALL_RECAPS_CSV_PATH),
+                            corrected_rounds=recaps_diff.touched() if recaps_diff else (),
+                            rebuild=recaps_diff is None)
 
-    # 4 Write to disk
-    all_recaps_df.to_csv(ALL_RECAPS_CSV_PATH, index=True)
+    # 4) Fold any new rounds into the persisted band ratings (and corrections to rated ones)
+    update_ratings(pd.DataFrame(all_rows), corrected_rounds=scores_diff.touched() if scores_diff else ())
 
 if __name__ == "__main__":
     main()
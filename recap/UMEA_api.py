@@ -2,30 +2,74 @@
 
 import csv
 import json
+import os
 import random
 import time
-from typing import Dict, List, Set, Iterable, Tuple
+from typing import Dict, List, Optional, Set, Iterable, Tuple
 
-import requests
+from recap.bands import BAND_REGISTRY
+from recap.revalidate import VALIDATOR_CACHE, ValidatorCache
+from recap.throttle import throttled_get
+
+# requests is imported inside get_jsonp so SEASON_GUID_DICT can be read
+# (e.g. by the CLI) without paying for the HTTP stack.
 BASE = "https://bridge.competitionsuite.com/api/orgscores"
 VERSION = "1.1.5"
 CALLBACK = "jQuery110209904385531594735_1763353270252?_= 1763353270271"
 
+# Threads for GetCompetition calls. Each one still sleeps up to `jitter` before
+# its request, so this sets the request rate: 2 is about twice the old serial
+# crawl. The adaptive limit (recap.throttle) caps how many are in flight.
+API_WORKERS = 2
+
 #'''SEASON_GUID_DICT = {'UMEA 2025': 'ff7a5f4b-b7dc-4cbc-ad0b-1295fdd971a8'}'''
 SEASON_GUID_DICT = {'UMEA 2025': 'ff7a5f4b-b7dc-4cbc-ad0b-1295fdd971a8', 'UMEA 2024': '9cd94b0d-a521-4280-98e3-b42b4c4441c5', 'UMEA 2023': 'baa6c584-4547-4370-b8ca-2d05018876d7', 'UMEA 2022': '6d7e8a01-34fb-49c0-bfab-8b62c8f19930'}#, 'UMEA 2021': '871de29c-53ea-4b45-b69a-cbb245861811', 'UMEA 2020': '9e9a151d-762c-4024-aa5a-aa45930939e1', 'UMEA 2019': 'a6bbdab4-a781-4a21-850a-53d42faebe2b', 'UMEA 2018': 'ad102698-0fc8-451a-a5fd-634da78d103d', 'UMEA 2017': 'ea245774-1ae0-464d-92a9-1ddf44600c51', 'UMEA 2016': '334709e3-d486-4cda-b0fb-fbbf0d64966d', 'UMEA 2015': '26b74c10-b696-428f-8463-874b147c606d', 'UMEA 2014': '6cfb281c-6122-4115-8c3b-f0a2097aa48d'}
 
-def get_jsonp(url: str, params=None, timeout: int = 30):
+def get_jsonp(
+        url: str,
+        params=None,
+        timeout: int = 30,
+        jitter: float = 3.0,
+        cache: Optional[ValidatorCache] = VALIDATOR_CACHE,
+        conditional: bool = True,
+):
     """
     Call a JSONP endpoint and return parsed JSON.
     Assumes response looks like: callback123({...});
+    `jitter` is the max random sleep before the request (live mode uses a
+    much smaller value than the bulk crawl). The request itself runs under
+    the adaptive concurrency limit shared with the recap fetchers, which
+    backs off on 403/429/5xx and raises HTTPError if retries run out.
+    With a `cache`, the request is conditional on the validators from the
+    last fetch of the same URL + params, and a 304 or an identical body
+    returns the previously parsed payload without parsing again.
     """
+    import requests
+
     #Be nice to API by sleeping randomly
-    random_float = random.uniform(0, 3)
+    random_float = random.uniform(0, jitter)
     time.sleep(random_float)
-    
-    resp = requests.get(url, params=params, timeout=timeout)
-    resp.raise_for_status()
-    raw = resp.text
+
+    key = requests.Request("GET", url, params=params).prepare().url
+    headers = cache.conditional_headers(key) if cache is not None and conditional else {}
+
+    resp = throttled_get(url, params=params, timeout=timeout, headers=headers)
+    if cache is None:
+        return parse_jsonp(resp.text)
+
+    parsed = cache.revalidate(key, resp.status_code, resp.headers, resp.content)
+    if parsed is not None:
+        return parsed["json"]
+    if resp.status_code == 304:
+        return get_jsonp(url, params=params, timeout=timeout, jitter=0.0, cache=cache, conditional=False)
+
+    data = parse_jsonp(resp.text)
+    cache.entry(key)["parsed"]["json"] = data
+    return data
+
+
+def parse_jsonp(raw: str):
+    """Strip the callback wrapper from a JSONP body and parse the JSON inside."""
     # Find first "(" and last ")"
     start = raw.find("(")
     end = raw.rfind(")")
@@ -37,7 +81,7 @@ def get_jsonp(url: str, params=None, timeout: int = 30):
     return json.loads(json_str)
 
 
-def get_competitions_for_season(season_id: str):
+def get_competitions_for_season(season_id: str, jitter: float = 3.0):
     # Accessing 'https://bridge.competitionsuite.com/api/orgscores'
     # using the 'get_jsonp' function
     url = f"{BASE}/GetCompetitionsBySeason/jsonp"
@@ -48,7 +92,7 @@ def get_competitions_for_season(season_id: str):
         "callback": CALLBACK  # usually not needed; server supplies default
     }
 
-    data = get_jsonp(url, params=params)
+    data = get_jsonp(url, params=params, jitter=jitter)
 
     competitions = data.get("competitions")
 
@@ -58,7 +102,7 @@ def get_competitions_for_season(season_id: str):
     return competitions
 
 
-def get_competition_results(comp_id):
+def get_competition_results(comp_id, jitter: float = 3.0):
     url = f"{BASE}/GetCompetition/jsonp"
     params = {
         "competition": comp_id,
@@ -66,7 +110,7 @@ def get_competition_results(comp_id):
         "callback": "jQuery110209904385531594735_1763353270252&_=1763353270274"
     }
 
-    data = get_jsonp(url, params=params)
+    data = get_jsonp(url, params=params, jitter=jitter)
 
     return data
 
@@ -92,7 +136,7 @@ def flatten_competition_results(comp_data: dict, season_name: str = None):
         round_guid = rnd.get("roundGuid")
         division_name = rnd.get("name")  # e.g. "4A Open", "6A Scholastic"
         full_recap_url = rnd.get("fullRecapUrl")
-        #category_recap_url = rnd.get("categoryRecapUrl")
+        category_recap_url = rnd.get("categoryRecapUrl")
 
         for perf in rnd.get("performances", []):
             performance_guid = perf.get("performanceGuid")
@@ -115,10 +159,11 @@ def flatten_competition_results(comp_data: dict, season_name: str = None):
                 "division_name": division_name,
                 "round_guid": round_guid,
                 "full_recap_url": full_recap_url,
-                #"round_category_recap_url": category_recap_url,
+                "category_recap_url": category_recap_url,
 
                 "performance_guid": performance_guid,
                 "band_name": band_name,
+                "band_id": BAND_REGISTRY.resolve(band_name) if band_name else None,
                 "city": city,
                 "state": state,
                 "score": score,
@@ -143,6 +188,26 @@ def collect_scores_and_round_guids(
     - Optionally write a CSV of unique round GUIDs
     - Return sorted list of unique round GUIDs (for main.py to consume)
     """
+    _, round_guids = collect_scores_rows(
+        season_guid_dict=season_guid_dict,
+        scores_out_path=scores_out_path,
+        round_guids_out_path=round_guids_out_path,
+    )
+    return round_guids
+
+
+def collect_scores_rows(
+    season_guid_dict: Dict[str, str],
+    scores_out_path: str = 'umea_marching_band_scores_all_seasons.csv',
+    round_guids_out_path: str | None = 'umea_recap_guids.csv',
+) -> Tuple[List[dict], List[str]]:
+    """
+    Same as collect_scores_and_round_guids, but also returns the flattened
+    rows so callers (e.g. the metadata index) don't have to re-read the CSV.
+
+    Returns:
+        (all_rows, sorted list of unique round GUIDs)
+    """
     
     all_rows: List[dict] = []
     all_round_guids: Set[str] = set()
@@ -159,7 +224,7 @@ def collect_scores_and_round_guids(
     
     if not all_rows:
         print('No rows collected, nothging to write.')
-        return []
+        return [], []
     
     # Write CSVs
     write_scores_csv(all_rows, scores_out_path)
@@ -167,7 +232,7 @@ def collect_scores_and_round_guids(
     if round_guids_out_path:
         write_guid_csv(all_round_guids, round_guids_out_path)
 
-    return sorted(all_round_guids)
+    return all_rows, sorted(all_round_guids)
 ######################################
 
 
@@ -198,23 +263,27 @@ def build_season_scores_csv(season_id: str, season_name: str, out_path: str) ->
     return unique_round_guids
 
 
-def iter_flattened_rows_for_season(season_id: str, season_name: str):
+def iter_flattened_rows_for_season(season_id: str, season_name: str, workers: int = API_WORKERS):
         """
         Yield flattened row dicts for every performance in a given season.
         This is the only place that calls flatten_competition_results.
+        GetCompetition calls run on `workers` threads; how many are actually
+        in flight is up to the shared adaptive concurrency limit. Rows come
+        out in competition order.
         """
-        competitions = get_competitions_for_season(season_id)
+        from concurrent.futures import ThreadPoolExecutor
 
-        for c in competitions:
-            comp_id = c.get("competitionGuid")
-            comp_data = get_competition_results(comp_id)
+        competitions = get_competitions_for_season(season_id)
+        comp_ids = [c.get("competitionGuid") for c in competitions]
 
-            rows = flatten_competition_results(
-                comp_data=comp_data,
-                season_name=season_name
-            )
-            for row in rows:
-                yield row
+        with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="api") as pool:
+            for comp_data in pool.map(get_competition_results, comp_ids):
+                rows = flatten_competition_results(
+                    comp_data=comp_data,
+                    season_name=season_name
+                )
+                for row in rows:
+                    yield row
 
 def accumulate_rows_and_guids(
         row_iter: Iterable[dict],
@@ -242,23 +311,31 @@ def write_scores_csv(rows: List[dict], out_path: str) -> None:
         print('no rows collected, nothing to write.')
         return
 
-    fieldnames = list(rows[0].keys())
+    # row_hash lets recap.diff compare snapshots without a full-value compare
+    from recap.diff import HASH_COL, SCORES_KEY, hash_record
 
-    with open(out_path, 'w', newline='', encoding='utf-8') as f:
+    fieldnames = [k for k in rows[0].keys() if k != HASH_COL] + [HASH_COL]
+
+    # Write beside the target and swap it in, so readers (recap serve) never see a half-written file
+    tmp_path = f'{out_path}.partial'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
-        writer.writerows(rows)
-    
+        writer.writerows({**row, HASH_COL: hash_record(row, SCORES_KEY)} for row in rows)
+    os.replace(tmp_path, out_path)
+
     print(f'Wrote {len(rows)} rows to {out_path}')
 
 
 def write_guid_csv(guids: Set[str], out_path: str) -> None:
     sorted_guids = sorted(guids)
 
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
+    tmp_path = f"{out_path}.partial"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         for guid in sorted_guids:
             writer.writerow([guid])
+    os.replace(tmp_path, out_path)
 
     print(f"Wrote {len(sorted_guids)} unique GUIDs to {out_path}")
 
@@ -0,0 +1,209 @@
+'''
+Band identity resolution.
+
+The API (`band_name`) and the recap pages (`school`) don't always spell a
+band the same way, and names drift between seasons ("Orem" vs "Orem City").
+BandRegistry maps any of those spellings to one stable `band_id`:
+
+    1) exact normalized-name lookup        (dict)
+    2) alias lookup                        (dict)
+    3) a near-exact typo of one canonical name: at most FUZZY_MAX_EDITS
+       edits on the whole normalized name, the same numbers, and no other
+       canonical name within FUZZY_MARGIN more edits
+
+Only the canonical table (CITY_DICT + ALIASES) is ever fuzzy matched, and a
+name that matches nothing gets an id derived from its own normalized name.
+So a spelling's id depends only on that table, never on which spellings a
+process happened to see first: shard workers, threads and separate CLI runs
+all agree without sharing any state. Every fuzzy merge is logged and kept in
+`fuzzy_merges`; a variant worth keeping belongs in ALIASES.
+
+Every answer is memoized per raw string, so resolving a whole table is one
+dict hit per row after the first time a spelling is seen.
+
+Standard library only, so UMEA_api can use it without pulling in pandas.
+'''
+
+import logging
+import re
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CITY_DICT = {'American Fork': 'American Fork, UT', 'Viewmont': 'Bountiful, UT', 'Gallatin': 'Bozeman, MT', 'Canyon View': 'Cedar City, UT', 'Clearfield': 'Clearfield, UT', 'Brighton': 'Cottonwood Heights, UT', 'Delta': 'Delta, UT', 'Cedar Valley': 'Eagle Mountain, UT', 'Elko': 'Elko, NV', 'Tintic': 'Eureka, UT', 'Farmington': 'Farmington, UT', 'Bear River': 'Garland, UT', 'Wasatch': 'Heber City, UT', 'Herriman': 'Herriman, UT', 'Mountain Ridge': 'Herriman, UT', 'Lone Peak': 'Highland, UT', 'Mountain Crest': 'Hyrum, UT', 'Davis': 'Kaysville, UT', 'Kearns': 'Kearns, UT', 'Lehi': 'Lehi, UT', 'Skyridge': 'Lehi, UT', 'Hillcrest': 'Midvale, UT', 'Ridgeline': 'Millville, UT', 'Green Canyon': 'North Logan, UT', 'Ogden': 'Ogden, UT', 'Orem': 'Orem, UT', 'Timpanogos': 'Orem, UT', 'Payson': 'Payson, UT', 'Pleasant Grove': 'Pleasant Grove, UT', 'Carbon': 'Price, UT', 'Provo': 'Provo, UT', 'Timpview': 'Provo, UT', 'Riverton': 'Riverton, UT','Salem Hills': 'Salem, UT', 'Alta': 'Sandy, UT', 'Westlake': 'Saratoga Springs, UT', 'Sky View': 'Smithfield, UT', 'Bingham': 'South Jordan, UT', 'Mountain Star': 'South Ogden, UT', 'Maple Mountain': 'Spanish Fork, UT', 'Spanish Fork': 'Spanish Fork, UT', 'Springville': 'Springville, UT', 'Stansbury': 'Stansbury, UT', 'Deseret Peak': 'Tooele, UT', 'Tooele': 'Tooele, UT', 'Uintah': 'Vernal, UT', 'Copper Hills': 'West Jordan, UT', 'West Jordan': 'West Jordan, UT', 'High Desert': 'Ammon, ID', 'Nampa': 'Nampa ID', 'Idaho Falls': 'Idaho Falls, ID', 'Columbia': 'Nampa, ID', 'Skyview (ID)': 'Nampa ID', 'Century': 'Pocatello, ID', 'Pocatello': 'Pocatello, ID', 'Timberline': 'Boise, ID', 'Madison': 'Rexburg, ID', 'Highland': 'Pocatello, ID', 'Orem City': 'Orem, UT', 'Grand County': 'Moab, UT', 'Roy': 'Roy, UT', 'Murray': 'Murray, UT', 'Fremont': 'Plain City, UT', 'Mountain View': 'Meridian, ID', 'Capital': 'Boise, ID', 'Fruitland': 'Fruitland, ID', 'Kelly Walsh': 'Casper, WY', 'Blackfoot': 'Blackfoot, ID', 'Centennial': 'Boise, ID'}
+
+# alternate spelling -> canonical CITY_DICT name
+ALIASES = {
+    'Orem City': 'Orem',
+    'Skyview (UT)': 'Sky View',
+    'Sky View (UT)': 'Sky View',
+    'Mountain View (ID)': 'Mountain View',
+}
+
+# Words that never distinguish one band from another ("high" only in "high school")
+_NOISE_WORDS = {'school', 'hs', 'marching', 'band'}
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_DIGITS = re.compile(r'\d+')
+
+FUZZY_MAX_EDITS = 1
+FUZZY_MARGIN = 2
+FUZZY_MIN_LENGTH = 6
+
+
+def normalize_name(name: str) -> str:
+    '''Lowercase, strip punctuation and noise words: "Skyview (ID) High School" -> "skyview id", "High Desert" -> "high desert".'''
+    words = _NON_ALNUM.sub(' ', (name or '').lower()).split()
+    kept = []
+    for i, word in enumerate(words):
+        if word in _NOISE_WORDS:
+            continue
+        if word == 'high' and i + 1 < len(words) and words[i + 1] == 'school':
+            continue
+        kept.append(word)
+    return ' '.join(kept)
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    '''Levenshtein distance counting an adjacent transposition as one edit; stops early and returns limit + 1 once it exceeds limit.'''
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, row = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(row[j] + 1, current[j - 1] + 1, row[j - 1] + cost)
+            if before is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, row = row, current
+    return min(row[-1], limit + 1)
+
+
+class BandRegistry:
+    '''Stable band ids with normalized-name and alias indexes, and typo matching against the canonical names.'''
+
+    def __init__(
+            self,
+            max_edits: int = FUZZY_MAX_EDITS,
+            margin: int = FUZZY_MARGIN,
+            min_length: int = FUZZY_MIN_LENGTH,
+    ):
+        self.max_edits = max_edits
+        self.margin = margin
+        self.min_length = min_length
+
+        self.names: Dict[str, str] = {}       # band_id -> display name
+        self.home_cities: Dict[str, str] = {}  # band_id -> "City, ST"
+        self.fuzzy_merges: Dict[str, str] = {}  # raw spelling -> band_id it was merged into
+
+        self._by_normalized: Dict[str, str] = {}
+        self._by_alias: Dict[str, str] = {}
+        self._canonical: Dict[str, str] = {}   # normalized canonical spelling -> band_id (fuzzy targets)
+        self._resolved: Dict[str, str] = {}    # raw string -> band_id (memo)
+
+    # ---------- Builders ----------
+
+    @classmethod
+    def from_city_dict(
+            cls,
+            city_dict: Dict[str, str] = CITY_DICT,
+            aliases: Dict[str, str] = ALIASES,
+    ) -> "BandRegistry":
+        registry = cls()
+        for name, city in city_dict.items():
+            if name not in aliases:
+                registry.add_band(name, home_city=city, canonical=True)
+        for alias, canonical in aliases.items():
+            registry.add_alias(alias, canonical)
+        return registry
+
+    def add_band(self, name: str, home_city: str = '', canonical: bool = False) -> str:
+        '''Registers a band under its normalized name and returns its id (the normalized name, hyphenated). Re-adding an existing name returns the existing id. Only canonical names are fuzzy match targets.'''
+        normalized = normalize_name(name)
+        band_id = self._by_normalized.get(normalized)
+        if band_id is not None:
+            return band_id
+
+        band_id = normalized.replace(' ', '-') or 'unknown'
+        self.names[band_id] = name
+        self.home_cities[band_id] = home_city
+        self._by_normalized[normalized] = band_id
+        if canonical:
+            self._canonical[normalized] = band_id
+        return band_id
+
+    def add_alias(self, alias: str, canonical: str) -> None:
+        normalized = normalize_name(canonical)
+        band_id = self._by_normalized.get(normalized) or self._by_alias.get(normalized)
+        if band_id is None:
+            band_id = self.add_band(canonical, canonical=True)
+        self._by_alias[normalize_name(alias)] = band_id
+        self._canonical.setdefault(normalize_name(alias), band_id)
+
+    # ---------- Lookups ----------
+
+    def resolve(self, name: str, register_unknown: bool = True) -> Optional[str]:
+        '''Returns the band_id for any spelling of a band name. Unknown names are registered as new bands unless register_unknown is False.'''
+        band_id = self._resolved.get(name)
+        if band_id is not None:
+            return band_id
+
+        normalized = normalize_name(name)
+        band_id = self._exact(normalized)
+        if band_id is None:
+            band_id = self._fuzzy(normalized)
+            if band_id is not None:
+                self.fuzzy_merges[name] = band_id
+                logger.warning('band name %r matched to %r (%s); add it to ALIASES if that is right', name, band_id, self.names.get(band_id, ''))
+        if band_id is None:
+            if not register_unknown or not normalized:
+                return None
+            band_id = self.add_band(name)
+
+        self._resolved[name] = band_id
+        return band_id
+
+    def resolve_many(self, names: Iterable[str]) -> List[Optional[str]]:
+        return [self.resolve(n) if isinstance(n, str) else None for n in names]
+
+    def home_city(self, name: str) -> str:
+        '''Home "City, ST" for a band name known by its exact normalized name or an alias, or "" otherwise (never a fuzzy guess).'''
+        band_id = self._exact(normalize_name(name))
+        return self.home_cities.get(band_id, '') if band_id else ''
+
+    def _exact(self, normalized: str) -> Optional[str]:
+        return self._by_normalized.get(normalized) or self._by_alias.get(normalized)
+
+    def _fuzzy(self, normalized: str) -> Optional[str]:
+        '''The one canonical name within max_edits of the whole normalized name, with the same numbers and no runner-up within `margin` more edits; else None.'''
+        if len(normalized) < self.min_length:
+            return None
+        # A bare name that a canonical one qualifies ("skyview" vs "skyview id") could be either band
+        prefix = normalized + ' '
+        if any(candidate.startswith(prefix) for candidate in self._canonical):
+            return None
+        # Numbers are never typos ("Band 12" vs "Band 13" are different bands)
+        digits = _DIGITS.findall(normalized)
+        limit = self.max_edits + self.margin - 1
+
+        best, best_distance, runner_up = None, limit + 1, limit + 1
+        for candidate, band_id in self._canonical.items():
+            if len(candidate) < self.min_length or _DIGITS.findall(candidate) != digits:
+                continue
+            distance = _edit_distance(normalized, candidate, limit)
+            if distance < best_distance:
+                if best is not None and band_id != best:
+                    runner_up = best_distance
+                best, best_distance = band_id, distance
+            elif distance < runner_up and band_id != best:
+                runner_up = distance
+
+        if best is None or best_distance > self.max_edits or runner_up - best_distance < self.margin:
+            return None
+        return best
+
+
+# Shared registry used by the crawl and the recap parser
+BAND_REGISTRY = BandRegistry.from_city_dict()
@@ -0,0 +1,183 @@
+'''
+Category recaps.
+
+Besides the full recap (one wide row per band) every round has a category
+recap page (the API's categoryRecapUrl): one table per caption, each
+listing the bands with that caption's judge scores and totals. The layout
+varies with the caption, so rows are kept long, one per band x caption x
+column, in a typed table:
+
+    round_guid  caption  school  band_id  city_state  column  score  rank  source_url
+
+round_guid / caption / column / source_url are categoricals, score is
+float32 and rank a nullable Int16. The table joins to the scores, full
+recaps and metadata on round_guid.
+
+CategoryRecapPage reuses RecapPage's fetch (shared session, conditional
+requests and parse reuse); only the table walk differs. recap.crawl runs
+these pages in the same pass and on the same workers as the full recaps.
+'''
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+from bs4 import BeautifulSoup, Tag
+
+from recap.bands import BAND_REGISTRY
+from recap.chunked import concat_compact
+from recap.recap_page import RecapPage
+from recap.revalidate import VALIDATOR_CACHE, ValidatorCache
+
+CATEGORY_COLS: List[str] = [
+    'round_guid', 'caption', 'school', 'band_id', 'city_state',
+    'column', 'score', 'rank', 'source_url',
+]
+
+# parsed row: caption, school, city_state, column, score, rank
+_PARSED_COLS = ['caption', 'school', 'city_state', 'column', 'score', 'rank']
+
+
+class CategoryRecapPage(RecapPage):
+    '''A category recap page: every top-level table is one caption. Depends on RecapPage for fetching and the validator cache.'''
+
+    def __init__(self, url: str, cache: Optional[ValidatorCache] = VALIDATOR_CACHE):
+        super().__init__(url, table_index=0, cache=cache)
+        self._tables: List[Tag] = []
+
+    def feed(self, html: str) -> None:
+        '''Builds the soup and keeps every table that isn't nested inside another one.'''
+        self._soup = BeautifulSoup(html, "html.parser")
+        self._tables = [t for t in self._soup.find_all("table") if t.find_parent("table") is None]
+
+    def parse_categories(self) -> List[List[str]]:
+        '''One [caption, school, city_state, column, score, rank] row per score cell. Reused from the cache when the page hasn't changed.'''
+        if "categories" in self._parsed:
+            return [list(row) for row in self._parsed["categories"]]
+        if self._soup is None and self._reused:
+            self.fetch(conditional=False)
+        if self._soup is None:
+            raise RuntimeError("Call fetch() before parse_categories().")
+
+        rows: List[List[str]] = []
+        for table in self._tables:
+            rows.extend(self._parse_caption_table(table))
+        self._parsed["categories"] = [list(row) for row in rows]
+        return rows
+
+    def _parse_caption_table(self, table: Tag) -> List[List[str]]:
+        '''
+        Rows without score cells are headers: a single text cell is the
+        caption title, several are the column labels. Score rows are school,
+        optional city/state, then score/rank pairs; labels are matched to
+        the pairs from the right, so leading "School"/"Location" labels
+        don't shift them.
+        '''
+        caption = ''
+        labels: List[str] = []
+        out: List[List[str]] = []
+
+        for tr in table.find_all("tr"):
+            if tr.find_parent("table") is not table:
+                continue
+            outer = tr.find_all(["td", "th"], recursive=False)
+            if tr.find("td", class_="content score") is None:
+                texts = [c.get_text(strip=True) for c in outer]
+                texts = [t for t in texts if t]
+                if len(texts) == 1:
+                    caption = texts[0]
+                elif texts:
+                    labels = _dedupe(texts)
+                continue
+
+            text_cells: List[str] = []
+            pairs = []
+            for cell in outer:
+                classes = cell.get("class") or []
+                if classes == ["content", "rank"] and pairs and not pairs[-1][1]:
+                    # Flat layout: the rank is the score cell's sibling
+                    pairs[-1] = (pairs[-1][0], cell.get_text(strip=True))
+                    continue
+                score_td = cell if classes == ["content", "score"] else cell.find("td", class_="content score")
+                rank_td = cell.find("td", class_="content rank")
+                if score_td is not None:
+                    score = score_td.get("data-translate-number") or score_td.get_text(strip=True)
+                    rank = rank_td.get_text(strip=True) if rank_td is not None else ''
+                    pairs.append((score, rank))
+                elif not pairs:
+                    text_cells.append(cell.get_text(strip=True))
+
+            if not text_cells or not text_cells[0]:
+                continue
+            school = text_cells[0]
+            city_state = text_cells[1] if len(text_cells) > 1 else ''
+            names = labels[-len(pairs):] if len(labels) >= len(pairs) else []
+            for i, (score, rank) in enumerate(pairs):
+                column = names[i] if names else f'col{i + 1}'
+                out.append([caption, school, city_state, column, score, rank])
+        return out
+
+
+def _dedupe(labels: List[str]) -> List[str]:
+    '''Repeated labels (a "*Tot" per sub-caption) get ".1", ".2", ... like pandas does for duplicate columns.'''
+    seen: Dict[str, int] = {}
+    out = []
+    for label in labels:
+        n = seen.get(label, 0)
+        out.append(label if n == 0 else f'{label}.{n}')
+        seen[label] = n + 1
+    return out
+
+
+# -------------------------------------------------------------------
+# Typed table
+# -------------------------------------------------------------------
+
+def category_frame(rows: List[List[str]], round_guid: str, source_url: str) -> pd.DataFrame:
+    '''Parsed rows -> the typed CATEGORY_COLS table for one round.'''
+    df = pd.DataFrame(rows, columns=_PARSED_COLS)
+    df['score'] = pd.to_numeric(df['score'], errors='coerce').astype('float32')
+    df['rank'] = pd.to_numeric(df['rank'], errors='coerce').astype('Int16')
+    df['round_guid'] = round_guid
+    df['source_url'] = source_url
+    df['band_id'] = BAND_REGISTRY.resolve_many(df['school'])
+    for col in ('round_guid', 'caption', 'column', 'source_url'):
+        df[col] = df[col].astype('category')
+    return df[CATEGORY_COLS]
+
+
+def concat_category_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    '''pd.concat that keeps the categorical columns categorical (plain concat falls back to object when categories differ).'''
+    if not frames:
+        return pd.DataFrame(columns=CATEGORY_COLS)
+    return concat_compact(frames)
+
+
+def load_category_recap(url: str, round_guid: str) -> pd.DataFrame:
+    '''Fetches and parses one category recap page into the typed table.'''
+    page = CategoryRecapPage(url)
+    page.fetch()
+    return category_frame(page.parse_categories(), round_guid, url)
+
+
+# -------------------------------------------------------------------
+# round_guid -> categoryRecapUrl
+# -------------------------------------------------------------------
+
+def category_urls_from_rows(rows: Iterable[dict]) -> Dict[str, str]:
+    '''From flattened API rows (first URL seen per round).'''
+    urls: Dict[str, str] = {}
+    for row in rows:
+        guid, url = row.get('round_guid'), row.get('category_recap_url')
+        if guid and url:
+            urls.setdefault(guid, url)
+    return urls
+
+
+def category_urls_from_csv(path: Path) -> Dict[str, str]:
+    '''From the scores CSV; empty if it was written before category_recap_url existed.'''
+    header = pd.read_csv(path, nrows=0).columns
+    if 'category_recap_url' not in header:
+        return {}
+    df = pd.read_csv(path, usecols=['round_guid', 'category_recap_url'], dtype=str).dropna()
+    return dict(df.drop_duplicates('round_guid').itertuples(index=False, name=None))
@@ -0,0 +1,214 @@
+'''
+Memory-bounded recap tables.
+
+Every recap page comes off the parser as an all-strings frame. Holding all
+of them and concatenating once at the end costs about twice the final
+all-strings table at peak. Instead:
+
+    - compact_recap() coerces each recap to small dtypes as soon as it is
+      parsed: score/total columns float32, rank columns nullable Int16,
+      round_guid / source_url categoricals (one value per page),
+    - ChunkedCsvWriter buffers compact recaps and appends them to the CSV
+      once `chunk_rows` rows are waiting, so peak memory is set by the chunk
+      size, not by how many rounds have been crawled,
+    - iter_csv_chunks() reads a written table back in chunks that never split
+      a round, for the incremental consumers (normalized tables,
+      head-to-head) that key their progress on round_guid.
+
+A column is only coerced when nothing but blanks is lost, so odd cells
+("-", "DNP") keep the column as text instead of turning into NaN.
+'''
+
+import os
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+import pandas as pd
+
+DEFAULT_CHUNK_ROWS = 5_000
+
+CATEGORICAL_COLS: List[str] = ['round_guid', 'source_url']
+
+# Fixed score-table columns from TransformHeader.update_header (the rest go by suffix)
+_SCORE_COLS = {'SubTotal', 'Penalties', 'Penalties_Total', 'Total'}
+_RANK_COLS = {'SubTotal_Rank', 'Rank'}
+
+_FLOAT32 = pd.api.types.pandas_dtype('float32')
+_INT16 = pd.Int16Dtype()
+
+
+def _is_rank(col: str) -> bool:
+    return col in _RANK_COLS or col.endswith('_rank') or col.endswith('_Rank')
+
+
+def _is_score(col: str) -> bool:
+    return col in _SCORE_COLS or col.endswith('_score') or col.endswith('_Total')
+
+
+def compact_recap(df: pd.DataFrame) -> pd.DataFrame:
+    '''Coerces a recap frame's score columns to float32, rank columns to Int16 and round_guid/source_url to categoricals, in place. Returns df.'''
+    # The score table repeats SPACER; only uniquely named columns are touched
+    unique = df.columns[~df.columns.duplicated(keep=False)]
+    for col in unique:
+        if col in CATEGORICAL_COLS:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+            continue
+        rank = _is_rank(col)
+        if not (rank or _is_score(col)):
+            continue
+        values = df[col]
+        if values.dtype in (_FLOAT32, _INT16):
+            continue
+
+        if values.dtype.kind in 'fiu':
+            numbers = values
+        else:
+            numbers = pd.to_numeric(values, errors='coerce')
+            blank = values.isna() | (values.astype(str).str.strip() == '')
+            if (numbers.isna() & ~blank).any():
+                continue
+        if rank and ((numbers.dropna() % 1) == 0).all():
+            df[col] = numbers.astype('Int16')
+        else:
+            df[col] = numbers.astype('float32')
+    return df
+
+
+def concat_compact(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    '''pd.concat that keeps categorical columns categorical (plain concat falls back to object when the categories differ).'''
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    from pandas.api.types import union_categoricals
+
+    def categorical(f: pd.DataFrame) -> set:
+        return {c for c, dtype in f.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)}
+
+    columns = frames[0].columns
+    shared = set.intersection(*(categorical(f) for f in frames))
+    cat_cols = [c for c in columns if c in shared]
+    out = pd.concat([f.drop(columns=cat_cols) for f in frames], ignore_index=True)
+    # Put each one back where it was (columns may repeat, so no out[columns])
+    for col in sorted(cat_cols, key=columns.get_loc):
+        values = pd.Categorical(union_categoricals([f[col] for f in frames], ignore_order=True))
+        out.insert(min(columns.get_loc(col), len(out.columns)), col, values)
+    return out
+
+
+# -------------------------------------------------------------------
+# Writing
+# -------------------------------------------------------------------
+
+class ChunkedCsvWriter:
+    '''
+    Appends frames to a CSV in chunks of at least `chunk_rows` rows.
+
+    Frames are buffered whole (a recap is never split), `prepare` runs on
+    each chunk just before it is written (validation flags, row hashes),
+    and the first chunk fixes the column order. Output goes to a temporary
+    file that replaces `path` on close(), so a crash mid-crawl leaves the
+    previous table in place. A run that writes no rows removes `path`, so
+    an old table is never mistaken for this run's output.
+    '''
+
+    def __init__(
+            self,
+            path: Path,
+            chunk_rows: int = DEFAULT_CHUNK_ROWS,
+            prepare: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+            index: bool = True,
+    ):
+        self.path = Path(path)
+        self.chunk_rows = max(chunk_rows, 1)
+        self.prepare = prepare
+        self.index = index
+
+        self.rows_written = 0
+        self.chunks_written = 0
+        self.peak_buffered_rows = 0
+
+        self._tmp_path = self.path.with_name(self.path.name + '.partial')
+        self._buffer: List[pd.DataFrame] = []
+        self._buffered_rows = 0
+        self._columns: Optional[List[str]] = None
+
+    def __enter__(self) -> "ChunkedCsvWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add(self, df: Optional[pd.DataFrame]) -> None:
+        if df is None or df.empty:
+            return
+        self._buffer.append(df)
+        self._buffered_rows += len(df)
+        self.peak_buffered_rows = max(self.peak_buffered_rows, self._buffered_rows)
+        if self._buffered_rows >= self.chunk_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        '''Writes whatever is buffered as one chunk.'''
+        if not self._buffer:
+            return
+        chunk = concat_compact(self._buffer)
+        self._buffer, self._buffered_rows = [], 0
+        if self.prepare is not None:
+            chunk = self.prepare(chunk)
+
+        first = self._columns is None
+        if first:
+            self._columns = list(chunk.columns)
+        else:
+            chunk = chunk.reindex(columns=self._columns)
+        chunk.index = pd.RangeIndex(self.rows_written, self.rows_written + len(chunk))
+
+        chunk.to_csv(self._tmp_path, mode='w' if first else 'a', header=first, index=self.index)
+        self.rows_written += len(chunk)
+        self.chunks_written += 1
+
+    def close(self) -> int:
+        '''Flushes the last chunk and moves the file into place; if no rows came in, removes `path` instead. Returns rows written.'''
+        self.flush()
+        if self.chunks_written:
+            os.replace(self._tmp_path, self.path)
+        else:
+            self.abort()
+            if self.path.exists():
+                self.path.unlink()
+        return self.rows_written
+
+    def abort(self) -> None:
+        self._buffer, self._buffered_rows = [], 0
+        if self._tmp_path.exists():
+            self._tmp_path.unlink()
+
+
+# -------------------------------------------------------------------
+# Reading
+# -------------------------------------------------------------------
+
+def iter_csv_chunks(path: Path, chunk_rows: int = DEFAULT_CHUNK_ROWS, index_col: Optional[int] = 0) -> Iterator[pd.DataFrame]:
+    '''Compact chunks of a recap CSV, each holding whole rounds (rows of the round at a chunk's end carry over into the next one).'''
+    carry: Optional[pd.DataFrame] = None
+    for chunk in pd.read_csv(path, index_col=index_col, chunksize=max(chunk_rows, 1), low_memory=False):
+        if carry is not None:
+            chunk = pd.concat([carry, chunk])
+            carry = None
+        if 'round_guid' in chunk.columns and len(chunk):
+            guids = chunk['round_guid'].to_numpy()
+            tail = guids == guids[-1]
+            if not tail.all():
+                carry, chunk = chunk[tail].copy(), chunk[~tail].copy()
+            else:
+                carry, chunk = chunk, None
+        if chunk is not None:
+            yield compact_recap(chunk)
+    if carry is not None:
+        yield compact_recap(carry)
@@ -0,0 +1,486 @@
+'''
+Command line entry point for the UMEA pipeline.
+
+    python -m recap crawl-scores
+    python -m recap fetch-recaps
+    python -m recap build
+    python -m recap query --band "Lone Peak" --season "UMEA 2025"
+    python -m recap stats
+    python -m recap validate
+    python -m recap ratings --top 20
+    python -m recap percentile 67.05 --division 3A
+    python -m recap h2h "Lone Peak" --vs "American Fork" --season "UMEA 2025"
+    python -m recap movement "Lone Peak" --caption Music --season "UMEA 2025"
+    python -m recap shard --index 0 --count 4 --out-dir shards/
+    python -m recap merge-shards --out-dir shards/
+    python -m recap diff old_scores.csv umea_marching_band_scores_all_seasons.csv
+    python -m recap watch
+    python -m recap serve --port 8050
+
+Only the standard library is imported at module load. pandas, requests and
+BeautifulSoup are pulled in inside the subcommands that actually need them,
+so cheap commands like `stats` and `query` start in a few milliseconds.
+'''
+
+import argparse
+import csv
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from recap.config import (
+    SCORES_CSV_PATH,
+    ROUND_GUIDS_CSV_PATH,
+    ALL_RECAPS_CSV_PATH,
+    CATEGORY_RECAPS_CSV_PATH,
+    LIVE_EVENTS_PATH,
+    RATINGS_STATE_PATH,
+    NORMALIZED_CSV_PATH,
+    HEAD_TO_HEAD_PATH,
+    SCORE_CHANGES_PATH,
+)
+
+
+# -------------------------------------------------------------------
+# Helpers
+# -------------------------------------------------------------------
+
+def read_round_guids(path: Path) -> List[str]:
+    '''Reads the one-GUID-per-line CSV written by write_guid_csv.'''
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row[0] for row in csv.reader(f) if row and row[0]]
+
+
+def count_rows(path: Path) -> int:
+    '''Counts data rows in a CSV (header excluded) without parsing it.'''
+    with open(path, "rb") as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+
+# -------------------------------------------------------------------
+# Subcommands
+# -------------------------------------------------------------------
+
+def cmd_crawl_scores(args: argparse.Namespace) -> int:
+    from main import crawl_scores, fetch_session
+
+    with fetch_session():
+        round_guid_list, _ = crawl_scores()
+    print(f"Collected {len(round_guid_list)} round GUIDs")
+    return 0
+
+
+def cmd_fetch_recaps(args: argparse.Namespace) -> int:
+    if not ROUND_GUIDS_CSV_PATH.exists():
+        print(f"{ROUND_GUIDS_CSV_PATH} not found, run crawl-scores first.", file=sys.stderr)
+        return 1
+
+    from main import fetch_recaps, fetch_session
+
+    round_guid_list = read_round_guids(ROUND_GUIDS_CSV_PATH)
+    if args.limit:
+        round_guid_list = round_guid_list[:args.limit]
+
+    category_urls = None
+    if not args.no_categories and SCORES_CSV_PATH.exists():
+        from recap.category import category_urls_from_csv
+
+        category_urls = category_urls_from_csv(SCORES_CSV_PATH)
+
+    with fetch_session():
+        rows = fetch_recaps(round_guid_list, category_urls=category_urls, workers=args.workers, chunk_rows=args.chunk_rows)
+        print(f"Wrote {rows} recap rows to {ALL_RECAPS_CSV_PATH}")
+    return 0
+
+
+def cmd_build(args: argparse.Namespace) -> int:
+    from main import main as run_pipeline
+
+    run_pipeline()
+    return 0
+
+
+def cmd_query(args: argparse.Namespace) -> int:
+    path = ALL_RECAPS_CSV_PATH if args.recaps else SCORES_CSV_PATH
+    if not path.exists():
+        print(f"{path} not found.", file=sys.stderr)
+        return 1
+
+    band_field = "school" if args.recaps else "band_name"
+    filters: Dict[str, Optional[str]] = {
+        band_field: args.band,
+        "season_name": args.season,
+        "division_name": args.division,
+        "round_guid": args.round_guid,
+    }
+    filters = {k: v for k, v in filters.items() if v}
+
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        writer = csv.DictWriter(sys.stdout, fieldnames=reader.fieldnames or [])
+        writer.writeheader()
+        for row in reader:
+            if all(row.get(k) == v for k, v in filters.items()):
+                writer.writerow(row)
+    return 0
+
+
+def cmd_stats(args: argparse.Namespace) -> int:
+    from recap.UMEA_api import SEASON_GUID_DICT
+
+    print("Seasons:")
+    for season_name, season_id in SEASON_GUID_DICT.items():
+        print(f"  {season_name}  {season_id}")
+
+    print("Cached files:")
+    for path in (SCORES_CSV_PATH, ROUND_GUIDS_CSV_PATH, ALL_RECAPS_CSV_PATH, CATEGORY_RECAPS_CSV_PATH):
+        if path.exists():
+            rows = count_rows(path)
+            size_kb = path.stat().st_size / 1024
+            print(f"  {path}  {rows} rows  {size_kb:.1f} KB")
+        else:
+            print(f"  {path}  (missing)")
+    return 0
+
+
+def cmd_validate(args: argparse.Namespace) -> int:
+    if not ALL_RECAPS_CSV_PATH.exists():
+        print(f"{ALL_RECAPS_CSV_PATH} not found, run fetch-recaps first.", file=sys.stderr)
+        return 1
+
+    import time
+    import pandas as pd
+    from recap.validate import validate_recaps
+
+    df = pd.read_csv(ALL_RECAPS_CSV_PATH, index_col=0)
+    started = time.perf_counter()
+    report = validate_recaps(df, tolerance=args.tolerance)
+    elapsed = time.perf_counter() - started
+
+    print(f"Validated {len(df)} rows in {elapsed * 1000:.1f} ms")
+    for check, failures in report.summary().items():
+        if failures:
+            print(f"  {check}: {failures} failing row(s)")
+    return 1 if (~report.valid).any() else 0
+
+
+def cmd_shard(args: argparse.Namespace) -> int:
+    if not 0 <= args.index < args.count:
+        print("--index must be in [0, --count)", file=sys.stderr)
+        return 1
+
+    from recap.shard import run_competition_shard, run_round_shard
+
+    out_dir = Path(args.out_dir)
+    if args.by == "round":
+        if not ROUND_GUIDS_CSV_PATH.exists():
+            print(f"{ROUND_GUIDS_CSV_PATH} not found, run crawl-scores first.", file=sys.stderr)
+            return 1
+        n_scores, n_recaps = run_round_shard(
+            args.index, args.count, out_dir, read_round_guids(ROUND_GUIDS_CSV_PATH),
+        )
+    else:
+        from recap.UMEA_api import SEASON_GUID_DICT
+
+        n_scores, n_recaps = run_competition_shard(args.index, args.count, out_dir, SEASON_GUID_DICT)
+
+    print(f"shard {args.index}/{args.count}: {n_scores} score rows, {n_recaps} recap rows")
+    return 0
+
+
+def cmd_merge_shards(args: argparse.Namespace) -> int:
+    from recap.shard import merge_shards
+
+    n_scores, n_recaps = merge_shards(Path(args.out_dir), count=args.count)
+    print(f"merged {n_scores} score rows, {n_recaps} recap rows")
+    return 0
+
+
+def cmd_ratings(args: argparse.Namespace) -> int:
+    if not SCORES_CSV_PATH.exists():
+        print(f"{SCORES_CSV_PATH} not found, run crawl-scores first.", file=sys.stderr)
+        return 1
+
+    import pandas as pd
+    from recap.rating import RatingEngine
+
+    engine = RatingEngine() if args.recompute else RatingEngine.load(RATINGS_STATE_PATH)
+    processed = engine.update(pd.read_csv(SCORES_CSV_PATH))
+    engine.save(RATINGS_STATE_PATH)
+    print(f"Rated {processed} new round(s)")
+
+    if args.band:
+        from recap.bands import BAND_REGISTRY
+
+        print(engine.trajectory(BAND_REGISTRY.resolve(args.band)).to_string(index=False))
+    else:
+        print(engine.ratings_table().head(args.top).to_string(index=False))
+    return 0
+
+
+def cmd_percentile(args: argparse.Namespace) -> int:
+    import pandas as pd
+    from recap.normalize import NormalizedTables, long_from_recaps, long_from_scores
+
+    tables = NormalizedTables.load(NORMALIZED_CSV_PATH)
+    if tables.rows.empty:
+        # Nothing materialized yet: build from whatever table is cached
+        if ALL_RECAPS_CSV_PATH.exists():
+            tables.refresh(long_from_recaps(pd.read_csv(ALL_RECAPS_CSV_PATH, index_col=0)))
+        elif SCORES_CSV_PATH.exists():
+            tables.refresh(long_from_scores(pd.read_csv(SCORES_CSV_PATH)))
+        else:
+            print("No cached scores or recaps found.", file=sys.stderr)
+            return 1
+        tables.save(NORMALIZED_CSV_PATH)
+
+    pct = tables.percentile_of(
+        args.value, division=args.division, caption=args.caption,
+        season=args.season, week=args.week,
+    )
+    if pct is None:
+        print("No scores for that group.", file=sys.stderr)
+        return 1
+    print(f"{args.value} is at the {pct:.1f} percentile")
+    return 0
+
+
+def cmd_diff(args: argparse.Namespace) -> int:
+    for path in (args.old, args.new):
+        if not Path(path).exists():
+            print(f"{path} not found.", file=sys.stderr)
+            return 1
+
+    import json
+    from recap.diff import diff_files
+
+    diff = diff_files(Path(args.old), Path(args.new), key_cols=args.key)
+    summary = diff.summary()
+    print(", ".join(f"{n} {what}" for what, n in summary.items()), file=sys.stderr)
+
+    if args.events:
+        written = diff.write_jsonl(Path(args.events))
+        print(f"Appended {written} change(s) to {args.events}", file=sys.stderr)
+    else:
+        for event in diff.events():
+            print(json.dumps(event))
+    return 1 if args.exit_code and (summary["added"] or summary["removed"] or summary["changed"]) else 0
+
+
+def _load_head_to_head(rebuild: bool = False):
+    '''Saved head-to-head index, built from the cached recap table (and saved) the first time or when `rebuild` is set.'''
+    from recap.chunked import iter_csv_chunks
+    from recap.headtohead import HeadToHeadIndex
+
+    index = HeadToHeadIndex() if rebuild else HeadToHeadIndex.load(HEAD_TO_HEAD_PATH)
+    if not index.processed_rounds:
+        if not ALL_RECAPS_CSV_PATH.exists():
+            return None
+        for chunk in iter_csv_chunks(ALL_RECAPS_CSV_PATH):
+            index.update(chunk)
+        index.save(HEAD_TO_HEAD_PATH)
+    return index
+
+
+def cmd_h2h(args: argparse.Namespace) -> int:
+    index = _load_head_to_head(rebuild=args.rebuild)
+    if index is None:
+        print(f"{ALL_RECAPS_CSV_PATH} not found, run fetch-recaps first.", file=sys.stderr)
+        return 1
+
+    from recap.bands import BAND_REGISTRY
+
+    band = BAND_REGISTRY.resolve(args.band)
+    if args.vs:
+        other = BAND_REGISTRY.resolve(args.vs)
+        records = index.head_to_head(band, other, args.season, division=args.division)
+        if not records:
+            print("They haven't met in that season.", file=sys.stderr)
+            return 1
+        for rec in records:
+            print(f"{rec['division_name']}: {rec['wins']}-{rec['losses']}-{rec['ties']} in "
+                  f"{rec['meetings']} meeting(s), average margin {rec['avg_margin']:+.3f}")
+        return 0
+
+    table = index.opponents(band, args.season, division=args.division)
+    if table.empty:
+        print("No rounds for that band in that season.", file=sys.stderr)
+        return 1
+    print(table.to_string(index=False))
+    return 0
+
+
+def cmd_movement(args: argparse.Namespace) -> int:
+    index = _load_head_to_head(rebuild=args.rebuild)
+    if index is None:
+        print(f"{ALL_RECAPS_CSV_PATH} not found, run fetch-recaps first.", file=sys.stderr)
+        return 1
+
+    from recap.bands import BAND_REGISTRY
+
+    band = BAND_REGISTRY.resolve(args.band)
+    table = index.rank_movement(band, caption=args.caption, season=args.season)
+    if table.empty:
+        print("No ranks for that band / caption.", file=sys.stderr)
+        return 1
+    print(table.to_string(index=False))
+    return 0
+
+
+def cmd_watch(args: argparse.Namespace) -> int:
+    from recap.live import LiveWatcher, find_live_competitions
+
+    if args.competition:
+        competitions = [(guid, args.season) for guid in args.competition]
+    else:
+        from recap.UMEA_api import SEASON_GUID_DICT
+
+        competitions = find_live_competitions(SEASON_GUID_DICT)
+
+    if not competitions:
+        print("No competitions in progress today.")
+        return 0
+
+    watcher = LiveWatcher(
+        competitions,
+        events_path=Path(args.events),
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+        include_recaps=not args.no_recaps,
+    )
+    try:
+        watcher.run(max_cycles=args.cycles)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    from recap.service import DataStore, make_server
+
+    store = DataStore(check_interval=args.check_interval)
+    server = make_server(store, host=args.host, port=args.port)
+    print(f"Serving {len(store.scores)} score rows / {len(store.recaps)} recap rows "
+          f"on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+# -------------------------------------------------------------------
+# Parser
+# -------------------------------------------------------------------
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="recap", description="UMEA scores pipeline")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("crawl-scores", help="crawl the API and write the scores + round GUID CSVs")
+    p.set_defaults(func=cmd_crawl_scores)
+
+    p = sub.add_parser("fetch-recaps", help="fetch recap pages for cached round GUIDs")
+    p.add_argument("--limit", type=int, default=0, help="only fetch the first N rounds")
+    p.add_argument("--workers", type=int, default=8,
+                   help="threads shared by full and category recap fetches (the adaptive limit decides how many fetch at once)")
+    p.add_argument("--no-categories", action="store_true", help="skip category recap pages")
+    p.add_argument("--chunk-rows", type=int, default=5000, help="rows buffered before each write (bounds peak memory)")
+    p.set_defaults(func=cmd_fetch_recaps)
+
+    p = sub.add_parser("build", help="run the full pipeline (crawl-scores + fetch-recaps)")
+    p.set_defaults(func=cmd_build)
+
+    p = sub.add_parser("query", help="filter cached rows and print them as CSV")
+    p.add_argument("--band")
+    p.add_argument("--season")
+    p.add_argument("--division")
+    p.add_argument("--round-guid")
+    p.add_argument("--recaps", action="store_true", help="query the recap table instead of the scores table")
+    p.set_defaults(func=cmd_query)
+
+    p = sub.add_parser("stats", help="list seasons and what is cached on disk")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("validate", help="check judge weights, caption/total sums and ranks in the recap table")
+    p.add_argument("--tolerance", type=float, default=0.011)
+    p.set_defaults(func=cmd_validate)
+
+    p = sub.add_parser("ratings", help="update and print band ratings from the scores table")
+    p.add_argument("--top", type=int, default=25)
+    p.add_argument("--band", help="print this band's rating trajectory instead")
+    p.add_argument("--recompute", action="store_true", help="ignore saved state and rate the full history")
+    p.set_defaults(func=cmd_ratings)
+
+    p = sub.add_parser("percentile", help="historical percentile of a score within a division/caption")
+    p.add_argument("value", type=float)
+    p.add_argument("--division", required=True)
+    p.add_argument("--caption", default="Total", help="Total, SubTotal, Music, Visual, Percussion, Color Guard")
+    p.add_argument("--season", help="restrict to one season")
+    p.add_argument("--week", type=int, help="restrict to one week of --season")
+    p.set_defaults(func=cmd_percentile)
+
+    p = sub.add_parser("h2h", help="head-to-head record of a band against another band (or every opponent)")
+    p.add_argument("band")
+    p.add_argument("--vs", help="the other band (default: list every opponent)")
+    p.add_argument("--season", required=True)
+    p.add_argument("--division")
+    p.add_argument("--rebuild", action="store_true", help="rebuild the saved head-to-head index from the recap table first")
+    p.set_defaults(func=cmd_h2h)
+
+    p = sub.add_parser("movement", help="a band's caption ranks round over round, with the change from the previous round")
+    p.add_argument("band")
+    p.add_argument("--caption", help="Total, SubTotal, Music, MusEns, ... (default: all)")
+    p.add_argument("--season")
+    p.add_argument("--rebuild", action="store_true", help="rebuild the saved head-to-head index from the recap table first")
+    p.set_defaults(func=cmd_movement)
+
+    p = sub.add_parser("shard", help="crawl one deterministic shard of the backfill")
+    p.add_argument("--index", type=int, required=True)
+    p.add_argument("--count", type=int, required=True)
+    p.add_argument("--by", choices=["competition", "round"], default="competition")
+    p.add_argument("--out-dir", default="shards")
+    p.set_defaults(func=cmd_shard)
+
+    p = sub.add_parser("merge-shards", help="merge shard outputs into the canonical tables")
+    p.add_argument("--out-dir", default="shards")
+    p.add_argument("--count", type=int, default=None, help="only merge shards from a run with this count")
+    p.set_defaults(func=cmd_merge_shards)
+
+    p = sub.add_parser("diff", help="added/removed/changed rows between two scores or recap CSV snapshots")
+    p.add_argument("old")
+    p.add_argument("new")
+    p.add_argument("--key", action="append", help="key column(s) (default: performance_guid, or round_guid + school for recaps)")
+    p.add_argument("--events", nargs="?", const=str(SCORE_CHANGES_PATH), default=None,
+                   help=f"append the change log here instead of printing it (default {SCORE_CHANGES_PATH})")
+    p.add_argument("--exit-code", action="store_true", help="exit 1 if anything changed")
+    p.set_defaults(func=cmd_diff)
+
+    p = sub.add_parser("watch", help="poll in-progress competitions and append score changes as JSON lines")
+    p.add_argument("--competition", action="append", help="competition GUID (default: today's competitions)")
+    p.add_argument("--season", help="season name to tag rows with when --competition is given")
+    p.add_argument("--events", default=str(LIVE_EVENTS_PATH))
+    p.add_argument("--min-interval", type=float, default=5.0)
+    p.add_argument("--max-interval", type=float, default=120.0)
+    p.add_argument("--cycles", type=int, default=None)
+    p.add_argument("--no-recaps", action="store_true", help="only diff API scores, skip recap pages")
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser("serve", help="serve the pipeline outputs as a local read-only JSON API")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8050)
+    p.add_argument("--check-interval", type=float, default=2.0, help="seconds between file change checks")
+    p.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+'''Shared paths and URLs for the UMEA pipeline. Kept free of third-party imports so the CLI can read it without paying for pandas/requests/bs4.'''
+
+from pathlib import Path
+
+# -------------------------------------------------------------------
+# Config
+# -------------------------------------------------------------------
+
+BASE_RECAP_URL = "https://recaps.competitionsuite.com"
+SCORES_CSV_PATH = Path("umea_marching_band_scores_all_seasons.csv")
+ROUND_GUIDS_CSV_PATH = Path("umea_recap_guids.csv")
+ALL_RECAPS_CSV_PATH = Path("umea_all_recaps.csv")
+CATEGORY_RECAPS_CSV_PATH = Path("umea_category_recaps.csv")
+LIVE_EVENTS_PATH = Path("umea_live_events.jsonl")
+RATINGS_STATE_PATH = Path("umea_band_ratings.json")
+NORMALIZED_CSV_PATH = Path("umea_normalized_scores.csv")
+HEAD_TO_HEAD_PATH = Path("umea_head_to_head.npz")
+SCORE_CHANGES_PATH = Path("umea_score_changes.jsonl")
+HTTP_CACHE_PATH = Path("umea_http_cache.json")
+RUN_METRICS_PATH = Path("umea_run_metrics.json")
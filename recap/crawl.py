@@ -0,0 +1,114 @@
+'''
+Single-pass recap crawl.
+
+Every round has a full recap page and, from the API's categoryRecapUrl, a
+category recap page. Instead of a second crawl for the category pages, both
+kinds go into one job list in round order and run on one thread pool:
+
+    - the same requests session / connection pool (recap.session),
+    - the same scheduling: a bounded window of in-flight jobs, so a slow
+      page doesn't let the rest of the crawl race ahead and pile up results,
+    - the same workers for fetch + parse + DataFrame build,
+    - the same adaptive concurrency limit (recap.throttle), which only
+      gates the GETs, so parsing carries on while the limit is low.
+
+Results come back in round order as RoundRecaps, so callers stream them the
+same way they stream iter_recaps. A round whose full recap fails to fetch or
+parse is logged and left out (with its category recap) rather than ending
+the crawl; the number skipped is printed once the crawl is done.
+'''
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from recap.category import load_category_recap
+from recap.recap_page import load_tagged_recap
+
+# Threads; how many of them have a request in flight is up to recap.throttle's adaptive limit
+DEFAULT_WORKERS = 8
+
+FULL = 'full'
+CATEGORY = 'category'
+
+
+@dataclass
+class RoundRecaps:
+    '''Both recaps for one round; categories is None when there's no category URL or that page failed to parse.'''
+    round_guid: str
+    full: pd.DataFrame
+    categories: Optional[pd.DataFrame]
+
+
+def round_guid_of(url: str) -> str:
+    '''Same rule load_recap uses: last path segment without ".htm".'''
+    guid = url.rstrip("/").split("/")[-1]
+    return guid[:-4] if guid.endswith(".htm") else guid
+
+
+def _run_job(kind: str, round_guid: str, url: str, header_cols: List[str]) -> Optional[pd.DataFrame]:
+    # One page that won't load or parse shouldn't cost the rest of the crawl (or, for a
+    # category page, the round its full recap)
+    try:
+        if kind == FULL:
+            return load_tagged_recap(url, header_cols=header_cols)
+        return load_category_recap(url, round_guid)
+    except Exception as e:
+        print(f"Skipping {'recap' if kind == FULL else 'category recap'} {url}: {e}")
+        return None
+
+
+def iter_round_recaps(
+        recap_urls: List[str],
+        header_cols: List[str],
+        category_urls: Optional[Dict[str, str]] = None,
+        workers: int = DEFAULT_WORKERS,
+) -> Iterator[RoundRecaps]:
+    '''
+    Fetches and parses the full recap of every URL and, where category_urls
+    has one for the round, its category recap, all on one pool of `workers`
+    threads. Yields one RoundRecaps per full recap URL that loaded, in input
+    order.
+    '''
+    category_urls = category_urls or {}
+    jobs: List[Tuple[str, str, str]] = []
+    for url in recap_urls:
+        guid = round_guid_of(url)
+        jobs.append((FULL, guid, url))
+        if guid in category_urls:
+            jobs.append((CATEGORY, guid, category_urls[guid]))
+
+    window = max(workers * 2, 1)
+    pending: Deque[Tuple[str, str, Future]] = deque()
+    current: Optional[RoundRecaps] = None
+    failed = 0
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="recap") as pool:
+        job_iter = iter(jobs)
+
+        def submit(n: int) -> None:
+            for kind, guid, url in islice(job_iter, n):
+                pending.append((kind, guid, pool.submit(_run_job, kind, guid, url, header_cols)))
+
+        submit(window)
+        while pending:
+            kind, guid, future = pending.popleft()
+            submit(1)
+            df = future.result()
+
+            if kind == FULL:
+                if current is not None:
+                    yield current
+                current = RoundRecaps(round_guid=guid, full=df, categories=None) if df is not None else None
+                failed += df is None
+            elif current is not None:
+                current.categories = df
+
+        if current is not None:
+            yield current
+    if failed:
+        print(f"Skipped {failed} of {len(recap_urls)} round(s) whose full recap failed; they are retried next run")
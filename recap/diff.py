@@ -0,0 +1,377 @@
+'''
+Snapshot diffs for the scores and recap tables.
+
+CompetitionSuite sometimes corrects scores after a show. Every row the
+pipeline writes carries a `row_hash` (blake2b of its non-key fields, as
+written to the CSV), so comparing two snapshots is a hash join on the row key:
+
+    scores   performance_guid
+    recaps   round_guid + school
+
+Keys on one side only are added / removed, keys on both sides with different
+hashes are changed, and only the changed rows are compared field by field.
+Everything is a join or an array op over the two tables, so the cost is
+linear in the number of rows.
+
+diff_files() never holds either table whole: it reads just the key and
+row_hash columns of both files, joins those, then streams each file in
+chunks to pick out the added, removed and changed rows.
+
+The change log uses the same event shape as recap.live:
+
+    {"kind": "scores", "change": "changed", "key": {...}, "delta": {"score": ["67.05", "67.15"]}}
+'''
+
+import hashlib
+import json
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+import pandas as pd
+
+HASH_COL = 'row_hash'
+
+# Rows per chunk when a snapshot is streamed from disk
+SNAPSHOT_CHUNK_ROWS = 20_000
+
+SCORES_KEY: List[str] = ['performance_guid']
+RECAPS_KEY: List[str] = ['round_guid', 'school']
+
+# Field separator inside the hashed string; never appears in scraped text
+_SEP = '\x1f'
+
+
+# -------------------------------------------------------------------
+# Row hashes
+# -------------------------------------------------------------------
+
+def row_hash(values: Iterable[str]) -> str:
+    '''16-hex-digit blake2b of the field values (already in column order).'''
+    return hashlib.blake2b(_SEP.join(values).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _text(value) -> str:
+    '''A value the way it ends up in the CSV: None/NaN -> "", everything else str().'''
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    return str(value)
+
+
+def _hashed_cols(columns: Iterable[str], key_cols: Sequence[str]) -> List[str]:
+    skip = set(key_cols) | {HASH_COL}
+    return sorted(c for c in columns if c not in skip)
+
+
+def hash_record(record: dict, key_cols: Sequence[str]) -> str:
+    '''row_hash of one row dict (the csv.DictWriter path). Equal to hash_frame for the same row.'''
+    return row_hash(_text(record.get(c)) for c in _hashed_cols(record, key_cols))
+
+
+def hash_frame(df: pd.DataFrame, key_cols: Sequence[str]) -> pd.Series:
+    '''row_hash of every row. Columns are joined vectorized, then hashed once per row.'''
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object)
+
+    # By position: the recap table repeats SPACER, so a name can be more than one column
+    skip = set(key_cols) | {HASH_COL}
+    positions = sorted((c, i) for i, c in enumerate(df.columns) if c not in skip)
+
+    joined = None
+    for _, i in positions:
+        # astype(str) renders float32 the way to_csv does (72.35, not 72.3499984741211)
+        s = df.iloc[:, i]
+        text = s.astype(str).where(s.notna(), '')
+        joined = text if joined is None else joined + _SEP + text
+    if joined is None:
+        joined = pd.Series('', index=df.index)
+    return pd.Series([row_hash([s]) for s in joined], index=df.index, dtype=object)
+
+
+def add_row_hash(df: pd.DataFrame, key_cols: Sequence[str]) -> pd.DataFrame:
+    '''Sets (or refreshes) the row_hash column in place and returns df.'''
+    df[HASH_COL] = hash_frame(df, key_cols)
+    return df
+
+
+def ensure_row_hash(df: pd.DataFrame, key_cols: Sequence[str]) -> pd.DataFrame:
+    '''Hashes only the rows that have no row_hash yet (older files, mixed shards), in place.'''
+    if HASH_COL not in df.columns:
+        return add_row_hash(df, key_cols)
+    missing = df[HASH_COL].isna() | (df[HASH_COL] == '')
+    if missing.any():
+        df.loc[missing, HASH_COL] = hash_frame(df.loc[missing].drop(columns=HASH_COL), key_cols)
+    return df
+
+
+# -------------------------------------------------------------------
+# Snapshots
+# -------------------------------------------------------------------
+
+def infer_key(columns: Iterable[str]) -> List[str]:
+    '''SCORES_KEY for a scores table, RECAPS_KEY otherwise.'''
+    return list(SCORES_KEY) if 'performance_guid' in set(columns) else list(RECAPS_KEY)
+
+
+def read_snapshot(path: Path, key_cols: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    '''
+    Reads a scores or recaps CSV as text (so values compare exactly as
+    written), drops the recap table's unnamed index column and fills in
+    row_hash for files written before it existed.
+    '''
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    df = df.drop(columns=[c for c in df.columns if c.startswith('Unnamed: ')])
+    key_cols = list(key_cols) if key_cols else infer_key(df.columns)
+    return ensure_row_hash(df, key_cols)
+
+
+def _drop_unnamed(df: pd.DataFrame) -> pd.DataFrame:
+    return df.drop(columns=[c for c in df.columns if c.startswith('Unnamed: ')])
+
+
+def _with_key(df: pd.DataFrame, key_cols: List[str]) -> pd.DataFrame:
+    has_key = df[key_cols].notna().all(axis=1) & (df[key_cols].astype(str) != '').all(axis=1)
+    return df[has_key]
+
+
+def read_key_hashes(
+        path: Path,
+        key_cols: Optional[Sequence[str]] = None,
+        chunk_rows: int = SNAPSHOT_CHUNK_ROWS,
+) -> pd.DataFrame:
+    '''Just the key columns and row_hash of a snapshot (duplicate keys keep the last row). Files without row_hash are hashed chunk by chunk.'''
+    columns = pd.read_csv(path, nrows=0).columns
+    key_cols = list(key_cols) if key_cols else infer_key(columns)
+    keys = None
+    if HASH_COL in columns:
+        keys = pd.read_csv(path, usecols=key_cols + [HASH_COL], dtype=str, keep_default_na=False)
+        if (keys[HASH_COL] == '').any():
+            keys = None
+    if keys is None:
+        parts = [
+            ensure_row_hash(_drop_unnamed(chunk), key_cols)[key_cols + [HASH_COL]]
+            for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+        ]
+        keys = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=key_cols + [HASH_COL])
+    return _with_key(keys, key_cols).drop_duplicates(subset=key_cols, keep='last').reset_index(drop=True)
+
+
+def read_rows(
+        path: Path,
+        key_cols: List[str],
+        keys: pd.DataFrame,
+        chunk_rows: int = SNAPSHOT_CHUNK_ROWS,
+) -> pd.DataFrame:
+    '''The rows of a snapshot whose key is in `keys`, as text, streamed chunk by chunk so only the matches are kept.'''
+    wanted = pd.MultiIndex.from_frame(keys[key_cols])
+    parts = []
+    for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows):
+        chunk = _drop_unnamed(chunk)
+        if len(wanted):
+            hit = pd.MultiIndex.from_frame(chunk[key_cols]).isin(wanted)
+            chunk = chunk[hit]
+        else:
+            chunk = chunk.iloc[:0]
+        parts.append(chunk)
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=key_cols)
+
+
+def keep_previous(path: Path) -> Optional[Path]:
+    '''Copies a table about to be rewritten to `<name>.previous` so this run can be diffed against it afterwards. None if there is no table yet.'''
+    path = Path(path)
+    if not path.exists():
+        return None
+    previous = path.with_name(path.name + '.previous')
+    shutil.copyfile(path, previous)
+    return previous
+
+
+# -------------------------------------------------------------------
+# Diff
+# -------------------------------------------------------------------
+
+@dataclass
+class DatasetDiff:
+    '''added / removed rows, the new side of changed rows, and one row per changed field (key cols + field, old, new).'''
+    kind: str
+    key_cols: List[str]
+    added: pd.DataFrame
+    removed: pd.DataFrame
+    deltas: pd.DataFrame
+    unchanged: int
+    changed_rows: Optional[pd.DataFrame] = None
+
+    @property
+    def changed(self) -> int:
+        return len(self.deltas[self.key_cols].drop_duplicates()) if not self.deltas.empty else 0
+
+    def touched(self, column: str = 'round_guid') -> Set[str]:
+        '''Values of `column` (e.g. round_guid) on every added, removed or changed row, old and new side.'''
+        values: Set[str] = set()
+        for df in (self.added, self.removed, self.changed_rows):
+            if df is not None and column in df.columns:
+                values.update(v for v in df[column].dropna().astype(str) if v)
+        if not self.deltas.empty and column in self.key_cols:
+            values.update(self.deltas[column].astype(str))
+        if not self.deltas.empty:
+            # A row moved between rounds: the one it left is touched too
+            moved = self.deltas[self.deltas['field'] == column]
+            values.update(v for v in moved['old'].astype(str) if v)
+        return values
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            'added': len(self.added),
+            'removed': len(self.removed),
+            'changed': self.changed,
+            'unchanged': self.unchanged,
+        }
+
+    def events(self) -> List[dict]:
+        '''The change log: one event per added, removed or changed row.'''
+        events: List[dict] = []
+        for row in self.added.to_dict('records'):
+            events.append({
+                'kind': self.kind, 'change': 'added',
+                'key': {k: row[k] for k in self.key_cols}, 'row': row,
+            })
+        for row in self.removed[self.key_cols].to_dict('records'):
+            events.append({'kind': self.kind, 'change': 'removed', 'key': row})
+
+        by_key: Dict[tuple, dict] = {}
+        for rec in self.deltas.to_dict('records'):
+            key = tuple(rec[k] for k in self.key_cols)
+            event = by_key.get(key)
+            if event is None:
+                event = by_key[key] = {
+                    'kind': self.kind, 'change': 'changed',
+                    'key': dict(zip(self.key_cols, key)), 'delta': {},
+                }
+            event['delta'][rec['field']] = [rec['old'], rec['new']]
+        events.extend(by_key.values())
+        return events
+
+    def write_jsonl(self, path: Path) -> int:
+        '''Appends the change log to `path` as JSON lines. Returns the number of events written.'''
+        events = self.events()
+        if events:
+            with open(path, 'a', encoding='utf-8') as f:
+                for event in events:
+                    f.write(json.dumps(event) + '\n')
+        return len(events)
+
+
+def _keyed(df: pd.DataFrame, key_cols: List[str]) -> pd.DataFrame:
+    df = ensure_row_hash(_drop_unnamed(df), key_cols)
+    return _with_key(df, key_cols).drop_duplicates(subset=key_cols, keep='last').reset_index(drop=True)
+
+
+def _join_hashes(old: pd.DataFrame, new: pd.DataFrame, key_cols: List[str]):
+    '''Outer join of two key + row_hash frames: (added keys, removed keys, changed keys, keys on both sides).'''
+    joined = old[key_cols + [HASH_COL]].merge(
+        new[key_cols + [HASH_COL]], on=key_cols, how='outer',
+        suffixes=('_old', '_new'), indicator=True,
+    )
+    side = joined['_merge']
+    both = side == 'both'
+    differs = both & (joined[f'{HASH_COL}_old'] != joined[f'{HASH_COL}_new'])
+    return (
+        joined.loc[side == 'right_only', key_cols],
+        joined.loc[side == 'left_only', key_cols],
+        joined.loc[differs, key_cols],
+        int(both.sum()),
+    )
+
+
+def diff_frames(
+        old: pd.DataFrame,
+        new: pd.DataFrame,
+        key_cols: Optional[Sequence[str]] = None,
+        kind: Optional[str] = None,
+) -> DatasetDiff:
+    '''Hash-join diff of two snapshots of the same table. Rows without a key are ignored; duplicate keys keep the last row.'''
+    key_cols = list(key_cols) if key_cols else infer_key(new.columns)
+    kind = kind or ('scores' if key_cols == SCORES_KEY else 'recaps')
+    old = _keyed(old, key_cols)
+    new = _keyed(new, key_cols)
+
+    added_keys, removed_keys, changed_keys, both = _join_hashes(old, new, key_cols)
+    added = new.merge(added_keys, on=key_cols, how='inner')
+    removed = old.merge(removed_keys, on=key_cols, how='inner')
+    deltas = _field_deltas(old, new, changed_keys, key_cols)
+    changed = new.merge(changed_keys, on=key_cols, how='inner')
+    return _dataset_diff(kind, key_cols, added, removed, deltas, both, changed)
+
+
+def _dataset_diff(kind: str, key_cols: List[str], added: pd.DataFrame, removed: pd.DataFrame,
+                  deltas: pd.DataFrame, both: int, changed: pd.DataFrame) -> DatasetDiff:
+    return DatasetDiff(
+        kind=kind,
+        key_cols=key_cols,
+        added=added.drop(columns=HASH_COL, errors='ignore'),
+        removed=removed.drop(columns=HASH_COL, errors='ignore'),
+        deltas=deltas,
+        unchanged=both - (len(deltas[key_cols].drop_duplicates()) if not deltas.empty else 0),
+        changed_rows=changed.drop(columns=HASH_COL, errors='ignore'),
+    )
+
+
+def _field_deltas(
+        old: pd.DataFrame,
+        new: pd.DataFrame,
+        changed_keys: pd.DataFrame,
+        key_cols: List[str],
+) -> pd.DataFrame:
+    '''Compares only the rows whose hashes differ, as one aligned 2-D array per side.'''
+    out_cols = key_cols + ['field', 'old', 'new']
+    if changed_keys.empty:
+        return pd.DataFrame(columns=out_cols)
+
+    fields = _hashed_cols(set(old.columns) | set(new.columns), key_cols)
+    idx = pd.MultiIndex.from_frame(changed_keys)
+    old_vals = _aligned_text(old, key_cols, idx, fields)
+    new_vals = _aligned_text(new, key_cols, idx, fields)
+
+    rows, cols = np.nonzero(old_vals != new_vals)
+    deltas = changed_keys.iloc[rows].reset_index(drop=True)
+    deltas['field'] = np.asarray(fields, dtype=object)[cols]
+    deltas['old'] = old_vals[rows, cols]
+    deltas['new'] = new_vals[rows, cols]
+    return deltas[out_cols]
+
+
+def _aligned_text(df: pd.DataFrame, key_cols: List[str], idx: pd.MultiIndex, fields: List[str]) -> np.ndarray:
+    aligned = df.set_index(key_cols)
+    aligned.index = pd.MultiIndex.from_frame(aligned.index.to_frame(index=False))
+    aligned = aligned.reindex(index=idx, columns=fields).astype(object)
+    return aligned.where(aligned.notna(), '').astype(str).to_numpy()
+
+
+def diff_files(
+        old_path: Path,
+        new_path: Path,
+        key_cols: Optional[Sequence[str]] = None,
+        kind: Optional[str] = None,
+        chunk_rows: int = SNAPSHOT_CHUNK_ROWS,
+) -> DatasetDiff:
+    '''
+    diff_frames over two CSV snapshots, read as text. Only the key and
+    row_hash columns of both files are held whole; the added, removed and
+    changed rows are then picked out of each file chunk by chunk.
+    '''
+    new_keys = read_key_hashes(new_path, key_cols, chunk_rows)
+    key_cols = list(key_cols) if key_cols else infer_key(new_keys.columns)
+    kind = kind or ('scores' if key_cols == SCORES_KEY else 'recaps')
+    old_keys = read_key_hashes(old_path, key_cols, chunk_rows)
+
+    added_keys, removed_keys, changed_keys, both = _join_hashes(old_keys, new_keys, key_cols)
+    added = _keyed(read_rows(new_path, key_cols, added_keys, chunk_rows), key_cols)
+    removed = _keyed(read_rows(old_path, key_cols, removed_keys, chunk_rows), key_cols)
+    changed = _keyed(read_rows(new_path, key_cols, changed_keys, chunk_rows), key_cols)
+    deltas = _field_deltas(
+        _keyed(read_rows(old_path, key_cols, changed_keys, chunk_rows), key_cols),
+        changed, changed_keys, key_cols,
+    )
+    return _dataset_diff(kind, key_cols, added, removed, deltas, both, changed)
@@ -0,0 +1,306 @@
+'''
+Precomputed head-to-head records and rank movement.
+
+Two structures built from the recap table and kept up to date as rounds
+land, so director questions are lookups instead of frame filters:
+
+Head-to-head, per (season, division): dense NumPy matrices indexed by band
+(`bands[i]` is the band_id of row/column i)
+
+    meetings[i, j]   rounds both bands were in
+    wins[i, j]       rounds band i finished above band j on Total
+    margin[i, j]     sum of (Total_i - Total_j) over those rounds
+
+losses are wins.T and ties are meetings - wins - wins.T. All pairs in a
+batch of rounds are formed with one self-join on round_guid and added with
+np.add.at, so there is no per-round Python loop.
+
+Rank movement, per band x caption: the band's rank for every caption that
+has one (Music_Rank, MusEns_*Tot_rank, SubTotal_Rank, Rank, ...) at each
+round in date order, with the change from its previous round that season
+(`movement` > 0 means it moved up).
+
+update() skips rounds it has already seen. A round that changed after it
+was folded in (a corrected score, more bands posted mid-competition) is
+passed to forget(), which drops its whole season/division group so the
+next update() over the recap table adds every round of that group back;
+matrix sums can't be taken apart per round, and a group is small. State is
+saved as one .npz.
+'''
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from recap.validate import discover_layout
+
+GroupKey = Tuple[str, str]   # (season_name, division_name)
+
+MOVEMENT_COLS = ['season_name', 'band_id', 'caption', 'competition_date',
+                 'round_guid', 'rank', 'movement']
+MOVEMENT_SERIES = ['season_name', 'band_id', 'caption']
+
+
+def caption_of(total_col: str) -> str:
+    '''Caption name for a total column: "Music_Total" -> "Music", "MusEns_*Tot_score" -> "MusEns", "Total" -> "Total".'''
+    if total_col.endswith('_Total'):
+        return total_col[:-len('_Total')]
+    if total_col.endswith('_*Tot_score'):
+        return total_col[:-len('_*Tot_score')]
+    return total_col
+
+
+class HeadToHead:
+    '''Matrices for one season + division. Grows in place when new bands show up.'''
+
+    def __init__(self, bands: Optional[List[str]] = None):
+        self.bands: List[str] = list(bands or [])
+        self.index: Dict[str, int] = {b: i for i, b in enumerate(self.bands)}
+        n = len(self.bands)
+        self.meetings = np.zeros((n, n), dtype=np.int32)
+        self.wins = np.zeros((n, n), dtype=np.int32)
+        self.margin = np.zeros((n, n), dtype=np.float64)
+
+    def _indices(self, band_ids: np.ndarray) -> np.ndarray:
+        '''Row/column index for every band id, growing the matrices for unseen bands.'''
+        new = [b for b in pd.unique(band_ids) if b not in self.index]
+        if new:
+            for b in new:
+                self.index[b] = len(self.bands)
+                self.bands.append(b)
+            grow = len(new)
+            self.meetings = np.pad(self.meetings, ((0, grow), (0, grow)))
+            self.wins = np.pad(self.wins, ((0, grow), (0, grow)))
+            self.margin = np.pad(self.margin, ((0, grow), (0, grow)))
+        return np.fromiter((self.index[b] for b in band_ids), dtype=np.int64, count=len(band_ids))
+
+    def add_rounds(self, rows: pd.DataFrame) -> None:
+        '''rows: round_guid, band_id, total for one or more rounds of this group.'''
+        rows = rows.assign(idx=self._indices(rows['band_id'].to_numpy()))
+        pairs = rows.merge(rows, on='round_guid', suffixes=('_a', '_b'))
+        pairs = pairs[pairs['idx_a'] != pairs['idx_b']]
+
+        a = pairs['idx_a'].to_numpy()
+        b = pairs['idx_b'].to_numpy()
+        diff = pairs['total_a'].to_numpy() - pairs['total_b'].to_numpy()
+        np.add.at(self.meetings, (a, b), 1)
+        np.add.at(self.wins, (a, b), (diff > 0).astype(np.int32))
+        np.add.at(self.margin, (a, b), diff)
+
+    def record(self, band_a: str, band_b: str) -> Optional[dict]:
+        i, j = self.index.get(band_a), self.index.get(band_b)
+        if i is None or j is None or self.meetings[i, j] == 0:
+            return None
+        meetings = int(self.meetings[i, j])
+        wins, losses = int(self.wins[i, j]), int(self.wins[j, i])
+        return {
+            'meetings': meetings,
+            'wins': wins,
+            'losses': losses,
+            'ties': meetings - wins - losses,
+            'avg_margin': round(float(self.margin[i, j]) / meetings, 3),
+        }
+
+    def opponents(self, band_id: str) -> pd.DataFrame:
+        '''One row per band this one has met: meetings, wins, losses, ties, avg_margin.'''
+        i = self.index.get(band_id)
+        if i is None:
+            return pd.DataFrame(columns=['opponent', 'meetings', 'wins', 'losses', 'ties', 'avg_margin'])
+        met = np.nonzero(self.meetings[i])[0]
+        meetings = self.meetings[i, met]
+        wins = self.wins[i, met]
+        losses = self.wins[met, i]
+        return pd.DataFrame({
+            'opponent': [self.bands[j] for j in met],
+            'meetings': meetings,
+            'wins': wins,
+            'losses': losses,
+            'ties': meetings - wins - losses,
+            'avg_margin': np.round(self.margin[i, met] / meetings, 3),
+        }).sort_values(['meetings', 'avg_margin'], ascending=[False, False], ignore_index=True)
+
+
+class HeadToHeadIndex:
+    '''HeadToHead per (season, division) plus the rank-movement table.'''
+
+    def __init__(self) -> None:
+        self.groups: Dict[GroupKey, HeadToHead] = {}
+        self.movement = pd.DataFrame(columns=MOVEMENT_COLS)
+        self.round_groups: Dict[str, GroupKey] = {}   # round_guid -> group it was added to
+
+    @property
+    def processed_rounds(self) -> Set[str]:
+        return set(self.round_groups)
+
+    @classmethod
+    def build(cls, recaps: pd.DataFrame) -> "HeadToHeadIndex":
+        index = cls()
+        index.update(recaps)
+        return index
+
+    # ---------- Updating ----------
+
+    def update(self, recaps: pd.DataFrame) -> int:
+        '''Folds in every round of `recaps` not seen before. Returns the number of rounds added.'''
+        needed = {'round_guid', 'band_id', 'season_name', 'division_name', 'Total'}
+        if recaps.empty or not needed <= set(recaps.columns):
+            return 0
+
+        new = recaps[~recaps['round_guid'].astype(str).isin(self.processed_rounds)]
+        new = new.dropna(subset=['round_guid', 'band_id'])
+        if new.empty:
+            return 0
+
+        self._update_matrices(new)
+        self._update_movement(new)
+        firsts = new.drop_duplicates(subset=['round_guid'])
+        for round_guid, season, division in zip(firsts['round_guid'].astype(str),
+                                                firsts['season_name'].astype(str),
+                                                firsts['division_name'].astype(str)):
+            self.round_groups[round_guid] = (season, division)
+        return len(firsts)
+
+    def forget(self, rounds: Iterable[str]) -> Set[str]:
+        '''Drops the matrices of every season/division group one of `rounds` was added to, and those groups' rounds from the movement table, so the next update() over the recap table folds them all back in. Returns the rounds dropped.'''
+        groups = {self.round_groups[r] for r in map(str, rounds) if r in self.round_groups}
+        if not groups:
+            return set()
+        dropped = {r for r, key in self.round_groups.items() if key in groups}
+        for key in groups:
+            self.groups.pop(key, None)
+        for r in dropped:
+            del self.round_groups[r]
+
+        current = self.movement
+        gone = current['round_guid'].isin(dropped).to_numpy()
+        if gone.any():
+            # Series that lost points need their movement re-diffed across the gap
+            lost = pd.MultiIndex.from_frame(current.loc[gone, MOVEMENT_SERIES].drop_duplicates())
+            kept = current.loc[~gone]
+            redo = pd.MultiIndex.from_frame(kept[MOVEMENT_SERIES]).isin(lost)
+            self.movement = pd.concat([kept.loc[~redo], _rediff(kept.loc[redo])], ignore_index=True)
+        return dropped
+
+    def _update_matrices(self, new: pd.DataFrame) -> None:
+        rows = pd.DataFrame({
+            'season_name': new['season_name'].astype(str).to_numpy(),
+            'division_name': new['division_name'].astype(str).to_numpy(),
+            'round_guid': new['round_guid'].astype(str).to_numpy(),
+            'band_id': new['band_id'].astype(str).to_numpy(),
+            'total': pd.to_numeric(new['Total'], errors='coerce').to_numpy(dtype=float),
+        }).dropna(subset=['total'])
+        # A band listed twice in one round would pair with itself under another index
+        rows = rows.drop_duplicates(subset=['round_guid', 'band_id'])
+
+        for key, group in rows.groupby(['season_name', 'division_name'], sort=False):
+            h2h = self.groups.setdefault(key, HeadToHead())
+            h2h.add_rounds(group[['round_guid', 'band_id', 'total']])
+
+    def _update_movement(self, new: pd.DataFrame) -> None:
+        layout = discover_layout(list(new.columns))
+        if not layout.rank_pairs:
+            return
+
+        rank_cols = {rank_col: caption_of(total_col) for total_col, rank_col in layout.rank_pairs}
+        id_cols = ['season_name', 'band_id', 'competition_date', 'round_guid']
+        present = [c for c in id_cols if c in new.columns]
+        long = new[present + list(rank_cols)].melt(
+            id_vars=present, value_vars=list(rank_cols), var_name='caption', value_name='rank',
+        )
+        long['caption'] = long['caption'].map(rank_cols)
+        long['rank'] = pd.to_numeric(long['rank'], errors='coerce').astype(float)
+        for col in id_cols:
+            if col not in long.columns:
+                long[col] = None
+            long[col] = long[col].astype(str)
+        long = long.dropna(subset=['rank'])
+
+        # Only the (season, band, caption) series that got new points need re-diffing
+        touched = pd.MultiIndex.from_frame(long[MOVEMENT_SERIES].drop_duplicates())
+        current = self.movement
+        in_touched = pd.MultiIndex.from_frame(current[MOVEMENT_SERIES]).isin(touched) if len(current) else np.zeros(0, bool)
+
+        redo = pd.concat([current.loc[in_touched, long.columns.intersection(current.columns)], long],
+                         ignore_index=True)
+        self.movement = pd.concat([current.loc[~in_touched], _rediff(redo)], ignore_index=True)
+
+    # ---------- Lookups ----------
+
+    def head_to_head(self, band_a: str, band_b: str, season: str, division: Optional[str] = None) -> List[dict]:
+        '''Record of band_a against band_b in a season, one dict per division they met in.'''
+        out = []
+        for (s, d), h2h in self.groups.items():
+            if s != season or (division is not None and d != division):
+                continue
+            rec = h2h.record(band_a, band_b)
+            if rec is not None:
+                out.append({'season_name': s, 'division_name': d, **rec})
+        return out
+
+    def opponents(self, band_id: str, season: str, division: Optional[str] = None) -> pd.DataFrame:
+        frames = []
+        for (s, d), h2h in self.groups.items():
+            if s == season and (division is None or d == division) and band_id in h2h.index:
+                frames.append(h2h.opponents(band_id).assign(division_name=d))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def rank_movement(self, band_id: str, caption: Optional[str] = None, season: Optional[str] = None) -> pd.DataFrame:
+        m = self.movement
+        mask = m['band_id'] == band_id
+        if caption is not None:
+            mask &= m['caption'] == caption
+        if season is not None:
+            mask &= m['season_name'] == season
+        return m[mask].reset_index(drop=True)
+
+    # ---------- Persistence ----------
+
+    def save(self, path: Path) -> None:
+        arrays: Dict[str, np.ndarray] = {}
+        keys = list(self.groups)
+        for n, key in enumerate(keys):
+            h2h = self.groups[key]
+            arrays[f'bands_{n}'] = np.array(h2h.bands, dtype=str)
+            arrays[f'meetings_{n}'] = h2h.meetings
+            arrays[f'wins_{n}'] = h2h.wins
+            arrays[f'margin_{n}'] = h2h.margin
+        for col in MOVEMENT_COLS:
+            values = self.movement[col].to_numpy()
+            arrays[f'movement_{col}'] = values.astype(float) if col in ('rank', 'movement') else values.astype(str)
+        meta = {'keys': [list(k) for k in keys],
+                'round_groups': {r: list(key) for r, key in sorted(self.round_groups.items())}}
+        arrays['meta'] = np.array(json.dumps(meta))
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> "HeadToHeadIndex":
+        '''Loads saved state, or returns an empty index if `path` doesn't exist yet.'''
+        index = cls()
+        if not Path(path).exists():
+            return index
+
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if 'round_groups' not in meta:
+                # Saved before rounds were tracked per group: can't forget() from it, start over
+                return index
+            for n, key in enumerate(meta['keys']):
+                h2h = HeadToHead(data[f'bands_{n}'].tolist())
+                h2h.meetings = data[f'meetings_{n}']
+                h2h.wins = data[f'wins_{n}']
+                h2h.margin = data[f'margin_{n}']
+                index.groups[tuple(key)] = h2h
+            index.movement = pd.DataFrame({col: data[f'movement_{col}'] for col in MOVEMENT_COLS})
+        index.round_groups = {r: tuple(key) for r, key in meta['round_groups'].items()}
+        return index
+
+
+def _rediff(points: pd.DataFrame) -> pd.DataFrame:
+    '''Rank points of whole series in date order, with `movement` recomputed from each previous point.'''
+    points = points.sort_values(MOVEMENT_SERIES + ['competition_date', 'round_guid'], kind='stable', ignore_index=True)
+    points['movement'] = -points.groupby(MOVEMENT_SERIES, sort=False)['rank'].diff()
+    return points[MOVEMENT_COLS]
@@ -0,0 +1,250 @@
+'''
+Live competition-day mode.
+
+Instead of re-crawling every season, LiveWatcher polls only the competitions
+that are in progress. Each cycle it
+    1) pulls GetCompetition for each live competition,
+    2) diffs the flattened performances against the previous snapshot,
+    3) re-fetches the recap page only for rounds whose scores moved,
+    4) emits just the changed rows, as JSON lines and/or to a callback.
+
+Rows that disappear (a performance pulled from the results, a band dropped
+from a recap) are emitted as "removed". A competition or recap that fails to
+fetch or parse is logged and skipped for the cycle: its previous snapshot is
+kept, so nothing is reported as removed, and a failed recap is retried on
+the next cycle.
+
+The poll interval adapts: it snaps back to `min_interval` as soon as a change
+is seen and backs off towards `max_interval` while nothing is moving.
+'''
+
+import datetime as dt
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import requests
+
+from recap.UMEA_api import (
+    flatten_competition_results,
+    get_competition_results,
+    get_competitions_for_season,
+)
+from recap.config import BASE_RECAP_URL
+from recap.revalidate import VALIDATOR_CACHE
+from recap.throttle import CONCURRENCY
+
+# Fields compared between snapshots for API-level performance rows
+PERF_FIELDS: Tuple[str, ...] = ('band_name', 'division_name', 'score', 'rank')
+
+# Smaller pre-request sleep than the bulk crawl; we only hit a handful of URLs
+LIVE_JITTER = 0.25
+
+# A poll that hits one of these skips that competition / round for the cycle;
+# the parse errors are what a truncated or half-rendered page turns into
+POLL_ERRORS = (requests.RequestException, ValueError, KeyError, IndexError, AttributeError)
+
+
+def find_live_competitions(
+        season_guid_dict: Dict[str, str],
+        on_date: Optional[dt.date] = None,
+) -> List[Tuple[str, str]]:
+    '''
+    Returns (competition_guid, season_name) for every competition whose
+    competitionDate falls on `on_date` (today by default).
+    '''
+    on_date = on_date or dt.date.today()
+    live: List[Tuple[str, str]] = []
+    for season_name, season_id in season_guid_dict.items():
+        for c in get_competitions_for_season(season_id, jitter=LIVE_JITTER):
+            comp_date = (c.get("competitionDate") or "")[:10]
+            if comp_date == on_date.isoformat():
+                live.append((c.get("competitionGuid"), season_name))
+    return live
+
+
+def load_recap_records(round_guid: str) -> List[dict]:
+    '''Fetches one recap page and returns its score rows as dicts keyed by the renamed headers.'''
+    from recap.recap_page import RecapPage, TransformHeader
+
+    page = RecapPage(f"{BASE_RECAP_URL}/{round_guid}.htm")
+    page.fetch()
+    header_cols = TransformHeader().update_header(page.parse_header())
+    return [
+        dict(zip(header_cols, row_values))
+        for row_values in page.parse_scores(first_data_row=6)
+    ]
+
+
+class LiveWatcher:
+    '''Polls a fixed set of competitions and emits only what changed since the last cycle.'''
+
+    def __init__(
+            self,
+            competitions: Iterable[Tuple[str, str]],
+            events_path: Optional[Path] = None,
+            callback: Optional[Callable[[dict], None]] = None,
+            min_interval: float = 5.0,
+            max_interval: float = 120.0,
+            backoff: float = 1.5,
+            include_recaps: bool = True,
+    ):
+        self.competitions = list(competitions)
+        self.events_path = events_path
+        self.callback = callback
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.include_recaps = include_recaps
+
+        self.interval = min_interval
+        self.cycles = 0
+        self.errors = 0
+
+        # performance_guid -> PERF_FIELDS values
+        self._perf_snapshot: Dict[str, Tuple] = {}
+        # competition_guid -> {performance_guid -> round_guid}, to spot removals
+        self._perfs_by_competition: Dict[str, Dict[str, str]] = {}
+        # rounds whose recap failed to load; retried next cycle
+        self._pending_rounds: Set[str] = set()
+        # round_guid -> {school -> recap row}
+        self._recap_snapshot: Dict[str, Dict[str, dict]] = {}
+
+    # ---------- Public API ----------
+
+    def poll_once(self) -> List[dict]:
+        '''Runs one poll cycle, emits the resulting events and adapts the interval. Returns the events.'''
+        events: List[dict] = []
+        changed_rounds: Set[str] = set(self._pending_rounds)
+        self._pending_rounds.clear()
+
+        for comp_guid, season_name in self.competitions:
+            try:
+                comp_data = get_competition_results(comp_guid, jitter=LIVE_JITTER)
+                rows = flatten_competition_results(comp_data, season_name=season_name)
+            except POLL_ERRORS as e:
+                self._log_error(f"competition {comp_guid}", e)
+                continue
+
+            current: Dict[str, str] = {}
+            for row in rows:
+                event = self._diff_performance(row)
+                if row.get("performance_guid"):
+                    current[row["performance_guid"]] = row.get("round_guid")
+                if event is not None:
+                    events.append(event)
+                    changed_rounds.add(row["round_guid"])
+
+            previous = self._perfs_by_competition.get(comp_guid, {})
+            for guid in sorted(set(previous) - set(current)):
+                events.append(self._removed_performance(comp_guid, guid, previous[guid]))
+                changed_rounds.add(previous[guid])
+            self._perfs_by_competition[comp_guid] = current
+
+        if self.include_recaps:
+            for round_guid in sorted(g for g in changed_rounds if g):
+                try:
+                    events.extend(self._diff_recap(round_guid))
+                except POLL_ERRORS as e:
+                    self._log_error(f"recap {round_guid}", e)
+                    self._pending_rounds.add(round_guid)
+
+        self._emit(events)
+        self.cycles += 1
+
+        if events:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+        return events
+
+    def run(self, max_cycles: Optional[int] = None) -> None:
+        '''Polls until interrupted (or for max_cycles), sleeping the adaptive interval minus the time spent polling.'''
+        while max_cycles is None or self.cycles < max_cycles:
+            started = time.monotonic()
+            events = self.poll_once()
+            elapsed = time.monotonic() - started
+            print(f"cycle {self.cycles}: {len(events)} change(s) in {elapsed:.2f}s, "
+                  f"next poll in {self.interval:.1f}s ({VALIDATOR_CACHE.stats.summary()}; "
+                  f"concurrency limit {CONCURRENCY.limit}; {self.errors} error(s) so far)")
+            if max_cycles is not None and self.cycles >= max_cycles:
+                break
+            time.sleep(max(self.interval - elapsed, 0.0))
+
+    # ---------- Internal helpers ----------
+
+    def _diff_performance(self, row: dict) -> Optional[dict]:
+        guid = row.get("performance_guid")
+        if not guid:
+            return None
+
+        current = tuple(row.get(f) for f in PERF_FIELDS)
+        previous = self._perf_snapshot.get(guid)
+        if previous == current:
+            return None
+        self._perf_snapshot[guid] = current
+
+        event = {"kind": "performance", "change": "added" if previous is None else "changed", "row": row}
+        if previous is not None:
+            event["delta"] = {
+                f: [old, new] for f, old, new in zip(PERF_FIELDS, previous, current) if old != new
+            }
+        return event
+
+    def _removed_performance(self, comp_guid: str, guid: str, round_guid: Optional[str]) -> dict:
+        previous = self._perf_snapshot.pop(guid, ())
+        row = {"competition_guid": comp_guid, "round_guid": round_guid, "performance_guid": guid}
+        row.update(zip(PERF_FIELDS, previous))
+        return {"kind": "performance", "change": "removed", "row": row}
+
+    def _diff_recap(self, round_guid: str) -> List[dict]:
+        '''Recap events for one round. Raises (leaving the snapshot as it was) if the page can't be fetched or parsed.'''
+        events: List[dict] = []
+        old_rows = self._recap_snapshot.get(round_guid, {})
+        new_rows = {r.get("school"): r for r in load_recap_records(round_guid)}
+
+        for school, record in new_rows.items():
+            previous = old_rows.get(school)
+            if previous == record:
+                continue
+            event = {
+                "kind": "recap",
+                "change": "added" if previous is None else "changed",
+                "round_guid": round_guid,
+                "row": record,
+            }
+            if previous is not None:
+                event["delta"] = {
+                    k: [previous.get(k), v] for k, v in record.items() if previous.get(k) != v
+                }
+            events.append(event)
+
+        for school in sorted(set(old_rows) - set(new_rows), key=str):
+            events.append({"kind": "recap", "change": "removed", "round_guid": round_guid, "row": old_rows[school]})
+
+        self._recap_snapshot[round_guid] = new_rows
+        return events
+
+    def _log_error(self, what: str, error: Exception) -> None:
+        self.errors += 1
+        print(f"cycle {self.cycles + 1}: {what} failed, keeping the last snapshot: "
+              f"{type(error).__name__}: {error}", file=sys.stderr)
+
+    def _emit(self, events: List[dict]) -> None:
+        if not events:
+            return
+        stamp = dt.datetime.now(dt.timezone.utc).isoformat()
+        for event in events:
+            event["observed_at"] = stamp
+
+        if self.events_path is not None:
+            with open(self.events_path, "a", encoding="utf-8") as f:
+                for event in events:
+                    f.write(json.dumps(event) + "\n")
+
+        if self.callback is not None:
+            for event in events:
+                self.callback(event)
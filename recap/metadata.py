@@ -0,0 +1,97 @@
+'''
+round_guid -> competition metadata index.
+
+Replaces the old "re-read the whole scores CSV, drop_duplicates, merge"
+step in build_all_recaps_with_metadata. The index is built once, either
+straight from the crawl rows already in memory or from a column-selective
+read of the scores CSV, and then attached to each recap frame as it is
+loaded, so there is never a full-frame merge.
+'''
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+META_COLS: List[str] = [
+    'round_guid',
+    'season_name',
+    'competition_name',
+    'competition_date',
+    'competition_location',
+    'division_name',
+]
+
+# Everything but the key, in output order
+VALUE_COLS: List[str] = META_COLS[1:]
+
+
+class MetadataIndex:
+    '''Hash index from round_guid to a tuple of VALUE_COLS. First row seen for a round wins, matching the old drop_duplicates(subset='round_guid').'''
+
+    def __init__(self) -> None:
+        self._by_round: Dict[str, Tuple[Optional[str], ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_round)
+
+    def __contains__(self, round_guid: str) -> bool:
+        return round_guid in self._by_round
+
+    # ---------- Builders ----------
+
+    def add(self, row: dict) -> None:
+        '''Adds one flattened API row (see flatten_competition_results). Rows for a round already indexed are ignored.'''
+        guid = row.get('round_guid')
+        if not guid or guid in self._by_round:
+            return
+        self._by_round[guid] = tuple(row.get(col) for col in VALUE_COLS)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict]) -> "MetadataIndex":
+        '''Builds the index from the crawl output that collect_scores_rows already holds in memory.'''
+        index = cls()
+        for row in rows:
+            index.add(row)
+        return index
+
+    @classmethod
+    def from_csv(cls, scores_csv_path: Path) -> "MetadataIndex":
+        '''Builds the index from the scores CSV, reading only META_COLS as strings.'''
+        df = pd.read_csv(scores_csv_path, usecols=META_COLS, dtype=str)
+        index = cls()
+        columns = [df[col].tolist() for col in META_COLS]
+        for guid, *values in zip(*columns):
+            if isinstance(guid, str) and guid not in index._by_round:
+                index._by_round[guid] = tuple(values)
+        return index
+
+    # ---------- Lookups ----------
+
+    def get(self, round_guid: str) -> Optional[dict]:
+        '''Returns metadata for a round as a dict, or None if the round is unknown.'''
+        values = self._by_round.get(round_guid)
+        if values is None:
+            return None
+        return dict(zip(VALUE_COLS, values))
+
+    def attach(self, df: pd.DataFrame) -> pd.DataFrame:
+        '''Adds VALUE_COLS to a recap frame in place using its round_guid column. A recap page is a single round, so the common case is one dict lookup and a scalar broadcast per column.'''
+        if df.empty or 'round_guid' not in df.columns:
+            for col in VALUE_COLS:
+                df[col] = None
+            return df
+
+        guids = df['round_guid']
+        first = guids.iat[0]
+        if (guids == first).all():
+            values = self._by_round.get(first, (None,) * len(VALUE_COLS))
+            for col, value in zip(VALUE_COLS, values):
+                df[col] = value
+            return df
+
+        missing = (None,) * len(VALUE_COLS)
+        matched = [self._by_round.get(guid, missing) for guid in guids]
+        for col, values in zip(VALUE_COLS, zip(*matched)):
+            df[col] = list(values)
+        return df
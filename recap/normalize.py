@@ -0,0 +1,226 @@
+'''
+Materialized normalized-score tables.
+
+Scores are reshaped to one row per (band, round, caption) and grouped at
+three levels:
+
+    all       (division, caption)                    every season
+    season    (season, division, caption)
+    week      (season, division, caption, week)      week = 1 + days since the season's first show // 7
+
+For every group we keep a sorted NumPy array of its values, and every row
+gets a z-score and percentile at each level (z_all, pct_all, z_season, ...).
+Lookups like "what historical percentile is 67.05 in 3A" are then two
+binary searches on one array.
+
+refresh() folds in new rows and recomputes only the groups they touch.
+'''
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+LEVELS: Dict[str, List[str]] = {
+    'all': ['division_name', 'caption'],
+    'season': ['season_name', 'division_name', 'caption'],
+    'week': ['season_name', 'division_name', 'caption', 'week'],
+}
+
+ROW_KEY = ['round_guid', 'band', 'caption']
+
+
+# -------------------------------------------------------------------
+# Reshaping
+# -------------------------------------------------------------------
+
+def long_from_scores(scores: pd.DataFrame) -> pd.DataFrame:
+    '''API scores table -> long rows with caption "Total".'''
+    band = scores['band_id'] if 'band_id' in scores.columns else scores['band_name']
+    return pd.DataFrame({
+        'season_name': scores['season_name'],
+        'division_name': scores['division_name'],
+        'competition_date': scores['competition_date'],
+        'round_guid': scores['round_guid'],
+        'band': band,
+        'caption': 'Total',
+        'value': pd.to_numeric(scores['score'], errors='coerce'),
+    })
+
+
+def long_from_recaps(recaps: pd.DataFrame) -> pd.DataFrame:
+    '''Recap table -> long rows, one per caption total (Music, Visual, ..., SubTotal, Total).'''
+    value_cols = [c for c in recaps.columns if c.endswith('_Total') and c != 'Penalties_Total']
+    value_cols += [c for c in ('SubTotal', 'Total') if c in recaps.columns]
+    band_col = 'band_id' if 'band_id' in recaps.columns else 'school'
+
+    id_cols = ['season_name', 'division_name', 'competition_date', 'round_guid', band_col]
+    long = recaps[id_cols + value_cols].melt(
+        id_vars=id_cols, value_vars=value_cols, var_name='caption', value_name='value',
+    )
+    long = long.rename(columns={band_col: 'band'})
+    long['caption'] = long['caption'].str.replace(r'_Total$', '', regex=True)
+    long['value'] = pd.to_numeric(long['value'], errors='coerce')
+    return long
+
+
+def _add_week(long: pd.DataFrame) -> pd.DataFrame:
+    dates = pd.to_datetime(long['competition_date'], errors='coerce')
+    season_start = dates.groupby(long['season_name']).transform('min')
+    long['week'] = ((dates - season_start).dt.days // 7 + 1).astype('Int64')
+    return long
+
+
+# -------------------------------------------------------------------
+# Tables
+# -------------------------------------------------------------------
+
+class NormalizedTables:
+    '''Row-level z-scores/percentiles plus sorted per-group value arrays for binary-search lookups.'''
+
+    def __init__(self) -> None:
+        self.rows = pd.DataFrame()
+        # level -> group key tuple -> sorted values
+        self.sorted_values: Dict[str, Dict[Tuple, np.ndarray]] = {level: {} for level in LEVELS}
+
+    @classmethod
+    def build(cls, long: pd.DataFrame) -> "NormalizedTables":
+        tables = cls()
+        tables.refresh(long)
+        return tables
+
+    def refresh(self, new_long: pd.DataFrame) -> int:
+        '''Adds/replaces rows (keyed on round_guid, band, caption) and recomputes only the touched groups. Returns the number of groups recomputed.'''
+        new_long = new_long.dropna(subset=['value']).copy()
+        if new_long.empty:
+            return 0
+
+        if self.rows.empty:
+            combined = new_long
+        else:
+            combined = pd.concat([self.rows[new_long.columns.intersection(self.rows.columns)], new_long],
+                                 ignore_index=True)
+        combined = combined.drop_duplicates(subset=ROW_KEY, keep='last')
+        combined = _add_week(combined.drop(columns='week', errors='ignore')).reset_index(drop=True)
+
+        touched_rows = combined.merge(new_long[ROW_KEY], on=ROW_KEY, how='inner')
+        previous = self.rows.set_index(ROW_KEY) if not self.rows.empty else None
+
+        if previous is not None:
+            # An earlier show moves a season's start and renumbers its weeks
+            prev_week = previous['week'].reindex(pd.MultiIndex.from_frame(combined[ROW_KEY]))
+            moved = (prev_week.notna() & (prev_week.to_numpy() != combined['week'].to_numpy())).to_numpy()
+            if moved.any():
+                touched_rows = pd.concat([touched_rows, combined.loc[moved]], ignore_index=True)
+
+        recomputed = 0
+        for level, keys in LEVELS.items():
+            touched = pd.MultiIndex.from_frame(touched_rows[keys].drop_duplicates())
+            recomputed += len(touched)
+            self._recompute_level(combined, previous, level, keys, touched)
+
+        self.rows = combined
+        return recomputed
+
+    def _recompute_level(
+            self,
+            combined: pd.DataFrame,
+            previous: Optional[pd.DataFrame],
+            level: str,
+            keys: List[str],
+            touched: pd.MultiIndex,
+    ) -> None:
+        z_col, pct_col = f'z_{level}', f'pct_{level}'
+
+        # Untouched groups keep their previous values
+        if previous is not None and z_col in previous.columns:
+            idx = pd.MultiIndex.from_frame(combined[ROW_KEY])
+            combined[z_col] = previous[z_col].reindex(idx).to_numpy()
+            combined[pct_col] = previous[pct_col].reindex(idx).to_numpy()
+        else:
+            combined[z_col] = np.nan
+            combined[pct_col] = np.nan
+
+        mask = pd.MultiIndex.from_frame(combined[keys]).isin(touched)
+        subset = combined.loc[mask]
+        grouped = subset.groupby(keys, sort=False)['value']
+
+        mean = grouped.transform('mean')
+        std = grouped.transform('std', ddof=0)
+        z = ((subset['value'] - mean) / std).where(std > 0, 0.0)
+        # (rank - 0.5) / n is the same "mean" percentile as _percentiles
+        pct = (grouped.rank(method='average') - 0.5) / grouped.transform('size') * 100.0
+
+        combined.loc[mask, z_col] = z.to_numpy()
+        combined.loc[mask, pct_col] = pct.to_numpy()
+
+        for key, values in grouped:
+            key = key if isinstance(key, tuple) else (key,)
+            self.sorted_values[level][key] = np.sort(values.to_numpy(dtype=float))
+
+        # Drop groups that no longer exist (e.g. renumbered weeks)
+        live = set(map(tuple, combined[keys].drop_duplicates().to_numpy().tolist()))
+        for key in [k for k in self.sorted_values[level] if k not in live]:
+            del self.sorted_values[level][key]
+
+    # ---------- Persistence ----------
+
+    def save(self, path: Path) -> None:
+        self.rows.to_csv(path, index=False)
+
+    @classmethod
+    def load(cls, path: Path) -> "NormalizedTables":
+        '''Reads a saved row table and rebuilds the sorted arrays from it (no z/percentile recompute). Missing file -> empty tables.'''
+        tables = cls()
+        if not Path(path).exists():
+            return tables
+
+        rows = pd.read_csv(path)
+        rows['week'] = rows['week'].astype('Int64')
+        tables.rows = rows
+        for level, keys in LEVELS.items():
+            for key, values in rows.groupby(keys, sort=False)['value']:
+                key = key if isinstance(key, tuple) else (key,)
+                tables.sorted_values[level][key] = np.sort(values.to_numpy(dtype=float))
+        return tables
+
+    # ---------- Lookups ----------
+
+    def percentile_of(
+            self,
+            value: float,
+            division: str,
+            caption: str = 'Total',
+            season: Optional[str] = None,
+            week: Optional[int] = None,
+    ) -> Optional[float]:
+        '''Percentile (0-100) of `value` within the group picked by the arguments given. None if the group doesn't exist.'''
+        if season is None:
+            ordered = self.sorted_values['all'].get((division, caption))
+        elif week is None:
+            ordered = self.sorted_values['season'].get((season, division, caption))
+        else:
+            ordered = self.sorted_values['week'].get((season, division, caption, week))
+        if ordered is None or len(ordered) == 0:
+            return None
+        return float(_percentiles(ordered, np.array([value], dtype=float))[0])
+
+    def summary(self, level: str = 'season') -> pd.DataFrame:
+        '''Count / mean / std / quartiles for every group at a level.'''
+        records = []
+        for key, ordered in self.sorted_values[level].items():
+            records.append(dict(
+                zip(LEVELS[level], key),
+                n=len(ordered), mean=ordered.mean(), std=ordered.std(),
+                p25=np.quantile(ordered, 0.25), p50=np.quantile(ordered, 0.5),
+                p75=np.quantile(ordered, 0.75),
+            ))
+        return pd.DataFrame(records)
+
+
+def _percentiles(ordered: np.ndarray, values: np.ndarray) -> np.ndarray:
+    '''"Mean" percentile rank: share of the group strictly below plus half of the ties, via two binary searches.'''
+    below = np.searchsorted(ordered, values, side='left')
+    at_or_below = np.searchsorted(ordered, values, side='right')
+    return (below + at_or_below) / (2.0 * len(ordered)) * 100.0
@@ -0,0 +1,209 @@
+'''
+Incremental band ratings over the competition history.
+
+Each round (one division at one competition) is treated as a multi-band Elo
+match: every pair of bands in the round is a game decided by `rank` (ties
+count as draws), and each band's change is
+
+    K / (n - 1) * sum_j (actual_ij - expected_ij)
+
+computed for the whole round at once with NumPy. Rounds are processed in
+competition_date order; at the first round of a new season ratings are pulled
+part of the way back to the mean (`season_carryover`).
+
+State (ratings, processed rounds, per-band trajectory) is persisted as JSON,
+so after a crawl only the rounds not seen before are processed. If a new
+round is older than the last processed one (a late backfill), or a round
+already rated was corrected since (the run's diff passes its round_guid in
+`corrected_rounds`), the engine replays everything it's given from scratch
+to keep the order correct.
+'''
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from recap.bands import BAND_REGISTRY
+
+BASE_RATING = 1500.0
+K_FACTOR = 32.0
+SEASON_CARRYOVER = 0.75
+
+# trajectory row: band_id, season_name, competition_date, round_guid, rank, rating_before, rating_after
+HISTORY_COLS = ['band_id', 'season_name', 'competition_date', 'round_guid',
+                'rank', 'rating_before', 'rating_after']
+
+
+def expected_and_actual(ratings: np.ndarray, ranks: np.ndarray):
+    '''Pairwise Elo expectations and results for one round (n x n matrices, diagonal zeroed).'''
+    diff = ratings[None, :] - ratings[:, None]           # r_j - r_i
+    expected = 1.0 / (1.0 + np.power(10.0, diff / 400.0))
+    actual = np.where(ranks[:, None] < ranks[None, :], 1.0,
+                      np.where(ranks[:, None] == ranks[None, :], 0.5, 0.0))
+    np.fill_diagonal(expected, 0.0)
+    np.fill_diagonal(actual, 0.0)
+    return expected, actual
+
+
+class RatingEngine:
+    '''Elo-style ratings with persisted state and per-band trajectories.'''
+
+    def __init__(
+            self,
+            k_factor: float = K_FACTOR,
+            base_rating: float = BASE_RATING,
+            season_carryover: float = SEASON_CARRYOVER,
+    ):
+        self.k_factor = k_factor
+        self.base_rating = base_rating
+        self.season_carryover = season_carryover
+        self._reset()
+
+    def _reset(self) -> None:
+        self.ratings: Dict[str, float] = {}
+        self.rounds_played: Dict[str, int] = {}
+        self.band_names: Dict[str, str] = {}
+        self.processed_rounds: Set[str] = set()
+        self.last_key: Optional[List[str]] = None   # [competition_date, round_guid]
+        self.current_season: Optional[str] = None
+        self.history: List[list] = []
+
+    # ---------- Updating ----------
+
+    def update(self, scores: pd.DataFrame, corrected_rounds: Iterable[str] = ()) -> int:
+        '''Processes every round in `scores` not seen before; replays all of them if one is older than the last rated round or an already rated round is in corrected_rounds. Returns the number of rounds processed.'''
+        df = self._prepare(scores)
+        new = df[~df['round_guid'].isin(self.processed_rounds)]
+        # Scores changed in a round already rated (a correction, or a round first seen mid-competition)
+        stale = self.processed_rounds.intersection(corrected_rounds)
+        if new.empty and not stale:
+            return 0
+
+        if stale:
+            self._reset()
+            new = df
+        elif self.last_key is not None and [new['competition_date'].iat[0], new['round_guid'].iat[0]] < self.last_key:
+            # A round older than what we've already rated: replay in order
+            self._reset()
+            new = df
+
+        count = 0
+        for round_guid, rnd in new.groupby('round_guid', sort=False):
+            self._play_round(round_guid, rnd)
+            count += 1
+        return count
+
+    def _prepare(self, scores: pd.DataFrame) -> pd.DataFrame:
+        df = scores.copy()
+        if 'band_id' not in df.columns:
+            df['band_id'] = BAND_REGISTRY.resolve_many(df['band_name'])
+        df['score'] = pd.to_numeric(df['score'], errors='coerce')
+        df['rank'] = pd.to_numeric(df['rank'], errors='coerce')
+        df = df.dropna(subset=['round_guid', 'band_id', 'competition_date'])
+
+        # Fall back to score order where the API didn't give a rank
+        missing = df['rank'].isna()
+        if missing.any():
+            derived = df.groupby('round_guid')['score'].rank(method='min', ascending=False)
+            df.loc[missing, 'rank'] = derived[missing]
+        df = df.dropna(subset=['rank'])
+
+        df['competition_date'] = df['competition_date'].astype(str)
+        return df.sort_values(['competition_date', 'round_guid'], kind='stable')
+
+    def _play_round(self, round_guid: str, rnd: pd.DataFrame) -> None:
+        season = rnd['season_name'].iat[0] if 'season_name' in rnd.columns else None
+        if season != self.current_season:
+            self._start_season(season)
+
+        bands = rnd['band_id'].tolist()
+        for band_id, name in zip(bands, rnd['band_name'].tolist()):
+            self.band_names.setdefault(band_id, name)
+
+        before = np.array([self.ratings.get(b, self.base_rating) for b in bands])
+        ranks = rnd['rank'].to_numpy(dtype=float)
+
+        n = len(bands)
+        if n > 1:
+            expected, actual = expected_and_actual(before, ranks)
+            after = before + self.k_factor / (n - 1) * (actual - expected).sum(axis=1)
+        else:
+            after = before
+
+        date = rnd['competition_date'].iat[0]
+        for band_id, rank, r0, r1 in zip(bands, ranks, before, after):
+            self.ratings[band_id] = float(r1)
+            self.rounds_played[band_id] = self.rounds_played.get(band_id, 0) + 1
+            self.history.append([band_id, season, date, round_guid, float(rank),
+                                 round(float(r0), 3), round(float(r1), 3)])
+
+        self.processed_rounds.add(round_guid)
+        self.last_key = [date, round_guid]
+
+    def _start_season(self, season: Optional[str]) -> None:
+        if self.current_season is not None and self.ratings:
+            mean = float(np.mean(list(self.ratings.values())))
+            for band_id, rating in self.ratings.items():
+                self.ratings[band_id] = mean + self.season_carryover * (rating - mean)
+        self.current_season = season
+
+    # ---------- Views ----------
+
+    def ratings_table(self) -> pd.DataFrame:
+        df = pd.DataFrame({
+            'band_id': list(self.ratings),
+            'band_name': [self.band_names.get(b) for b in self.ratings],
+            'rating': [round(r, 1) for r in self.ratings.values()],
+            'rounds': [self.rounds_played.get(b, 0) for b in self.ratings],
+        })
+        return df.sort_values('rating', ascending=False, ignore_index=True)
+
+    def trajectory(self, band_id: Optional[str] = None) -> pd.DataFrame:
+        '''Rating after every round, for one band or all of them.'''
+        df = pd.DataFrame(self.history, columns=HISTORY_COLS)
+        if band_id is not None:
+            df = df[df['band_id'] == band_id].reset_index(drop=True)
+        return df
+
+    # ---------- Persistence ----------
+
+    def save(self, path: Path) -> None:
+        state = {
+            'params': {
+                'k_factor': self.k_factor,
+                'base_rating': self.base_rating,
+                'season_carryover': self.season_carryover,
+            },
+            'ratings': self.ratings,
+            'rounds_played': self.rounds_played,
+            'band_names': self.band_names,
+            'processed_rounds': sorted(self.processed_rounds),
+            'last_key': self.last_key,
+            'current_season': self.current_season,
+            'history': self.history,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+
+    @classmethod
+    def load(cls, path: Path) -> "RatingEngine":
+        '''Loads saved state, or returns a fresh engine if `path` doesn't exist yet.'''
+        path = Path(path)
+        if not path.exists():
+            return cls()
+
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+
+        engine = cls(**state['params'])
+        engine.ratings = state['ratings']
+        engine.rounds_played = state['rounds_played']
+        engine.band_names = state['band_names']
+        engine.processed_rounds = set(state['processed_rounds'])
+        engine.last_key = state['last_key']
+        engine.current_season = state['current_season']
+        engine.history = state['history']
+        return engine
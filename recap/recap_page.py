@@ -1,10 +1,15 @@
-from dataclasses import dataclass, field
-from typing import List, Optional
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterator, List, Optional
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup, Tag
 
-CITY_DICT = {'American Fork': 'American Fork, UT', 'Viewmont': 'Bountiful, UT', 'Gallatin': 'Bozeman, MT', 'Canyon View': 'Cedar City, UT', 'Clearfield': 'Clearfield, UT', 'Brighton': 'Cottonwood Heights, UT', 'Delta': 'Delta, UT', 'Cedar Valley': 'Eagle Mountain, UT', 'Elko': 'Elko, NV', 'Tintic': 'Eureka, UT', 'Farmington': 'Farmington, UT', 'Bear River': 'Garland, UT', 'Wasatch': 'Heber City, UT', 'Herriman': 'Herriman, UT', 'Mountain Ridge': 'Herriman, UT', 'Lone Peak': 'Highland, UT', 'Mountain Crest': 'Hyrum, UT', 'Davis': 'Kaysville, UT', 'Kearns': 'Kearns, UT', 'Lehi': 'Lehi, UT', 'Skyridge': 'Lehi, UT', 'Hillcrest': 'Midvale, UT', 'Ridgeline': 'Millville, UT', 'Green Canyon': 'North Logan, UT', 'Ogden': 'Ogden, UT', 'Orem': 'Orem, UT', 'Timpanogos': 'Orem, UT', 'Payson': 'Payson, UT', 'Pleasant Grove': 'Pleasant Grove, UT', 'Carbon': 'Price, UT', 'Provo': 'Provo, UT', 'Timpview': 'Provo, UT', 'Riverton': 'Riverton, UT','Salem Hills': 'Salem, UT', 'Alta': 'Sandy, UT', 'Westlake': 'Saratoga Springs, UT', 'Sky View': 'Smithfield, UT', 'Bingham': 'South Jordan, UT', 'Mountain Star': 'South Ogden, UT', 'Maple Mountain': 'Spanish Fork, UT', 'Spanish Fork': 'Spanish Fork, UT', 'Springville': 'Springville, UT', 'Stansbury': 'Stansbury, UT', 'Deseret Peak': 'Tooele, UT', 'Tooele': 'Tooele, UT', 'Uintah': 'Vernal, UT', 'Copper Hills': 'West Jordan, UT', 'West Jordan': 'West Jordan, UT', 'High Desert': 'Ammon, ID', 'Nampa': 'Nampa ID', 'Idaho Falls': 'Idaho Falls, ID', 'Columbia': 'Nampa, ID', 'Skyview (ID)': 'Nampa ID', 'Century': 'Pocatello, ID', 'Pocatello': 'Pocatello, ID', 'Timberline': 'Boise, ID', 'Madison': 'Rexburg, ID', 'Highland': 'Pocatello, ID', 'Orem City': 'Orem, UT', 'Grand County': 'Moab, UT', 'Roy': 'Roy, UT', 'Murray': 'Murray, UT', 'Fremont': 'Plain City, UT', 'Mountain View': 'Meridian, ID', 'Capital': 'Boise, ID', 'Fruitland': 'Fruitland, ID', 'Kelly Walsh': 'Casper, WY', 'Blackfoot': 'Blackfoot, ID', 'Centennial': 'Boise, ID'}
+from recap.bands import CITY_DICT, BAND_REGISTRY
+from recap.chunked import DEFAULT_CHUNK_ROWS, ChunkedCsvWriter, compact_recap, concat_compact
+from recap.revalidate import VALIDATOR_CACHE, ValidatorCache
+from recap.throttle import throttled_get
+
+REQUEST_TIMEOUT = 30
 
 @dataclass
 class RecapHeader:
@@ -18,39 +23,58 @@ class RecapHeader:
 
 class RecapPage:
     '''Represents a single recap webpage. Handles downloading HTML, finding the relevant table, parsing header info, and extracting score rows. Depends on BeautifulSoup, Tag, RecapHeader, List, Optional.'''
-    def __init__(self, url: str, table_index: int = 1):
-        '''Stores the recap URL and which table to parse, and initializes placeholders for soup, table, rows, and header. Depends on type hints: str, int, Optional, List, RecapHeader.'''
+    def __init__(self, url: str, table_index: int = 1, cache: Optional[ValidatorCache] = VALIDATOR_CACHE):
+        '''Stores the recap URL and which table to parse, and initializes placeholders for soup, table, rows, and header. `cache` keeps validators and previous parses per URL for conditional re-fetches (None turns that off). Depends on type hints: str, int, Optional, List, RecapHeader, ValidatorCache.'''
         self.url = url
         self.table_index = table_index
+        self.cache = cache
 
         self._soup: Optional[BeautifulSoup] = None
         self._table: Optional[Tag] = None
         self._table_rows: List[Tag] = []
 
+        # What parse_header / parse_scores produced, shared with the cache entry
+        self._parsed: dict = {}
+        # True when fetch() reused a previous parse instead of building soup
+        self._reused = False
+
         self.header: Optional[RecapHeader] = None
 
     # ---------- Public API ----------
 
-    def fetch(self) -> None:
-        '''Sends an HTTP GET request to self.url, builds a BeautifulSoup object from the HTML, and locates the target table. Depends on requests, BeautifulSoup, and _set_table_of_interest.'''
-        try:
-            response = requests.get(self.url)
-            #response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 403:
-                print(f'Caught a 403 Forbidden error: {e}')
-                # Handle the 403 error specifically (e.g., inform the user, log the event)
-            else:
-                print(f"Caught another HTTP error: {e}")
-
-        self._soup = BeautifulSoup(response.text, "html.parser")
+    def fetch(self, conditional: bool = True) -> None:
+        '''Sends an HTTP GET request to self.url through the shared adaptive concurrency limit (conditional on the cached ETag / Last-Modified when there is one), builds a BeautifulSoup object from the HTML, and locates the target table. On a 304 or an unchanged body the previous parse is reused and no soup is built. Raises requests.HTTPError when the page still fails after retries. Depends on throttled_get, BeautifulSoup, ValidatorCache, and _set_table_of_interest.'''
+        headers = self.cache.conditional_headers(self.url) if self.cache is not None and conditional else {}
+        # Waits for a slot under the adaptive limit; 403/429/5xx are retried with backoff, then raised as HTTPError
+        response = throttled_get(self.url, headers=headers, timeout=REQUEST_TIMEOUT)
+
+        if self.cache is not None:
+            parsed = self.cache.revalidate(self.url, response.status_code, response.headers, response.content)
+            if parsed is not None and conditional:
+                self._parsed = parsed
+                self._reused = True
+                return
+            if response.status_code == 304:
+                # Server says unchanged but we have nothing stored to reuse
+                return self.fetch(conditional=False)
+            # Unconditional re-fetch (a parse the cache doesn't have yet) still builds the soup
+            self._parsed = parsed if parsed is not None else self.cache.entry(self.url)["parsed"]
+
+        self._reused = False
+        self.feed(response.text)
+
+    def feed(self, html: str) -> None:
+        '''Builds the soup from already-downloaded HTML and locates the target table, so pages can be parsed without a network call (cached bodies, synthetic pages). Depends on BeautifulSoup and _set_table_of_interest.'''
+        self._soup = BeautifulSoup(html, "html.parser")
         self._set_table_of_interest()
 
     def parse_header(self) -> RecapHeader:
         '''Extracts division name, captions, sub-captions, judges, and raw table headers from specific table rows, then builds and stores a RecapHeader. Depends on _extract_row_text, _table_rows, and RecapHeader.'''
 
-        if self._table is None or not self._table_rows:
-            raise RuntimeError("Call fetch() before parse_header().")
+        if "header" in self._parsed:
+            self.header = RecapHeader(**self._parsed["header"])
+            return self.header
+        self._require_table("parse_header")
 
         division = self._table_rows[0].get_text(strip=True)
         
@@ -66,15 +90,17 @@ class RecapPage:
             judges=judges,
             table_headers=table_headers,
         )
+        self._parsed["header"] = asdict(self.header)
 
         return self.header
     #########################
 
     def parse_scores(self, first_data_row: int = 6) -> List[List[str]]:
         '''Iterates over data rows starting at first_data_row, parses each with _parse_score_row, and returns a list of score rows. Skips rows with too few <td> cells. Depends on _table_rows, _parse_score_row, List.'''
-        
-        if self._table is None or not self._table_rows:
-            raise RuntimeError("Call fetch() before parse_scores().")
+        key = f"scores_{first_data_row}"
+        if key in self._parsed:
+            return [list(row) for row in self._parsed[key]]
+        self._require_table("parse_scores")
 
         data_rows: List[List[str]] = []
 
@@ -100,12 +126,14 @@ class RecapPage:
                     return False
                 
             if is_number(parsed[1]):
-                parsed.insert(1, CITY_DICT[parsed[0]])
+                # Unknown schools get "" instead of a KeyError
+                parsed.insert(1, BAND_REGISTRY.home_city(parsed[0]))
                 parsed.insert(2, parsed[2][:2])
                 parsed[3] = parsed[3][-1]
             
             if len(parsed) >= 3:
                 data_rows.append(parsed)
+        self._parsed[key] = [list(row) for row in data_rows]
         return data_rows
 
 
@@ -137,6 +165,13 @@ class RecapPage:
 
     # ---------- Internal helpers ----------
 
+    def _require_table(self, caller: str) -> None:
+        '''Makes sure there is a table to parse. If fetch() reused a previous parse that doesn't cover what's being asked for now, re-downloads unconditionally. Depends on fetch.'''
+        if self._table is None and self._reused:
+            self.fetch(conditional=False)
+        if self._table is None or not self._table_rows:
+            raise RuntimeError(f"Call fetch() before {caller}().")
+
     def _set_table_of_interest(self) -> None:
         '''Returns a list of <tr> tags using soup, this functin starts by finding all <table> elements in the soup and selects the one at self.table_index. Also caches its <tr> rows. Raises errors if soup isn’t initialized or index is invalid. Depends on BeautifulSoup, Tag, List.'''
         if self._soup is None:
@@ -270,48 +305,76 @@ def load_recap(url: str, header_cols) -> pd.DataFrame:
 
     # 2) transform header names
     # If header cols wasn't provided, fall back to parsing  each url
-    renamed_headers: List[dict] = []
     if header_cols is None:
         transformer = TransformHeader()
-        renamed_headers = transformer.update_header(header)
-        header.renamed_headers = renamed_headers  # optional, for later reuse
+        header_cols = transformer.update_header(header)
+        header.renamed_headers = header_cols  # optional, for later reuse
 
      # 3) parse data rows (scores)
     rows = page.parse_scores(first_data_row=6)
 
     # 4) zip headers + row values into records
     records1: List[dict] = []
+    mismatched = False
     for row_values in rows:
-        if len(row_values) != len(renamed_headers):
-            with open("mismatched_header.txt", "a") as file:
-                file.write(f'\n{url}')
+        if len(row_values) != len(header_cols):
+            mismatched = True
 
         # Combine using dictionary comprehension
-        record_dict = {header_cols[i]: row_values[i] for i in range(len(header_cols))}
+        record_dict = {header_cols[i]: row_values[i] for i in range(min(len(header_cols), len(row_values)))}
 
         records1.append(record_dict)
-        df = pd.DataFrame.from_records(records1, columns=header_cols)
 
-        # Add round_guid so we can join with UMEA_api metadata later
-        guid = url.rstrip("/").split("/")[-1]
-        if guid.endswith(".htm"):
-            guid = guid[:-4]
-        df["round_guid"] = guid
+    if mismatched:
+        with open("mismatched_header.txt", "a") as file:
+            file.write(f'\n{url}')
+
+    # Build the frame once (building it inside the loop was quadratic in rows)
+    df = pd.DataFrame.from_records(records1, columns=header_cols)
+
+    # Add round_guid so we can join with UMEA_api metadata later
+    guid = url.rstrip("/").split("/")[-1]
+    if guid.endswith(".htm"):
+        guid = guid[:-4]
+    df["round_guid"] = guid
     return df
     
+def iter_recaps(urls: List[str], header_cols: List[str]) -> Iterator[pd.DataFrame]:
+    '''
+    iter_recaps loads each recap URL with load_recap and yields its DataFrame (tagged with source_url) one at a time, so callers can enrich or write each recap as it streams past instead of holding them all.'''
+    for url in urls:
+        yield load_tagged_recap(url, header_cols=header_cols)
+
+def load_tagged_recap(url: str, header_cols: List[str]) -> pd.DataFrame:
+    '''load_recap plus the source_url and band_id columns every recap table carries.'''
+    df = load_recap(url, header_cols=header_cols)
+    df["source_url"] = url
+    df["band_id"] = BAND_REGISTRY.resolve_many(df["school"])
+    return df
+
 @staticmethod
-def load_multiple_recaps(urls: List[str], header_cols: List[str]) -> pd.DataFrame:
+def load_multiple_recaps(urls: List[str], header_cols: List[str], chunk_rows: int = DEFAULT_CHUNK_ROWS) -> pd.DataFrame:
         '''
-        load_multiple_recaps takes a list of recap URLs, loads each one with load_recap, and combines all resulting DataFrames into a single DataFrame. It handles multiple recaps at once, stitching them into one unified table so you don't process or analyze each recap separately.'''
-        df_list: list[pd.DataFrame] = []
-        for url in urls:
-            df = load_recap(url, header_cols=header_cols)
-            df["source_url"] = url
-            df_list.append(df)
-        if not df_list:
-            return pd.DataFrame()
-
-        return pd.concat(df_list, ignore_index=True)
+        load_multiple_recaps takes a list of recap URLs, loads each one with load_recap, and combines all resulting DataFrames into a single DataFrame. Each recap is coerced to compact dtypes (float32 scores, Int16 ranks, categorical round_guid/source_url) as soon as it is parsed and folded into chunk_rows-sized chunks, so the strings of every page are never held at once.'''
+        chunks: List[pd.DataFrame] = []
+        buffer: List[pd.DataFrame] = []
+        buffered = 0
+        for df in iter_recaps(urls, header_cols=header_cols):
+            buffer.append(compact_recap(df))
+            buffered += len(df)
+            if buffered >= chunk_rows:
+                chunks.append(concat_compact(buffer))
+                buffer, buffered = [], 0
+        if buffer:
+            chunks.append(concat_compact(buffer))
+        return concat_compact(chunks)
+
+def write_multiple_recaps(urls: List[str], header_cols: List[str], path: Path, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> int:
+    '''Like load_multiple_recaps, but appends compact chunks to the CSV at `path` instead of returning them, so peak memory is one chunk however many URLs there are. Returns the number of rows written.'''
+    with ChunkedCsvWriter(path, chunk_rows=chunk_rows) as writer:
+        for df in iter_recaps(urls, header_cols=header_cols):
+            writer.add(compact_recap(df))
+    return writer.rows_written
 
 def get_header_from_url(url: str) -> List[str]:
     page = RecapPage(url)
@@ -0,0 +1,160 @@
+'''
+Conditional revalidation for repeat fetches.
+
+During the season the same recap pages and GetCompetition payloads are
+re-checked over and over, and almost none of them have changed. For every
+URL we keep its validators (ETag, Last-Modified and a hash of the body) plus
+whatever was parsed out of it last time:
+
+    1) the next request is sent with If-None-Match / If-Modified-Since,
+    2) a 304 reuses the previous parse (no body downloaded, nothing parsed),
+    3) a 200 whose body hashes the same as before also reuses the previous
+       parse (servers that don't send validators),
+    4) anything else is parsed normally and stored for next time.
+
+RecapPage.fetch and UMEA_api.get_jsonp use the VALIDATOR_CACHE singleton by
+default; main() loads/saves it from HTTP_CACHE_PATH so reuse carries over
+between runs, and the live watcher gets it in memory for free. Counters of
+requests, 304s, bytes and parses saved are kept per run in `stats`.
+
+Standard library only, so UMEA_api can import it without slowing the CLI.
+'''
+
+import hashlib
+import json
+import threading
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+
+
+@dataclass
+class RevalidationStats:
+    '''Per-run counters. bytes_saved only counts 304s; a same-hash 200 still downloaded the body.'''
+    requests: int = 0
+    not_modified: int = 0
+    same_body: int = 0
+    bytes_saved: int = 0
+    parses_saved: int = 0
+
+    def summary(self) -> str:
+        return (f"{self.requests} request(s), {self.not_modified} not modified, "
+                f"{self.same_body} unchanged body, {self.parses_saved} parse(s) and "
+                f"{self.bytes_saved / 1024:.1f} KB saved")
+
+
+def body_hash(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class ValidatorCache:
+    '''url -> {etag, last_modified, body_hash, size, parsed}. `parsed` is a dict the caller fills with whatever it parsed from the body.'''
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.stats = RevalidationStats()
+        self.path: Optional[Path] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._entries
+
+    # ---------- Request / response ----------
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        '''If-None-Match / If-Modified-Since for a URL we've seen; empty otherwise.'''
+        entry = self._entries.get(url)
+        headers: Dict[str, str] = {}
+        if entry is None:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def revalidate(
+            self,
+            url: str,
+            status_code: int,
+            headers: Mapping[str, str],
+            body: bytes,
+    ) -> Optional[dict]:
+        '''
+        Returns the previous `parsed` dict if the response says (304) or shows
+        (same body hash) that nothing changed, counting what that saved.
+        Otherwise records the new validators with an empty `parsed` dict and
+        returns None; the caller parses and fills in entry(url)["parsed"].
+        A 304 with nothing stored to reuse also returns None (and forgets the
+        URL), and the caller should repeat the request without validators.
+        '''
+        with self._lock:
+            self.stats.requests += 1
+            entry = self._entries.get(url)
+
+            if status_code == 304:
+                if entry is not None and entry["parsed"]:
+                    self.stats.not_modified += 1
+                    self.stats.bytes_saved += entry.get("size", 0)
+                    self.stats.parses_saved += 1
+                    return entry["parsed"]
+                # Nothing to reuse: drop it so the caller's retry goes out unconditional
+                self._entries.pop(url, None)
+                return None
+
+            digest = body_hash(body)
+            if entry is not None and entry.get("body_hash") == digest and entry["parsed"]:
+                self.stats.same_body += 1
+                self.stats.parses_saved += 1
+                # Pick up validators the server may have started sending
+                entry["etag"] = headers.get("ETag") or entry.get("etag")
+                entry["last_modified"] = headers.get("Last-Modified") or entry.get("last_modified")
+                return entry["parsed"]
+
+            self._entries[url] = {
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "body_hash": digest,
+                "size": len(body),
+                "parsed": {},
+            }
+            return None
+
+    def entry(self, url: str) -> Optional[dict]:
+        return self._entries.get(url)
+
+    def clear(self) -> None:
+        '''Forgets every URL (next fetches are unconditional) and resets the stats.'''
+        with self._lock:
+            self._entries = {}
+            self.stats = RevalidationStats()
+
+    # ---------- Persistence ----------
+
+    def load(self, path: Path) -> "ValidatorCache":
+        '''Replaces the entries with those saved at `path` (if it exists) and resets the per-run stats.'''
+        self.path = Path(path)
+        entries: Dict[str, dict] = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        with self._lock:
+            self._entries = entries
+            self.stats = RevalidationStats()
+        return self
+
+    def save(self, path: Optional[Path] = None) -> None:
+        path = Path(path or self.path)
+        with self._lock:
+            payload = json.dumps(self._entries)
+        path.write_text(payload, encoding="utf-8")
+
+    def stats_dict(self) -> Dict[str, int]:
+        return asdict(self.stats)
+
+
+# One cache per process, shared by the recap and API fetchers
+VALIDATOR_CACHE = ValidatorCache()
@@ -0,0 +1,282 @@
+'''
+Local read-only HTTP query service over the pipeline outputs.
+
+    python -m recap serve --port 8050
+
+Endpoints (all GET, all JSON):
+    /health
+    /bands/<band name>                     every score row for a band, oldest first
+    /rounds/<round_guid>                   recap rows for one round (API rows if no recap table)
+    /captions/<caption>/leaderboard        top caption totals, ?season=&division=&limit=
+    /seasons/<season name>/standings       per band latest/best score, ?division=
+
+Both CSVs are loaded into memory once. Responses are kept in an LRU cache
+and carry an ETag, so repeat requests are a dict lookup (or a bodiless 304).
+The files are re-stat'ed at most once per `check_interval` seconds and
+reloaded when the pipeline rewrites them; a reload clears the cache. If a
+reload fails (a file caught mid-write, a bad table) the previous tables keep
+serving and the reload is retried at the next check.
+'''
+
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pandas as pd
+
+from recap.config import SCORES_CSV_PATH, ALL_RECAPS_CSV_PATH
+
+
+def _records(df: pd.DataFrame) -> List[dict]:
+    '''DataFrame -> JSON-safe list of dicts (NaN becomes null).'''
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+class ResponseCache:
+    '''Small thread-safe LRU of (status, body, etag) keyed by request path + query.'''
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[int, bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Tuple[int, bytes, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: Tuple[int, bytes, str]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class DataStore:
+    '''Holds the scores/recap tables in memory with per-band and per-round indexes, and hot-reloads them when the files change.'''
+
+    def __init__(
+            self,
+            scores_path: Path = SCORES_CSV_PATH,
+            recaps_path: Path = ALL_RECAPS_CSV_PATH,
+            check_interval: float = 2.0,
+    ):
+        self.scores_path = Path(scores_path)
+        self.recaps_path = Path(recaps_path)
+        self.check_interval = check_interval
+        self.cache = ResponseCache()
+
+        self.version = 0
+        self.reload_errors = 0
+        self.scores = pd.DataFrame()
+        self.recaps = pd.DataFrame()
+        self._by_band: Dict[str, pd.DataFrame] = {}
+        self._recaps_by_round: Dict[str, pd.DataFrame] = {}
+        self._scores_by_round: Dict[str, pd.DataFrame] = {}
+
+        self._mtimes: Tuple[float, float] = (-1.0, -1.0)
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.maybe_reload(force=True)
+
+    # ---------- Loading ----------
+
+    def _current_mtimes(self) -> Tuple[float, float]:
+        return tuple(
+            p.stat().st_mtime if p.exists() else 0.0
+            for p in (self.scores_path, self.recaps_path)
+        )
+
+    def maybe_reload(self, force: bool = False) -> bool:
+        '''Reloads both tables if either file changed since the last load. Returns True if a reload happened.'''
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return False
+
+        with self._lock:
+            self._last_check = now
+            mtimes = self._current_mtimes()
+            if not force and mtimes == self._mtimes:
+                return False
+
+            try:
+                scores = pd.read_csv(self.scores_path) if self.scores_path.exists() else pd.DataFrame()
+                recaps = (
+                    pd.read_csv(self.recaps_path, index_col=0)
+                    if self.recaps_path.exists() else pd.DataFrame()
+                )
+                by_band = dict(tuple(scores.groupby("band_name"))) if not scores.empty else {}
+                scores_by_round = dict(tuple(scores.groupby("round_guid"))) if not scores.empty else {}
+                recaps_by_round = dict(tuple(recaps.groupby("round_guid"))) if not recaps.empty else {}
+            except (OSError, ValueError, KeyError) as e:
+                # Keep serving what we have; _mtimes is left alone so the next check tries again
+                self.reload_errors += 1
+                print(f"reload failed, still serving version {self.version}: {type(e).__name__}: {e}", file=sys.stderr)
+                return False
+
+            self.scores = scores
+            self.recaps = recaps
+            self._by_band = by_band
+            self._scores_by_round = scores_by_round
+            self._recaps_by_round = recaps_by_round
+
+            self._mtimes = mtimes
+            self.version += 1
+            self.cache.clear()
+            return True
+
+    # ---------- Queries ----------
+
+    def band_history(self, band: str) -> Optional[List[dict]]:
+        df = self._by_band.get(band)
+        if df is None:
+            return None
+        return _records(df.sort_values("competition_date"))
+
+    def round_results(self, round_guid: str) -> Optional[List[dict]]:
+        df = self._recaps_by_round.get(round_guid)
+        if df is None:
+            df = self._scores_by_round.get(round_guid)
+        if df is None:
+            return None
+        return _records(df)
+
+    def caption_leaderboard(
+            self,
+            caption: str,
+            season: Optional[str] = None,
+            division: Optional[str] = None,
+            limit: int = 25,
+    ) -> Optional[List[dict]]:
+        col = caption if caption.endswith("_Total") else f"{caption}_Total"
+        if col not in self.recaps.columns:
+            return None
+
+        df = self.recaps
+        if season:
+            df = df[df["season_name"] == season]
+        if division:
+            df = df[df["division_name"] == division]
+
+        keep = [c for c in ("school", "season_name", "competition_name",
+                            "competition_date", "division_name", "round_guid") if c in df.columns]
+        out = df[keep].assign(score=pd.to_numeric(df[col], errors="coerce"))
+        out = out.dropna(subset=["score"]).nlargest(limit, "score")
+        return _records(out)
+
+    def season_standings(self, season: str, division: Optional[str] = None) -> Optional[List[dict]]:
+        if self.scores.empty:
+            return None
+        df = self.scores[self.scores["season_name"] == season]
+        if division:
+            df = df[df["division_name"] == division]
+        if df.empty:
+            return None
+
+        df = df.sort_values("competition_date")
+        grouped = df.groupby(["division_name", "band_name"], sort=False)
+        out = pd.DataFrame({
+            "latest_score": grouped["score"].last(),
+            "best_score": grouped["score"].max(),
+            "shows": grouped["score"].size(),
+            "last_competition": grouped["competition_name"].last(),
+        }).reset_index()
+        out = out.sort_values(["division_name", "latest_score"], ascending=[True, False])
+        return _records(out)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    '''Routes GET requests to DataStore queries and serves them through the response cache.'''
+
+    store: DataStore  # set by make_server
+
+    def do_GET(self) -> None:
+        self.store.maybe_reload()
+
+        key = f"{self.store.version}:{self.path}"
+        entry = self.store.cache.get(key)
+        if entry is None:
+            status, payload = self._route()
+            body = json.dumps(payload).encode("utf-8")
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+            entry = (status, body, etag)
+            if status == 200:
+                self.store.cache.put(key, entry)
+
+        status, body, etag = entry
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self) -> Tuple[int, object]:
+        parts = urlsplit(self.path)
+        segments = [unquote(s) for s in parts.path.strip("/").split("/") if s]
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+
+        result = None
+        if segments == ["health"]:
+            result = {
+                "version": self.store.version,
+                "reload_errors": self.store.reload_errors,
+                "score_rows": len(self.store.scores),
+                "recap_rows": len(self.store.recaps),
+                "cache_hits": self.store.cache.hits,
+                "cache_misses": self.store.cache.misses,
+            }
+        elif len(segments) == 2 and segments[0] == "bands":
+            result = self.store.band_history(segments[1])
+        elif len(segments) == 2 and segments[0] == "rounds":
+            result = self.store.round_results(segments[1])
+        elif len(segments) == 3 and segments[0] == "captions" and segments[2] == "leaderboard":
+            try:
+                limit = int(query.get("limit", 25))
+            except ValueError:
+                return 400, {"error": "limit must be an integer"}
+            result = self.store.caption_leaderboard(
+                segments[1], season=query.get("season"),
+                division=query.get("division"), limit=limit,
+            )
+        elif len(segments) == 3 and segments[0] == "seasons" and segments[2] == "standings":
+            result = self.store.season_standings(segments[1], division=query.get("division"))
+
+        if result is None:
+            return 404, {"error": "not found", "path": parts.path}
+        return 200, result
+
+    def log_message(self, format: str, *args) -> None:
+        # Keep load tests quiet; errors still surface via send_error
+        pass
+
+
+def make_server(store: DataStore, host: str = "127.0.0.1", port: int = 8050) -> ThreadingHTTPServer:
+    '''Builds (but does not start) a threaded server bound to `store`. Use port=0 for an ephemeral port.'''
+    handler = type("BoundQueryHandler", (QueryHandler,), {"store": store})
+    return ThreadingHTTPServer((host, port), handler)
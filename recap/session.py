@@ -0,0 +1,32 @@
+'''
+One requests.Session per process, shared by the recap page and API fetchers
+so every crawl (full recaps, category recaps, GetCompetition calls) reuses
+the same keep-alive connection pool instead of opening a connection per GET.
+
+requests is imported on first use, so importing this module stays cheap.
+'''
+
+import threading
+
+# Connections kept per host; should cover the crawl's worker count
+POOL_SIZE = 16
+
+_session = None
+_lock = threading.Lock()
+
+
+def get_session():
+    '''The shared requests.Session, created on first call.'''
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                _session = s
+    return _session
@@ -0,0 +1,226 @@
+'''
+Sharded crawl for big backfills.
+
+Work is split deterministically by hashing a key into N shards, so any
+number of machines/containers can each run one shard with no coordination:
+
+    python -m recap shard --index 0 --count 4 --out-dir shards/
+    ...
+    python -m recap shard --index 3 --count 4 --out-dir shards/
+    python -m recap merge-shards --out-dir shards/
+
+Two partition keys are supported:
+    competition   each worker lists the seasons' competitions (one cheap call per
+                  season), crawls only its own competitions and their recaps
+    round         recap-only backfill over an existing round GUID list
+
+Each worker writes its own partial files; merge_shards combines them into the
+canonical scores / round GUID / recap tables, dropping duplicates on
+performance_guid (scores) and round_guid + school (recaps).
+'''
+
+import csv
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from recap.config import (
+    BASE_RECAP_URL,
+    SCORES_CSV_PATH,
+    ROUND_GUIDS_CSV_PATH,
+    ALL_RECAPS_CSV_PATH,
+)
+from recap.diff import RECAPS_KEY, SCORES_KEY, add_row_hash, ensure_row_hash
+from recap.metadata import MetadataIndex
+
+SCORES_SHARD_PATTERN = "scores.shard-{index}-of-{count}.csv"
+RECAPS_SHARD_PATTERN = "recaps.shard-{index}-of-{count}.csv"
+
+
+def shard_of(key: str, count: int) -> int:
+    '''Stable shard number for a key. Uses blake2b rather than hash() so every process and machine agrees.'''
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count
+
+
+def partition(keys: Iterable[str], count: int) -> List[List[str]]:
+    '''Splits keys into `count` lists by shard_of, preserving input order within each list.'''
+    shards: List[List[str]] = [[] for _ in range(count)]
+    for key in keys:
+        shards[shard_of(key, count)].append(key)
+    return shards
+
+
+def shard_paths(out_dir: Path, index: int, count: int) -> Tuple[Path, Path]:
+    return (
+        out_dir / SCORES_SHARD_PATTERN.format(index=index, count=count),
+        out_dir / RECAPS_SHARD_PATTERN.format(index=index, count=count),
+    )
+
+
+# -------------------------------------------------------------------
+# Workers
+# -------------------------------------------------------------------
+
+def _fetch_recaps_for_rounds(round_guids: List[str], metadata: MetadataIndex) -> pd.DataFrame:
+    from recap.chunked import compact_recap, concat_compact
+    from recap.recap_page import iter_recaps, get_header_from_url
+    from recap.validate import flag_invalid_rows
+
+    if not round_guids:
+        return pd.DataFrame()
+
+    urls = [f"{BASE_RECAP_URL}/{guid}.htm" for guid in round_guids]
+    header_cols = get_header_from_url(urls[0])
+    df_list = [metadata.attach(compact_recap(df)) for df in iter_recaps(urls, header_cols=header_cols)]
+    if not df_list:
+        return pd.DataFrame()
+    return add_row_hash(flag_invalid_rows(concat_compact(df_list)), RECAPS_KEY)
+
+
+def run_competition_shard(
+        index: int,
+        count: int,
+        out_dir: Path,
+        season_guid_dict: Dict[str, str],
+) -> Tuple[int, int]:
+    '''Crawls the competitions (and their recaps) that hash to this shard. Returns (score rows, recap rows) written.'''
+    from recap.UMEA_api import (
+        flatten_competition_results,
+        get_competition_results,
+        get_competitions_for_season,
+        write_scores_csv,
+    )
+
+    rows: List[dict] = []
+    for season_name, season_id in season_guid_dict.items():
+        for c in get_competitions_for_season(season_id):
+            comp_id = c.get("competitionGuid")
+            if not comp_id or shard_of(comp_id, count) != index:
+                continue
+            comp_data = get_competition_results(comp_id)
+            rows.extend(flatten_competition_results(comp_data, season_name=season_name))
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    scores_path, recaps_path = shard_paths(out_dir, index, count)
+
+    # Always write both files so merge can tell an empty shard from a missing one
+    if rows:
+        write_scores_csv(rows, str(scores_path))
+    else:
+        scores_path.write_text("", encoding="utf-8")
+
+    round_guids = sorted({r["round_guid"] for r in rows if r.get("round_guid")})
+    recaps_df = _fetch_recaps_for_rounds(round_guids, MetadataIndex.from_rows(rows))
+    _write_shard(recaps_df, recaps_path)
+    return len(rows), len(recaps_df)
+
+
+def run_round_shard(
+        index: int,
+        count: int,
+        out_dir: Path,
+        round_guids: List[str],
+        scores_csv_path: Path = SCORES_CSV_PATH,
+) -> Tuple[int, int]:
+    '''Fetches recaps for the round GUIDs that hash to this shard, using the existing scores CSV for metadata.'''
+    mine = [g for g in round_guids if shard_of(g, count) == index]
+    metadata = MetadataIndex.from_csv(scores_csv_path)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    _, recaps_path = shard_paths(out_dir, index, count)
+    recaps_df = _fetch_recaps_for_rounds(mine, metadata)
+    _write_shard(recaps_df, recaps_path)
+    return 0, len(recaps_df)
+
+
+def _write_shard(df: pd.DataFrame, path: Path) -> None:
+    '''Writes a shard table; an empty one becomes an empty file (to_csv would write a bare newline pandas can't read back).'''
+    if df.empty:
+        path.write_text("", encoding="utf-8")
+    else:
+        df.to_csv(path, index=False)
+
+
+# -------------------------------------------------------------------
+# Merge
+# -------------------------------------------------------------------
+
+def _read_shards(out_dir: Path, pattern: str, count: Optional[int]) -> Tuple[List[pd.DataFrame], Dict[str, str]]:
+    '''
+    Reads every shard file matching pattern as strings, skipping empty ones.
+    Also returns the names read_csv mangled ("SPACER" repeats in the score
+    table and comes back as "SPACER.1", ...) mapped to the names in the file.
+    '''
+    glob = pattern.format(index="*", count=count if count else "*")
+    frames = []
+    original_names: Dict[str, str] = {}
+    for path in sorted(out_dir.glob(glob)):
+        if path.stat().st_size == 0:
+            continue
+        try:
+            df = pd.read_csv(path, dtype=str)
+        except pd.errors.EmptyDataError:
+            # Shards from before empty tables were written as empty files hold just "\n"
+            continue
+        if df.empty:
+            continue
+        with path.open(newline="", encoding="utf-8") as f:
+            header = next(csv.reader(f))
+        original_names.update({read: name for read, name in zip(df.columns, header) if read != name})
+        frames.append(df)
+    return frames, original_names
+
+
+def _to_csv_atomic(df: pd.DataFrame, path: Path, index: bool) -> None:
+    '''to_csv through a temporary file, so the service never reloads a half-written table.'''
+    tmp_path = Path(f"{path}.partial")
+    df.to_csv(tmp_path, index=index)
+    os.replace(tmp_path, path)
+
+
+def merge_shards(
+        out_dir: Path,
+        count: Optional[int] = None,
+        scores_out_path: Path = SCORES_CSV_PATH,
+        round_guids_out_path: Path = ROUND_GUIDS_CSV_PATH,
+        recaps_out_path: Path = ALL_RECAPS_CSV_PATH,
+) -> Tuple[int, int]:
+    '''
+    Combines shard outputs into the canonical tables. Scores are deduplicated
+    on performance_guid, recaps on (round_guid, school); both are sorted so the
+    result doesn't depend on shard count or finish order. Returns
+    (score rows, recap rows) written. Tables with no shard files are left alone.
+    '''
+    from recap.UMEA_api import write_guid_csv
+
+    n_scores = n_recaps = 0
+
+    score_frames, _ = _read_shards(out_dir, SCORES_SHARD_PATTERN, count)
+    if score_frames:
+        scores = pd.concat(score_frames, ignore_index=True)
+        scores = scores.drop_duplicates(subset="performance_guid", keep="first")
+        ensure_row_hash(scores, SCORES_KEY)
+        scores = scores.sort_values(
+            ["season_name", "competition_date", "round_guid", "performance_guid"],
+            kind="stable", ignore_index=True,
+        )
+        _to_csv_atomic(scores, scores_out_path, index=False)
+        write_guid_csv(set(scores["round_guid"].dropna()), str(round_guids_out_path))
+        n_scores = len(scores)
+
+    recap_frames, original_names = _read_shards(out_dir, RECAPS_SHARD_PATTERN, count)
+    if recap_frames:
+        recaps = pd.concat(recap_frames, ignore_index=True)
+        recaps = recaps.drop_duplicates(subset=["round_guid", "school"], keep="first")
+        ensure_row_hash(recaps, RECAPS_KEY)
+        recaps = recaps.sort_values(["round_guid", "school"], kind="stable", ignore_index=True)
+        # Same header as the unsharded table
+        recaps.columns = [original_names.get(c, c) for c in recaps.columns]
+        _to_csv_atomic(recaps, recaps_out_path, index=True)
+        n_recaps = len(recaps)
+
+    return n_scores, n_recaps
@@ -0,0 +1,296 @@
+'''
+Synthetic CompetitionSuite-style data for scale testing.
+
+Real UMEA recaps top out at a few dozen bands, so these generators build
+recap HTML and GetCompetition / GetCompetitionsBySeason JSONP payloads of any
+size, shaped like the real ones closely enough to go through
+RecapPage.parse_header / parse_scores, TransformHeader.update_header,
+load_multiple_recaps and flatten_competition_results unchanged.
+
+Scores follow the real sheet's scale: judges score 0-100 (whole points),
+and a sub-caption's `*Tot` is the judges' mean times the sub-caption's
+weight (SUB_CAPTION_WEIGHTS), to three decimals. `*Tot`s add up to the
+caption totals, those to SubTotal (out of 100), and ranks follow scores.
+
+Note: TransformHeader's block rules are fixed to the UMEA sheet (two judges
+per sub-caption, Music/Visual with two sub-captions each, Percussion and
+Color Guard with one). Other layouts generate fine and validate fine, but
+will not line up with update_header's renamed columns.
+'''
+
+import datetime as dt
+import json
+import random
+import uuid
+from dataclasses import dataclass, field
+from html import escape
+from typing import Dict, List, Optional, Tuple
+
+# caption -> [(sub-caption, [judge column headers])]
+UMEA_LAYOUT: List[Tuple[str, List[Tuple[str, List[str]]]]] = [
+    ('Music', [('Music Ensemble', ['Musc', 'Tech']), ('Music Effect', ['Rep', 'Perf'])]),
+    ('Visual', [('Visual Ensemble', ['Comp', 'Achv']), ('Visual Effect', ['Rep', 'Perf'])]),
+    ('Percussion', [('Percussion', ['Comp', 'Perf'])]),
+    ('Color Guard', [('Color Guard', ['Voc', 'Ach'])]),
+]
+
+# Share of the 100-point SubTotal per sub-caption. Music Ensemble's 0.275 is
+# read off real UMEA recaps; the other five split the remaining 72.5 evenly.
+SUB_CAPTION_WEIGHTS: Dict[str, float] = {
+    'Music Ensemble': 0.275,
+    'Music Effect': 0.145,
+    'Visual Ensemble': 0.145,
+    'Visual Effect': 0.145,
+    'Percussion': 0.145,
+    'Color Guard': 0.145,
+}
+
+DIVISIONS = ['2A', '3A', '4A Scholastic', '4A Open', '5A Scholastic', '5A Open', '6A Scholastic', '6A Open']
+
+
+@dataclass
+class SyntheticConfig:
+    '''Knobs for the generators. judges_per_sub_caption overrides the judge count of every sub-caption in `layout`.'''
+    n_bands: int = 20
+    layout: List[Tuple[str, List[Tuple[str, List[str]]]]] = field(default_factory=lambda: list(UMEA_LAYOUT))
+    judges_per_sub_caption: Optional[int] = None
+    penalty_rate: float = 0.1
+    seed: int = 0
+
+    def resolved_layout(self) -> List[Tuple[str, List[Tuple[str, List[str]]]]]:
+        if self.judges_per_sub_caption is None:
+            return self.layout
+        return [
+            (caption, [(sub, [f'J{i + 1}' for i in range(self.judges_per_sub_caption)]) for sub, _ in subs])
+            for caption, subs in self.layout
+        ]
+
+
+def _guid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _ranks(values: List[float]) -> List[int]:
+    '''Competition ranking, highest = 1.'''
+    ordered = sorted(values, reverse=True)
+    first = {}
+    for i, v in enumerate(ordered):
+        first.setdefault(v, i + 1)
+    return [first[v] for v in values]
+
+
+def band_names(n: int) -> List[Tuple[str, str]]:
+    '''(school, "City, ST") pairs; unknown to CITY_DICT on purpose so lookups hit the fallback path.'''
+    return [(f'Synthetic {i:04d}', f'Town {i % 97}, UT') for i in range(n)]
+
+
+# -------------------------------------------------------------------
+# Recap HTML
+# -------------------------------------------------------------------
+
+def generate_scores(config: SyntheticConfig, rng: random.Random) -> List[Dict[str, float]]:
+    '''One dict per band: every judge score, sub-caption *Tot, caption Tot, SubTotal, penalty and Total.'''
+    layout = config.resolved_layout()
+    weights = sub_caption_weights(layout)
+    bands = []
+    for _ in range(config.n_bands):
+        strength = rng.uniform(0.45, 0.95)
+        row: Dict[str, float] = {}
+        subtotal = 0.0
+        for caption, subs in layout:
+            caption_total = 0.0
+            for sub, judges in subs:
+                judge_scores = []
+                for judge in judges:
+                    score = float(min(max(round(rng.gauss(strength, 0.04) * 100), 0), 100))
+                    row[f'{sub}|{judge}'] = score
+                    judge_scores.append(score)
+                sub_total = round(sum(judge_scores) / len(judge_scores) * weights[sub], 3)
+                row[f'{sub}|*Tot'] = sub_total
+                caption_total += sub_total
+            caption_total = round(caption_total, 3)
+            row[f'{caption}|Tot'] = caption_total
+            subtotal += caption_total
+        row['SubTotal'] = round(subtotal, 3)
+        row['Penalty'] = round(rng.choice([0.5, 1.0]), 2) if rng.random() < config.penalty_rate else 0.0
+        row['Total'] = round(row['SubTotal'] - row['Penalty'], 3)
+        bands.append(row)
+    return bands
+
+
+def sub_caption_weights(layout: List[Tuple[str, List[Tuple[str, List[str]]]]]) -> Dict[str, float]:
+    '''SUB_CAPTION_WEIGHTS for the UMEA sheet; any other layout splits 100 points evenly across its sub-captions.'''
+    subs = [sub for _, caption_subs in layout for sub, _ in caption_subs]
+    if all(sub in SUB_CAPTION_WEIGHTS for sub in subs):
+        return {sub: SUB_CAPTION_WEIGHTS[sub] for sub in subs}
+    return {sub: 1.0 / len(subs) for sub in subs}
+
+
+def _score_cell(score: float, rank: int) -> str:
+    # No nested <tr>: RecapPage collects every <tr> under the table as a row
+    return (
+        '<td><div>'
+        f'<td class="content score" data-translate-number="{score:.3f}">{score:.3f}</td>'
+        f'<td class="content rank">{rank}</td>'
+        '</div></td>'
+    )
+
+
+def generate_recap_html(config: SyntheticConfig, division: str = '3A') -> str:
+    '''A full recap page. Table 1 is the score table RecapPage parses (header rows 0-5, band rows from 6).'''
+    rng = random.Random(config.seed)
+    layout = config.resolved_layout()
+    scores = generate_scores(config, rng)
+
+    # Column order: for every caption, each sub-caption's judges + *Tot, then the caption Tot
+    columns: List[str] = []
+    raw_headers: List[str] = []
+    for caption, subs in layout:
+        for sub, judges in subs:
+            for judge in judges:
+                columns.append(f'{sub}|{judge}')
+                raw_headers.append(judge)
+            columns.append(f'{sub}|*Tot')
+            raw_headers.append('*Tot')
+        columns.append(f'{caption}|Tot')
+        raw_headers.append('Tot')
+    columns.append('SubTotal')
+
+    ranks = {col: _ranks([b[col] for b in scores]) for col in columns + ['Total']}
+    names = band_names(config.n_bands)
+
+    def cells(texts: List[str]) -> str:
+        return ''.join(f'<td>{escape(t)}</td>' for t in texts)
+
+    captions = [c for c, _ in layout] + ['Sub Total', 'Penalties', 'Total']
+    sub_captions = [s for _, subs in layout for s, _ in subs]
+    judges = [f'Judge {i + 1}' for i in range(len(sub_captions))]
+
+    parts = [
+        '<html><body>',
+        '<table><tr><td>Synthetic Recap</td></tr></table>',
+        '<table>',
+        f'<tr><td>{escape(division)}</td></tr>',
+        '<tr><td>Final</td></tr>',
+        f'<tr><td></td><td></td>{cells(captions)}</tr>',
+        f'<tr><td></td><td></td>{cells(sub_captions)}</tr>',
+        f'<tr><td></td><td></td>{cells(judges)}</tr>',
+        f'<tr><td></td><td></td>{cells(raw_headers)}</tr>',
+    ]
+    for i, (band, (school, city)) in enumerate(zip(scores, names)):
+        row = [f'<tr><td>{escape(school)}</td><td>{escape(city)}</td>']
+        for col in columns:
+            row.append(_score_cell(band[col], ranks[col][i]))
+        penalty = band['Penalty']
+        row.append(f'<td>{penalty:.1f}</td><td>-</td><td>{penalty:.3f}</td><td>-</td>')
+        row.append(_score_cell(band['Total'], ranks['Total'][i]))
+        row.append('</tr>')
+        parts.append(''.join(row))
+    parts.append('</table></body></html>')
+    return ''.join(parts)
+
+
+def generate_category_recap_html(config: SyntheticConfig, division: str = '3A') -> str:
+    '''A category recap page for the same bands/scores as generate_recap_html: one table per caption, bands sorted by the caption total.'''
+    rng = random.Random(config.seed)
+    layout = config.resolved_layout()
+    scores = generate_scores(config, rng)
+    names = band_names(config.n_bands)
+
+    parts = ['<html><body>', f'<table><tr><td>{escape(division)} Category Recap</td></tr></table>']
+    for caption, subs in layout:
+        columns = [f'{sub}|{judge}' for sub, judges in subs for judge in judges + ['*Tot']] + [f'{caption}|Tot']
+        labels = [judge for _, judges in subs for judge in judges + ['*Tot']] + ['Tot']
+        ranks = {col: _ranks([b[col] for b in scores]) for col in columns}
+        order = sorted(range(len(scores)), key=lambda i: -scores[i][f'{caption}|Tot'])
+
+        parts.append('<table>')
+        parts.append(f'<tr><td>{escape(caption)}</td></tr>')
+        parts.append('<tr><td>School</td><td>Location</td>'
+                     + ''.join(f'<td>{escape(label)}</td>' for label in labels) + '</tr>')
+        for i in order:
+            school, city = names[i]
+            row = [f'<tr><td>{escape(school)}</td><td>{escape(city)}</td>']
+            row.extend(_score_cell(scores[i][col], ranks[col][i]) for col in columns)
+            row.append('</tr>')
+            parts.append(''.join(row))
+        parts.append('</table>')
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+# -------------------------------------------------------------------
+# API payloads
+# -------------------------------------------------------------------
+
+def generate_competition_payload(
+        n_rounds: int,
+        bands_per_round: int,
+        season_guid: str = 'synthetic-season',
+        competition_date: str = '2025-10-04T00:00:00',
+        seed: int = 0,
+) -> dict:
+    '''A GetCompetition payload with n_rounds divisions of bands_per_round performances each.'''
+    rng = random.Random(seed)
+    competition_guid = _guid(rng)
+    rounds = []
+    names = band_names(bands_per_round)
+    for r in range(n_rounds):
+        round_guid = _guid(rng)
+        totals = [round(rng.uniform(45, 90), 3) for _ in range(bands_per_round)]
+        performances = [
+            {
+                'performanceGuid': _guid(rng),
+                'name': school,
+                'city': city.split(',')[0],
+                'state': 'UT',
+                'score': total,
+                'rank': rank,
+            }
+            for (school, city), total, rank in zip(names, totals, _ranks(totals))
+        ]
+        rounds.append({
+            'divisionGuid': round_guid,
+            'roundGuid': round_guid,
+            'name': DIVISIONS[r % len(DIVISIONS)] if r < len(DIVISIONS) else f'Division {r}',
+            'fullRecapUrl': f'http://recaps.competitionsuite.com/{round_guid}.htm',
+            'categoryRecapUrl': f'http://recaps.competitionsuite.com/{round_guid}_cat.htm',
+            'performances': performances,
+        })
+
+    return {
+        'seasonGuid': season_guid,
+        'competitionGuid': competition_guid,
+        'name': f'Synthetic Invitational {seed}',
+        'competitionDate': competition_date,
+        'location': 'Synthetic Stadium (Nowhere, UT)',
+        'recapUrl': f'http://recaps.competitionsuite.com/{competition_guid}.htm',
+        'rounds': rounds,
+    }
+
+
+def generate_season_payloads(
+        n_competitions: int,
+        n_rounds: int,
+        bands_per_round: int,
+        season_guid: str = 'synthetic-season',
+        seed: int = 0,
+) -> Tuple[dict, List[dict]]:
+    '''(GetCompetitionsBySeason payload, [GetCompetition payload per competition]) for one season, one show a week.'''
+    comps = []
+    for i in range(n_competitions):
+        date = (dt.date(2025, 8, 30) + dt.timedelta(days=7 * i)).isoformat() + 'T00:00:00'
+        comps.append(generate_competition_payload(
+            n_rounds, bands_per_round, season_guid=season_guid,
+            competition_date=date, seed=seed * 10_000 + i,
+        ))
+    listing = {'competitions': [
+        {'competitionGuid': c['competitionGuid'], 'name': c['name'], 'competitionDate': c['competitionDate']}
+        for c in comps
+    ]}
+    return listing, comps
+
+
+def to_jsonp(payload: dict, callback: str = 'jQuery110209904385531594735_1763353270252') -> str:
+    '''Wraps a payload the way the bridge API does: callback({...});'''
+    return f'{callback}({json.dumps(payload)});'
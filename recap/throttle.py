@@ -0,0 +1,304 @@
+'''
+Adaptive concurrency for the recap and API fetchers.
+
+Instead of a fixed worker count and blind random sleeps, every GET goes
+through one AIMD (additive increase, multiplicative decrease) limit on how
+many requests may be in flight at once, shared by the recap pages, the
+category pages and the GetCompetition calls:
+
+    - a success whose latency is near the baseline raises the limit by
+      1/limit, i.e. about +1 per limit's worth of responses, but only while
+      the limit is what holds requests back (all slots taken when the
+      request started or finished): with fewer workers than slots it would
+      otherwise drift to max_limit, and a cut from there wouldn't lower
+      what is actually in flight,
+    - 403 / 429 / 5xx, a connection error or timeout, or smoothed latency
+      above `latency_factor` x baseline (and more than `latency_floor`
+      above it: parsing on the other workers holds the GIL, so a busy
+      crawler sees some latency the server didn't add) cuts it by
+      `decrease` (halves it), at most once per round of requests started
+      before the cut,
+    - a Retry-After on a throttled response also holds back new requests
+      until it has passed,
+    - any other 4xx (404, 410, ...) says nothing about load: it is counted
+      as `client_errors` and leaves the limit alone.
+
+throttled_get() wraps the shared session: it takes a slot, reports the
+outcome, and retries throttled / failed requests with backoff before
+finally raising. The limit and every change to it (with the reason) are
+kept so a run can report them; main() writes them to RUN_METRICS_PATH.
+
+Standard library only; requests is imported on first use.
+'''
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional
+
+from recap.session import POOL_SIZE, get_session
+
+THROTTLE_STATUSES = {403, 429}
+
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 1.0   # seconds; doubled per attempt, with jitter
+MAX_BACKOFF = 30.0
+
+# Share of the gap to the current latency the baseline closes per response;
+# lets it follow a server that is just slower today instead of cutting forever
+BASELINE_DRIFT = 0.05
+
+
+@dataclass
+class LimitChange:
+    '''One move of the limit: when (seconds since the controller started), to what, and why.'''
+    at: float
+    limit: int
+    reason: str
+
+
+class _Permit:
+    '''A slot held by one request; records the epoch it started in so one burst of failures only cuts once, and whether it took the last free slot.'''
+
+    def __init__(self, controller: "AdaptiveConcurrency"):
+        self.controller = controller
+        self.epoch = controller._epoch
+        self.saturated = controller._in_flight >= controller.limit
+        self.started = time.perf_counter()
+        self.done = False
+
+    def record(self, status: Optional[int], retry_after: Optional[float] = None, latency: Optional[float] = None) -> None:
+        '''Reports the outcome: an HTTP status, or None for a connection error / timeout. `latency` defaults to the time the slot was held.'''
+        if not self.done:
+            self.done = True
+            if latency is None:
+                latency = time.perf_counter() - self.started
+            self.controller._record(self, status, latency, retry_after)
+
+
+class AdaptiveConcurrency:
+    '''AIMD limit on in-flight requests. Use `with controller.slot() as permit:` around a request and call permit.record(status).'''
+
+    def __init__(
+            self,
+            initial: int = 4,
+            min_limit: int = 1,
+            max_limit: int = POOL_SIZE,
+            decrease: float = 0.5,
+            latency_factor: float = 2.0,
+            latency_floor: float = 0.25,
+            smoothing: float = 0.2,
+            warmup: int = 5,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.latency_floor = latency_floor
+        self.smoothing = smoothing
+        self.warmup = warmup
+
+        self._cond = threading.Condition()
+        self._start = time.perf_counter()
+        self.reset(initial)
+
+    def reset(self, initial: Optional[int] = None) -> None:
+        '''Back to the starting limit with empty counters and history (between runs, or in tests).'''
+        with self._cond:
+            if initial is not None:
+                self.initial = min(max(initial, self.min_limit), self.max_limit)
+            self._limit = float(self.initial)
+            self._in_flight = 0
+            self._epoch = 0
+            self._resume_at = 0.0
+            self._latency: Optional[float] = None
+            self._baseline: Optional[float] = None
+            self._samples = 0
+
+            self.requests = 0
+            self.successes = 0
+            self.client_errors = 0
+            self.throttled = 0
+            self.errors = 0
+            self.peak_in_flight = 0
+            self.history: List[LimitChange] = [LimitChange(0.0, self.initial, 'start')]
+            self._start = time.perf_counter()
+            self._cond.notify_all()
+
+    # ---------- Slots ----------
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @contextmanager
+    def slot(self) -> Iterator[_Permit]:
+        '''Blocks until a request may start (under the limit, not paused by Retry-After), then holds the slot for the block.'''
+        with self._cond:
+            while True:
+                wait = self._resume_at - time.monotonic()
+                if wait <= 0 and self._in_flight < self.limit:
+                    break
+                self._cond.wait(timeout=wait if wait > 0 else None)
+            self._in_flight += 1
+            self.requests += 1
+            self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+            permit = _Permit(self)
+        try:
+            yield permit
+        finally:
+            if not permit.done:
+                # Left the block on an exception before recording: count it as a failure
+                permit.record(None)
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    # ---------- AIMD ----------
+
+    def _record(self, permit: _Permit, status: Optional[int], latency: float, retry_after: Optional[float]) -> None:
+        with self._cond:
+            if status is None:
+                self.errors += 1
+                self._cut(permit, 'error')
+            elif status in THROTTLE_STATUSES or status >= 500:
+                self.throttled += 1
+                if retry_after:
+                    self._resume_at = max(self._resume_at, time.monotonic() + retry_after)
+                self._cut(permit, str(status))
+            elif status >= 400:
+                # Not found / gone: the server answered fine, so no signal either way
+                self.client_errors += 1
+            else:
+                self.successes += 1
+                if self._latency_rising(latency):
+                    self._cut(permit, 'latency')
+                elif permit.saturated or self._in_flight >= self.limit:
+                    # Only grow a limit that is binding (this request still counts as in flight)
+                    self._set(self._limit + 1.0 / max(self._limit, 1.0), 'increase')
+            self._cond.notify_all()
+
+    def _latency_rising(self, latency: float) -> bool:
+        '''Updates the smoothed latency and the baseline (lowest smoothed latency, drifting slowly toward the current one).'''
+        a = self.smoothing
+        self._latency = latency if self._latency is None else (1 - a) * self._latency + a * latency
+        self._samples += 1
+        if self._baseline is None or self._latency < self._baseline:
+            self._baseline = self._latency
+        else:
+            self._baseline += (self._latency - self._baseline) * BASELINE_DRIFT
+        return (self._samples > self.warmup
+                and self._latency > self.latency_factor * self._baseline
+                and self._latency - self._baseline > self.latency_floor)
+
+    def _cut(self, permit: _Permit, reason: str) -> None:
+        # Requests already in flight when the limit was cut don't cut it again
+        if permit.epoch != self._epoch:
+            return
+        self._epoch += 1
+        if reason == 'latency':
+            # Start measuring again from the lower load
+            self._latency = self._baseline
+        self._set(max(self._limit * self.decrease, float(self.min_limit)), reason)
+
+    def _set(self, value: float, reason: str) -> None:
+        before = self.limit
+        self._limit = min(max(value, float(self.min_limit)), float(self.max_limit))
+        if self.limit != before:
+            self.history.append(LimitChange(round(time.perf_counter() - self._start, 3), self.limit, reason))
+
+    # ---------- Metrics ----------
+
+    def stats_dict(self) -> Dict[str, object]:
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                'requests': self.requests,
+                'successes': self.successes,
+                'client_errors': self.client_errors,
+                'throttled': self.throttled,
+                'errors': self.errors,
+                'peak_in_flight': self.peak_in_flight,
+                'latency_ms': round(self._latency * 1000, 1) if self._latency is not None else None,
+                'baseline_ms': round(self._baseline * 1000, 1) if self._baseline is not None else None,
+                'history': [asdict(c) for c in self.history],
+            }
+
+    def summary(self) -> str:
+        limits = [c.limit for c in self.history]
+        return (f"limit {self.limit} (range {min(limits)}-{max(limits)}, {len(self.history) - 1} change(s)), "
+                f"{self.requests} request(s), {self.throttled} throttled, {self.client_errors} client error(s), "
+                f"{self.errors} error(s), peak {self.peak_in_flight} in flight")
+
+
+CONCURRENCY = AdaptiveConcurrency()
+
+
+# -------------------------------------------------------------------
+# Requests
+# -------------------------------------------------------------------
+
+def _retry_after(headers) -> Optional[float]:
+    value = headers.get('Retry-After') if headers is not None else None
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except ValueError:
+        return None   # HTTP-date form; the backoff covers it
+
+
+def _backoff(attempt: int, retry_after: Optional[float]) -> float:
+    if retry_after is not None:
+        return min(retry_after, MAX_BACKOFF)
+    return min(BACKOFF_BASE * 2 ** attempt, MAX_BACKOFF) * random.uniform(0.5, 1.0)
+
+
+def throttled_get(
+        url: str,
+        controller: Optional[AdaptiveConcurrency] = None,
+        max_attempts: int = MAX_ATTEMPTS,
+        **kwargs,
+):
+    '''
+    session.get(url, **kwargs) under the adaptive limit. Throttled (403/429/5xx)
+    responses and connection errors are retried with backoff up to
+    max_attempts; then the last error is raised (HTTPError for a status).
+    Returns the response for anything below 400, 304 included.
+    '''
+    import requests
+
+    controller = controller or CONCURRENCY
+    for attempt in range(max_attempts):
+        last = attempt == max_attempts - 1
+        with controller.slot() as permit:
+            try:
+                response = get_session().get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                permit.record(None)
+                if last:
+                    raise
+                response = None
+            else:
+                # elapsed = request sent -> headers parsed, the server's share of the wait
+                retry_after = _retry_after(response.headers)
+                permit.record(response.status_code, retry_after, latency=response.elapsed.total_seconds())
+
+        if response is None:
+            time.sleep(_backoff(attempt, None))
+            continue
+        status = response.status_code
+        if status < 400:
+            return response
+        if status in THROTTLE_STATUSES or status >= 500:
+            if not last:
+                time.sleep(_backoff(attempt, retry_after))
+                continue
+        # 404 and friends aren't worth retrying; the last throttled attempt ends up here too
+        response.raise_for_status()
@@ -0,0 +1,208 @@
+'''
+Score consistency checks for parsed recap rows.
+
+Every recap row carries redundant totals, so a mis-aligned parse from
+RecapPage.parse_scores almost always breaks at least one of these:
+
+    judges      a sub-caption's `*Tot` is its judges' mean (0-100 scale) times
+                that sub-caption's weight (MusEns is 0.275 on the UMEA
+                sheet); the weight is inferred per round as the median
+                `*Tot` / mean ratio, so only rows off that ratio fail
+    captions    sub-caption `*Tot`s sum to the caption `_Total`
+    subtotal    caption `_Total`s sum to `SubTotal`
+    total       SubTotal - |Penalties_Total| == Total
+    ranks       every `<x>_Rank` / `Rank` agrees with its total inside the round_guid
+                (competition ranking: 1 + number of strictly higher scores)
+
+Column groups are discovered from the renamed headers (TransformHeader), so
+pages with a different number of judges or captions still validate. All
+checks run as NumPy operations over the whole frame at once.
+'''
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_TOLERANCE = 0.011  # scores are published to 2-3 decimals
+
+
+@dataclass
+class CaptionLayout:
+    '''Which columns feed which total, discovered from the header order.'''
+    # sub-caption prefix -> (judge score columns, sub-caption *Tot column)
+    sub_captions: Dict[str, Tuple[List[str], str]] = field(default_factory=dict)
+    # caption total column -> sub-caption *Tot columns that feed it
+    captions: Dict[str, List[str]] = field(default_factory=dict)
+    # (total column, rank column) pairs to check within each round
+    rank_pairs: List[Tuple[str, str]] = field(default_factory=list)
+
+
+@dataclass
+class ValidationReport:
+    '''Per-row results: one boolean column per check (True = passed) plus an overall `valid` column.'''
+    flags: pd.DataFrame
+    layout: CaptionLayout
+
+    @property
+    def valid(self) -> pd.Series:
+        return self.flags["valid"]
+
+    def summary(self) -> Dict[str, int]:
+        '''Number of failing rows per check.'''
+        return {col: int((~self.flags[col]).sum()) for col in self.flags.columns}
+
+
+def discover_layout(columns: List[str]) -> CaptionLayout:
+    '''Walks the renamed headers in order and groups judge / sub-caption / caption columns.'''
+    layout = CaptionLayout()
+    pending_tots: List[str] = []
+    judges: Dict[str, List[str]] = {}
+
+    for col in columns:
+        if col.endswith("_score"):
+            prefix, _, judge = col[:-len("_score")].partition("_")
+            if judge == "*Tot":
+                layout.sub_captions[prefix] = (judges.pop(prefix, []), col)
+                pending_tots.append(col)
+                if f"{prefix}_*Tot_rank" in columns:
+                    layout.rank_pairs.append((col, f"{prefix}_*Tot_rank"))
+            else:
+                judges.setdefault(prefix, []).append(col)
+        elif col.endswith("_Total") and col != "Penalties_Total":
+            layout.captions[col] = pending_tots
+            pending_tots = []
+            rank_col = col[:-len("_Total")] + "_Rank"
+            if rank_col in columns:
+                layout.rank_pairs.append((col, rank_col))
+
+    if "SubTotal" in columns and "SubTotal_Rank" in columns:
+        layout.rank_pairs.append(("SubTotal", "SubTotal_Rank"))
+    if "Total" in columns and "Rank" in columns:
+        layout.rank_pairs.append(("Total", "Rank"))
+    return layout
+
+
+class _NumericColumns:
+    '''Converts each column to float at most once; anything unparseable becomes NaN.'''
+
+    def __init__(self, df: pd.DataFrame):
+        self._df = df
+        self._cache: Dict[str, np.ndarray] = {}
+
+    def col(self, name: str) -> np.ndarray:
+        values = self._cache.get(name)
+        if values is None:
+            values = pd.to_numeric(self._df[name], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+            self._cache[name] = values
+        return values
+
+    def matrix(self, names: List[str]) -> np.ndarray:
+        if not names:
+            return np.zeros((len(self._df), 0))
+        return np.column_stack([self.col(c) for c in names])
+
+
+def round_weights(groups: np.ndarray, ratios: np.ndarray) -> np.ndarray:
+    '''Median of `ratios` within each group code, broadcast back to every row (NaN ratios are ignored; a group with none gets NaN).'''
+    return pd.Series(ratios).groupby(groups).transform("median").to_numpy(dtype=float)
+
+
+def _sum_matches(parts: np.ndarray, total: np.ndarray, tolerance: float) -> np.ndarray:
+    # NaN anywhere (missing or shifted text) fails the comparison
+    return np.abs(parts.sum(axis=1) - total) <= tolerance
+
+
+def competition_ranks(groups: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    '''
+    Vectorized 'min' ranking of scores (highest = 1) inside each group code.
+    Ties share the best rank, NaN scores get NaN.
+    '''
+    n = len(scores)
+    ranks = np.full(n, np.nan)
+    ok = ~np.isnan(scores)
+    if not ok.any():
+        return ranks
+
+    idx = np.flatnonzero(ok)
+    g, s = groups[idx], scores[idx]
+    order = np.lexsort((-s, g))
+    g, s = g[order], s[order]
+
+    positions = np.arange(len(order))
+    group_start = np.r_[True, g[1:] != g[:-1]]
+    run_start = group_start | np.r_[True, s[1:] != s[:-1]]
+
+    first_of_group = np.maximum.accumulate(np.where(group_start, positions, 0))
+    first_of_run = np.maximum.accumulate(np.where(run_start, positions, 0))
+
+    ranks[idx[order]] = first_of_run - first_of_group + 1
+    return ranks
+
+
+def validate_recaps(df: pd.DataFrame, tolerance: float = DEFAULT_TOLERANCE) -> ValidationReport:
+    '''Runs every consistency check over `df` (the recap table) and returns per-row flags.'''
+    layout = discover_layout(list(df.columns))
+    n = len(df)
+    num = _NumericColumns(df)
+    flags: Dict[str, np.ndarray] = {}
+
+    # 1) judges -> sub-caption *Tot: mean x a per-round weight, flag the rows off the median ratio
+    # (one band in a round is its own median, so a single-band round can't fail this check)
+    groups = pd.factorize(df["round_guid"])[0] if "round_guid" in df.columns else np.zeros(n, dtype=int)
+    for prefix, (judge_cols, tot_col) in layout.sub_captions.items():
+        if not judge_cols:
+            continue
+        mean = num.matrix(judge_cols).mean(axis=1)
+        total = num.col(tot_col)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = np.where(mean != 0, total / mean, np.nan)
+        expected = mean * np.nan_to_num(round_weights(groups, ratios))
+        flags[f"judges:{prefix}"] = np.abs(expected - total) <= tolerance
+
+    # 2) sub-caption *Tot -> caption _Total
+    caption_totals = []
+    for total_col, tot_cols in layout.captions.items():
+        total = num.col(total_col)
+        caption_totals.append(total)
+        if tot_cols:
+            flags[f"caption:{total_col}"] = _sum_matches(num.matrix(tot_cols), total, tolerance)
+
+    # 3) caption totals -> SubTotal, SubTotal - penalties -> Total
+    if "SubTotal" in df.columns:
+        subtotal = num.col("SubTotal")
+        if caption_totals:
+            flags["subtotal"] = _sum_matches(np.column_stack(caption_totals), subtotal, tolerance)
+
+        if "Total" in df.columns:
+            penalties = np.zeros(n)
+            if "Penalties_Total" in df.columns:
+                penalties = np.nan_to_num(np.abs(num.col("Penalties_Total")))
+            total = num.col("Total")
+            flags["total"] = np.abs(subtotal - penalties - total) <= tolerance
+
+    # 4) ranks agree with totals inside each round
+    if "round_guid" in df.columns and layout.rank_pairs:
+        for total_col, rank_col in layout.rank_pairs:
+            expected = competition_ranks(groups, num.col(total_col))
+            actual = num.col(rank_col)
+            flags[f"rank:{rank_col}"] = expected == actual
+
+    flag_df = pd.DataFrame(flags, index=df.index)
+    flag_df["valid"] = flag_df.all(axis=1) if flags else np.ones(n, dtype=bool)
+    return ValidationReport(flags=flag_df, layout=layout)
+
+
+def flag_invalid_rows(df: pd.DataFrame, tolerance: float = DEFAULT_TOLERANCE) -> pd.DataFrame:
+    '''Adds `valid` and `validation_failures` (semicolon-joined check names) columns to df in place and returns it.'''
+    report = validate_recaps(df, tolerance=tolerance)
+    checks = report.flags.drop(columns="valid")
+
+    failures = pd.Series("", index=df.index)
+    for name in checks.columns:
+        failures = failures + np.where(checks[name].to_numpy(), "", name + ";")
+
+    df["valid"] = report.valid
+    df["validation_failures"] = failures.str.rstrip(";")
+    return df
@@ -0,0 +1,71 @@
+'''
+Import-time benchmark for the CLI.
+
+Runs a few cheap subcommands in fresh interpreters and checks that
+    - none of pandas / requests / bs4 get imported, and
+    - the median wall time stays under the budget.
+
+Exits non-zero when either check fails, so it can be dropped into cron or CI:
+
+    python scripts/bench_import.py --budget-ms 150
+'''
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ["pandas", "numpy", "requests", "bs4"]
+
+CHECK_HEAVY = (
+    "import sys, recap.cli; "
+    f"loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]; "
+    "print(','.join(loaded))"
+)
+
+
+def time_command(cmd: List[str], runs: int) -> List[float]:
+    timings: List[float] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    failed = False
+
+    out = subprocess.run(
+        [sys.executable, "-c", CHECK_HEAVY],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    if out:
+        print(f"FAIL: importing recap.cli pulled in {out}")
+        failed = True
+
+    baseline = statistics.median(time_command([sys.executable, "-c", "pass"], args.runs))
+    print(f"bare interpreter: {baseline:.1f} ms")
+
+    for sub in (["stats"], ["query", "--band", "__none__"]):
+        timings = time_command([sys.executable, "-m", "recap", *sub], args.runs)
+        median = statistics.median(timings)
+        status = "ok" if median <= args.budget_ms else "FAIL"
+        print(f"recap {' '.join(sub)}: median {median:.1f} ms, max {max(timings):.1f} ms [{status}]")
+        if median > args.budget_ms:
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+'''
+Scaling benchmarks on synthetic data.
+
+For a range of input sizes, times (best of --repeat) and measures peak
+traced memory of:
+
+    parse_scores           RecapPage.feed + parse_header + parse_scores, size = bands on the page
+    update_header          TransformHeader.update_header, size = bands (should be flat)
+    load_multiple_recaps   over a local HTTP server, size = number of recap pages
+    flatten_competition    flatten_competition_results, size = performances in the payload
+
+Then fits the log-log slope of time vs size for each stage. A slope well
+above 1 means superlinear behavior and is flagged (exit code 1).
+
+    python scripts/bench_scaling.py --sizes 25,100,400,1600 --plot scaling.png
+
+--plot needs matplotlib; without it results are only printed / written to --csv.
+'''
+
+import argparse
+import csv
+import math
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from recap.recap_page import RecapPage, TransformHeader, load_multiple_recaps  # noqa: E402
+from recap.synthetic import (  # noqa: E402
+    SyntheticConfig,
+    generate_competition_payload,
+    generate_recap_html,
+)
+from recap.revalidate import VALIDATOR_CACHE  # noqa: E402
+from recap.UMEA_api import flatten_competition_results  # noqa: E402
+
+SUPERLINEAR_SLOPE = 1.3
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Tuple[float, float]:
+    '''(best wall seconds, peak traced MiB) for fn().'''
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 2**20
+
+
+def slope(points: List[Tuple[int, float]]) -> float:
+    '''Least-squares slope of log(time) vs log(size).'''
+    xs = [math.log(s) for s, t in points if t > 0]
+    ys = [math.log(t) for s, t in points if t > 0]
+    if len(xs) < 2:
+        return 0.0
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    num = sum((x - mx) * (y - my) for x, y in zip(xs, ys))
+    den = sum((x - mx) ** 2 for x in xs)
+    return num / den if den else 0.0
+
+
+class PageServer:
+    '''Serves generated recap pages from memory at /<n>.htm.'''
+
+    def __init__(self, pages: Dict[str, str]):
+        pages_bytes = {k: v.encode("utf-8") for k, v in pages.items()}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = pages_bytes.get(self.path.lstrip("/"))
+                self.send_response(200 if body else 404)
+                self.send_header("Content-Length", str(len(body or b"")))
+                self.end_headers()
+                self.wfile.write(body or b"")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def close(self) -> None:
+        self.server.shutdown()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="25,100,400")
+    parser.add_argument("--recap-sizes", default="5,20,40", help="page counts for load_multiple_recaps")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--csv", help="write raw results here")
+    parser.add_argument("--plot", help="write a PNG of time/memory vs size (needs matplotlib)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    recap_sizes = [int(s) for s in args.recap_sizes.split(",")]
+    results: Dict[str, List[Tuple[int, float, float]]] = {}
+
+    header_page = RecapPage("synthetic")
+    header_page.feed(generate_recap_html(SyntheticConfig(n_bands=5)))
+    header = header_page.parse_header()
+    header_cols = TransformHeader().update_header(header)
+
+    for n in sizes:
+        html = generate_recap_html(SyntheticConfig(n_bands=n, seed=n))
+
+        def parse(html=html):
+            page = RecapPage("synthetic")
+            page.feed(html)
+            page.parse_header()
+            return page.parse_scores()
+
+        payload = generate_competition_payload(n_rounds=8, bands_per_round=max(n // 8, 1), seed=n)
+
+        for stage, fn, size in (
+            ("parse_scores", parse, n),
+            ("update_header", lambda: TransformHeader().update_header(header), n),
+            ("flatten_competition", lambda payload=payload: flatten_competition_results(payload), n),
+        ):
+            t, mem = measure(fn, args.repeat)
+            results.setdefault(stage, []).append((size, t, mem))
+
+    pages = {
+        f"{i}.htm": generate_recap_html(SyntheticConfig(n_bands=30, seed=i))
+        for i in range(max(recap_sizes))
+    }
+    server = PageServer(pages)
+    try:
+        for n in recap_sizes:
+            urls = [f"{server.base}/{i}.htm" for i in range(n)]
+            def load(urls=urls):
+                # Cold every time: measure the parse, not conditional-fetch reuse
+                VALIDATOR_CACHE.clear()
+                return load_multiple_recaps(urls, header_cols=header_cols)
+
+            t, mem = measure(load, 1)
+            results.setdefault("load_multiple_recaps", []).append((n, t, mem))
+    finally:
+        server.close()
+
+    failed = False
+    print(f"{'stage':<22}{'size':>8}{'time ms':>12}{'peak MiB':>12}")
+    for stage, rows in results.items():
+        for size, t, mem in rows:
+            print(f"{stage:<22}{size:>8}{t * 1000:>12.2f}{mem:>12.2f}")
+        k = slope([(s, t) for s, t, _ in rows])
+        flag = "SUPERLINEAR" if k > SUPERLINEAR_SLOPE else "ok"
+        print(f"{stage:<22}{'slope':>8}{k:>12.2f}  [{flag}]")
+        failed |= k > SUPERLINEAR_SLOPE
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stage", "size", "seconds", "peak_mib"])
+            for stage, rows in results.items():
+                writer.writerows([stage, *row] for row in rows)
+
+    if args.plot:
+        try:
+            import matplotlib
+            matplotlib.use("Agg")
+            import matplotlib.pyplot as plt
+        except ImportError:
+            print("matplotlib not installed, skipping --plot")
+        else:
+            fig, (ax_t, ax_m) = plt.subplots(1, 2, figsize=(11, 4))
+            for stage, rows in results.items():
+                xs = [r[0] for r in rows]
+                ax_t.loglog(xs, [r[1] for r in rows], marker="o", label=stage)
+                ax_m.loglog(xs, [max(r[2], 1e-3) for r in rows], marker="o", label=stage)
+            ax_t.set(xlabel="input size", ylabel="seconds", title="time")
+            ax_m.set(xlabel="input size", ylabel="peak MiB", title="memory")
+            ax_t.legend()
+            fig.tight_layout()
+            fig.savefig(args.plot)
+            print(f"wrote {args.plot}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
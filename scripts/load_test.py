@@ -0,0 +1,122 @@
+'''
+Load test for the local query service.
+
+By default starts an in-process server on an ephemeral port over the
+cached CSVs, then hammers a mix of endpoints from several threads and
+reports p50/p99 latency and throughput:
+
+    python scripts/load_test.py --threads 8 --seconds 10
+
+Point it at an already running `python -m recap serve` with --url; the
+request mix is then built from the scores CSV alone, without loading a
+local DataStore.
+'''
+
+import argparse
+import random
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def build_paths(scores) -> List[str]:
+    '''A realistic mix of dashboard requests built from the scores table itself.'''
+    paths = ["/health"]
+    if scores.empty:
+        return paths
+    for band in list(scores["band_name"].dropna().unique())[:20]:
+        paths.append(f"/bands/{quote(band)}")
+    for guid in list(scores["round_guid"].dropna().unique())[:20]:
+        paths.append(f"/rounds/{guid}")
+    for season in scores["season_name"].dropna().unique():
+        paths.append(f"/seasons/{quote(season)}/standings")
+        for caption in ("Music", "Visual", "Percussion", "Color Guard"):
+            paths.append(f"/captions/{quote(caption)}/leaderboard?season={quote(season)}")
+    return paths
+
+
+def worker(base_url: str, paths: List[str], deadline: float, use_etag: bool,
+           latencies: List[float], errors: List[int]) -> None:
+    etags = {}
+    while time.perf_counter() < deadline:
+        path = random.choice(paths)
+        req = Request(base_url + path)
+        if use_etag and path in etags:
+            req.add_header("If-None-Match", etags[path])
+        start = time.perf_counter()
+        try:
+            with urlopen(req) as resp:
+                resp.read()
+                etags[path] = resp.headers.get("ETag")
+        except HTTPError as e:
+            if e.code not in (304, 404):
+                errors.append(e.code)
+        latencies.append(time.perf_counter() - start)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="base URL of a running service (default: start one in-process)")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--etag", action="store_true", help="send If-None-Match on repeat requests")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        from recap.service import DataStore, make_server
+
+        store = DataStore()
+        paths = build_paths(store.scores)
+        server = make_server(store, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    else:
+        import pandas as pd
+
+        from recap.config import SCORES_CSV_PATH
+
+        columns = ["band_name", "round_guid", "season_name"]
+        scores = pd.read_csv(SCORES_CSV_PATH, usecols=columns) if SCORES_CSV_PATH.exists() else pd.DataFrame()
+        paths = build_paths(scores)
+
+    latencies: List[float] = []
+    errors: List[int] = []
+    deadline = time.perf_counter() + args.seconds
+    threads = [
+        threading.Thread(target=worker, args=(base_url, paths, deadline, args.etag, latencies, errors))
+        for _ in range(args.threads)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    if server is not None:
+        server.shutdown()
+
+    if not latencies:
+        print("no requests completed")
+        return 1
+
+    ms = sorted(x * 1000 for x in latencies)
+    p99 = ms[min(int(len(ms) * 0.99), len(ms) - 1)]
+    print(f"requests: {len(ms)}  errors: {len(errors)}  distinct paths: {len(paths)}")
+    print(f"throughput: {len(ms) / elapsed:.0f} req/s")
+    print(f"latency p50: {statistics.median(ms):.2f} ms  p99: {p99:.2f} ms  max: {ms[-1]:.2f} ms")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+'''
+Run a sharded crawl with several local processes, then merge.
+
+    python scripts/run_shards_local.py --count 4 --out-dir shards/
+
+With --from-csv no network is used: each worker process re-partitions an
+existing scores CSV by competition_guid and writes its shard file, then the
+merge output is compared against the source. That exercises the
+partitioning, the per-worker outputs and the merge/dedup end to end.
+
+    python scripts/run_shards_local.py --count 4 --from-csv umea_marching_band_scores_all_seasons.csv
+'''
+
+import argparse
+import subprocess
+import sys
+import tempfile
+from multiprocessing import Pool
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+
+def reshard_worker(job) -> int:
+    index, count, src, out_dir = job
+    import pandas as pd
+    from recap.shard import shard_of, shard_paths
+
+    df = pd.read_csv(src, dtype=str)
+    mine = df[[shard_of(g, count) == index for g in df["competition_guid"]]]
+    # Re-emit one competition twice to make sure merge drops duplicates
+    if index == 0 and len(mine):
+        mine = pd.concat([mine, mine.head(3)])
+    scores_path, _ = shard_paths(Path(out_dir), index, count)
+    mine.to_csv(scores_path, index=False)
+    return len(mine)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=4)
+    parser.add_argument("--out-dir", default=None)
+    parser.add_argument("--by", choices=["competition", "round"], default="competition")
+    parser.add_argument("--from-csv", help="offline mode: reshard this scores CSV instead of crawling")
+    args = parser.parse_args()
+
+    out_dir = Path(args.out_dir or tempfile.mkdtemp(prefix="umea-shards-"))
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    if args.from_csv:
+        import pandas as pd
+        from recap.shard import merge_shards
+
+        jobs = [(i, args.count, args.from_csv, str(out_dir)) for i in range(args.count)]
+        with Pool(args.count) as pool:
+            sizes = pool.map(reshard_worker, jobs)
+        print(f"shard sizes: {sizes}")
+
+        merged_path = out_dir / "merged_scores.csv"
+        n_scores, _ = merge_shards(
+            out_dir, count=args.count,
+            scores_out_path=merged_path,
+            round_guids_out_path=out_dir / "merged_round_guids.csv",
+            recaps_out_path=out_dir / "merged_recaps.csv",
+        )
+        src = pd.read_csv(args.from_csv, dtype=str)
+        merged = pd.read_csv(merged_path, dtype=str)
+        same = set(src["performance_guid"]) == set(merged["performance_guid"]) and len(merged) == len(src)
+        print(f"source rows: {len(src)}  merged rows: {n_scores}  match: {same}")
+        return 0 if same else 1
+
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "recap", "shard", "--index", str(i),
+             "--count", str(args.count), "--by", args.by, "--out-dir", str(out_dir)],
+            cwd=REPO_ROOT,
+        )
+        for i in range(args.count)
+    ]
+    codes = [p.wait() for p in procs]
+    if any(codes):
+        print(f"worker exit codes: {codes}")
+        return 1
+
+    return subprocess.call(
+        [sys.executable, "-m", "recap", "merge-shards", "--out-dir", str(out_dir), "--count", str(args.count)],
+        cwd=REPO_ROOT,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+'''
+Adaptive concurrency against a local stand-in server that throttles.
+
+Serves synthetic recap pages (recap/synthetic.py) from a local HTTP server
+that behaves like an overloaded CompetitionSuite, then crawls them with
+recap.crawl.iter_round_recaps and checks how recap.throttle's limit moved:
+
+    healthy    fast, never throttles          -> the limit climbs above its start,
+                                                 but not past what is in flight
+    drift      a controller driven by fewer   -> after a healthy stretch the limit
+               threads than it has slots         stays near the thread count, so
+                                                 one 429 lowers requests in flight
+    throttled  429 above --capacity in flight -> the limit is cut, every page
+                                                 still arrives (retries), and
+                                                 the limit ends near capacity
+    latency    slows down with load           -> the limit is cut for latency
+    not found  404 for a missing page         -> neither raises nor cuts the limit
+    missing    a crawl with a 404 round       -> that round is skipped, the rest arrive
+    forbidden  403 on every request           -> RecapPage.fetch raises HTTPError
+
+    python scripts/throttle_test.py --pages 60 --capacity 4
+
+Prints the limit history of each scenario; exit code 1 if a check fails.
+'''
+
+import argparse
+import json
+import multiprocessing
+import sys
+import threading
+import time
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import requests  # noqa: E402
+
+from recap import throttle  # noqa: E402
+from recap.crawl import iter_round_recaps  # noqa: E402
+from recap.recap_page import RecapPage, get_header_from_url  # noqa: E402
+from recap.revalidate import VALIDATOR_CACHE  # noqa: E402
+from recap.synthetic import SyntheticConfig, generate_recap_html  # noqa: E402
+from recap.throttle import CONCURRENCY, AdaptiveConcurrency  # noqa: E402
+
+
+class ThrottlingServer:
+    '''
+    Serves pages from memory at /<name>.htm, in its own process so it
+    doesn't share the crawler's GIL (a real server wouldn't). Each response
+    takes base_latency + latency_per_request x (requests in flight); above
+    `capacity` in flight it answers 429 instead, and `status` forces every
+    response to one code (e.g. 403).
+    '''
+
+    def __init__(
+            self,
+            pages: Dict[str, str],
+            capacity: Optional[int] = None,
+            base_latency: float = 0.005,
+            latency_per_request: float = 0.0,
+            status: Optional[int] = None,
+    ):
+        ctx = multiprocessing.get_context("fork")
+        # peak in flight, rejected (429), served
+        self._counters = ctx.Array("i", 3)
+        ports = ctx.Queue()
+        self._process = ctx.Process(
+            target=_serve,
+            args=(pages, capacity, base_latency, latency_per_request, status, self._counters, ports),
+            daemon=True,
+        )
+        self._process.start()
+        self.base = f"http://127.0.0.1:{ports.get(timeout=10)}"
+
+    @property
+    def state(self) -> Dict[str, int]:
+        peak, rejected, served = self._counters[:]
+        return {"peak": peak, "rejected": rejected, "served": served}
+
+    def close(self) -> None:
+        self._process.terminate()
+        self._process.join()
+
+
+def _serve(pages, capacity, base_latency, latency_per_request, status, counters, ports) -> None:
+    pages_bytes = {k: v.encode("utf-8") for k, v in pages.items()}
+    lock = threading.Lock()
+    in_flight = [0]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                in_flight[0] += 1
+                now = in_flight[0]
+                counters[0] = max(counters[0], now)
+            try:
+                if status is not None:
+                    self._reply(status, b"")
+                elif capacity is not None and now > capacity:
+                    with lock:
+                        counters[1] += 1
+                    self._reply(429, b"slow down")
+                else:
+                    time.sleep(base_latency + latency_per_request * now)
+                    body = pages_bytes.get(self.path.lstrip("/"))
+                    with lock:
+                        counters[2] += 1
+                    self._reply(200 if body else 404, body or b"")
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        def _reply(self, code: int, body: bytes) -> None:
+            self.send_response(code)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+def crawl(server: ThrottlingServer, names: List[str], header_cols: List[str], workers: int, initial: int) -> dict:
+    '''Crawls every page cold with the limit reset to `initial`; returns counts + the controller's stats.'''
+    VALIDATOR_CACHE.clear()
+    CONCURRENCY.reset(initial)
+    urls = [f"{server.base}/{name}.htm" for name in names]
+
+    started = time.perf_counter()
+    rows = sum(len(r.full) for r in iter_round_recaps(urls, header_cols, workers=workers))
+    stats = CONCURRENCY.stats_dict()
+    stats.update(pages=len(urls), rows=rows, seconds=round(time.perf_counter() - started, 2),
+                 server_peak=server.state["peak"], server_rejected=server.state["rejected"])
+    return stats
+
+
+def healthy_then_throttled(threads: int, healthy_seconds: float = 0.5, throttled_seconds: float = 0.3) -> dict:
+    '''
+    Drives a fresh controller from `threads` threads, no server: fast
+    successes for healthy_seconds, then one 429, then successes again.
+    Returns the limit just before the cut, the peak in flight before it and
+    the peak over the threads // 2 requests started right after it (the
+    limit climbs back from there).
+    '''
+    controller = AdaptiveConcurrency(initial=2)
+    stop, throttle_now, cut = threading.Event(), threading.Event(), threading.Event()
+    lock = threading.Lock()
+    result = {"threads": threads, "max_limit": controller.max_limit,
+              "limit_before_cut": None, "peak_before_cut": 0, "peak_after_cut": 0}
+    started_after_cut = [0]
+
+    def work() -> None:
+        while not stop.is_set():
+            with controller.slot() as permit:
+                with lock:
+                    if not cut.is_set():
+                        result["peak_before_cut"] = max(result["peak_before_cut"], controller.in_flight)
+                    elif started_after_cut[0] < threads // 2:
+                        started_after_cut[0] += 1
+                        result["peak_after_cut"] = max(result["peak_after_cut"], controller.in_flight)
+                time.sleep(0.002)
+                with lock:
+                    throttled = throttle_now.is_set() and not cut.is_set()
+                    if throttled:
+                        result["limit_before_cut"] = controller.limit
+                        cut.set()
+                permit.record(429 if throttled else 200, latency=0.002)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    time.sleep(healthy_seconds)
+    throttle_now.set()
+    time.sleep(throttled_seconds)
+    stop.set()
+    for t in workers:
+        t.join()
+    result["history"] = [asdict(c) for c in controller.history]
+    return result
+
+
+def report(name: str, stats: dict, checks: Dict[str, bool]) -> bool:
+    history = " ".join(f"{c['limit']}({c['reason']})" for c in stats["history"])
+    print(f"{name}: {stats['pages']} pages, {stats['rows']} rows in {stats['seconds']}s; "
+          f"{CONCURRENCY.summary()}; server peak {stats['server_peak']} in flight")
+    print(f"  history: {history}")
+    for check, ok in checks.items():
+        print(f"  {check}: [{'ok' if ok else 'FAIL'}]")
+    return all(checks.values())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--bands", type=int, default=10, help="bands per synthetic page")
+    parser.add_argument("--capacity", type=int, default=4, help="in-flight requests the throttled server accepts")
+    parser.add_argument("--workers", type=int, default=12)
+    parser.add_argument("--json", help="write every scenario's stats (incl. limit history) here")
+    args = parser.parse_args()
+
+    # Short backoff so the retries don't dominate the run
+    throttle.BACKOFF_BASE = 0.05
+
+    names = [f"round{i:04d}" for i in range(args.pages)]
+    pages = {f"{name}.htm": generate_recap_html(SyntheticConfig(n_bands=args.bands, seed=i))
+             for i, name in enumerate(names)}
+
+    results = {}
+    ok = True
+
+    server = ThrottlingServer(pages)
+    try:
+        header_cols = get_header_from_url(f"{server.base}/{names[0]}.htm")
+        stats = results["healthy"] = crawl(server, names, header_cols, args.workers, initial=2)
+        ok &= report("healthy", stats, {
+            "limit rose above start": max(c["limit"] for c in stats["history"]) > 2,
+            "nothing throttled": stats["throttled"] == 0 and stats["errors"] == 0,
+            "limit no more than one above peak in flight": stats["limit"] <= stats["peak_in_flight"] + 1,
+        })
+
+        CONCURRENCY.reset(2)
+        for _ in range(5):
+            try:
+                throttle.throttled_get(f"{server.base}/missing.htm")
+            except requests.HTTPError:
+                pass
+        stats = results["not_found"] = CONCURRENCY.stats_dict()
+        print(f"not found: {CONCURRENCY.summary()}")
+        checks = {
+            "404s counted as client errors, not successes": stats["client_errors"] == 5 and stats["successes"] == 0,
+            "limit unchanged": [c["limit"] for c in stats["history"]] == [2],
+        }
+        for check, passed in checks.items():
+            print(f"  {check}: [{'ok' if passed else 'FAIL'}]")
+        ok &= all(checks.values())
+
+        VALIDATOR_CACHE.clear()
+        present = names[:5]
+        urls = [f"{server.base}/{name}.htm" for name in present[:2] + ["missing"] + present[2:]]
+        got = [r.round_guid for r in iter_round_recaps(urls, header_cols, workers=args.workers)]
+        print(f"missing: {len(got)} of {len(urls)} rounds")
+        checks = {"missing round skipped, the rest in order": got == present}
+        for check, passed in checks.items():
+            print(f"  {check}: [{'ok' if passed else 'FAIL'}]")
+        ok &= all(checks.values())
+    finally:
+        server.close()
+
+    threads = 6
+    stats = results["drift"] = healthy_then_throttled(threads)
+    print(f"drift: {threads} threads, limit {stats['limit_before_cut']} of max {stats['max_limit']} before the 429; "
+          f"peak {stats['peak_before_cut']} in flight before, {stats['peak_after_cut']} after")
+    history = " ".join(f"{c['limit']}({c['reason']})" for c in stats["history"])
+    print(f"  history: {history}")
+    checks = {
+        "limit held near the thread count": stats["limit_before_cut"] is not None and stats["limit_before_cut"] <= threads + 1,
+        "429 lowered requests in flight": stats["peak_after_cut"] < stats["peak_before_cut"],
+    }
+    for check, passed in checks.items():
+        print(f"  {check}: [{'ok' if passed else 'FAIL'}]")
+    ok &= all(checks.values())
+
+    server = ThrottlingServer(pages, capacity=args.capacity, base_latency=0.1)
+    try:
+        stats = results["throttled"] = crawl(server, names, header_cols, args.workers, initial=args.workers)
+        reasons = {c["reason"] for c in stats["history"]}
+        ok &= report("throttled", stats, {
+            "cut on 429": "429" in reasons,
+            "every page fetched": stats["rows"] == args.pages * args.bands,
+            f"final limit near capacity (<= {args.capacity * 2})": stats["limit"] <= args.capacity * 2,
+        })
+    finally:
+        server.close()
+
+    server = ThrottlingServer(pages, base_latency=0.005, latency_per_request=0.1)
+    try:
+        stats = results["latency"] = crawl(server, names, header_cols, args.workers, initial=args.workers)
+        ok &= report("latency", stats, {
+            "cut on rising latency": any(c["reason"] == "latency" for c in stats["history"]),
+            "every page fetched": stats["rows"] == args.pages * args.bands,
+        })
+    finally:
+        server.close()
+
+    server = ThrottlingServer(pages, status=403)
+    try:
+        CONCURRENCY.reset()
+        error = None
+        try:
+            RecapPage(f"{server.base}/{names[0]}.htm", cache=None).fetch()
+        except requests.HTTPError as e:
+            error = e
+        stats = results["forbidden"] = CONCURRENCY.stats_dict()
+        print(f"forbidden: {CONCURRENCY.summary()}")
+        checks = {
+            "RecapPage.fetch raises HTTPError 403": error is not None and error.response.status_code == 403,
+            f"retried {throttle.MAX_ATTEMPTS} times": stats["throttled"] == throttle.MAX_ATTEMPTS,
+        }
+        for check, passed in checks.items():
+            print(f"  {check}: [{'ok' if passed else 'FAIL'}]")
+        ok &= all(checks.values())
+    finally:
+        server.close()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"wrote {args.json}")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+'''
+recap.validate against real recap rows and synthetic pages.
+
+The real rows are the Music Ensemble columns of UMEA rounds as they
+appear in umea_all_recaps.csv (see Jupyter_Notbooks/umea_normalize.ipynb):
+judges score 0-100 and MusEns_*Tot is their mean x 0.275, published to
+three decimals. Checks that
+
+    real        every real row passes the judges check (ranks are left out:
+                two of the rounds are only partly in the notebook)
+    corrected   a *Tot or judge score knocked off the sheet's ratio is flagged,
+                and only that row is
+    synthetic   a parsed synthetic page passes every check
+
+    python scripts/validate_test.py
+
+Exit code 1 if a check fails.
+'''
+
+import sys
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd  # noqa: E402
+
+from recap.recap_page import RecapPage, TransformHeader  # noqa: E402
+from recap.synthetic import SyntheticConfig, generate_recap_html  # noqa: E402
+from recap.validate import flag_invalid_rows, validate_recaps  # noqa: E402
+
+# school, Musc, Tech, *Tot per round
+REAL_ROUNDS = {
+    '005b6bd8-7bd2-43f5-adc0-e87bd2dd4639': [
+        ('Green Canyon', 93.0, 92.0, 25.438),
+        ('Maple Mountain', 91.0, 90.0, 24.888),
+        ('Alta', 88.0, 86.0, 23.925),
+        ('Salem Hills', 78.0, 77.0, 21.313),
+        ('Viewmont', 74.0, 73.0, 20.213),
+    ],
+    'real-round-2': [
+        ('Brighton', 79.0, 77.0, 21.450),
+        ('Copper Hills', 76.0, 74.0, 20.625),
+    ],
+    'real-round-3': [
+        ('Delta', 65.0, 63.0, 17.600),
+        ('Carbon', 63.0, 58.0, 16.638),
+        ('Canyon View', 60.0, 59.0, 16.363),
+    ],
+}
+
+
+def real_frame() -> pd.DataFrame:
+    rows = []
+    for round_guid, bands in REAL_ROUNDS.items():
+        for school, musc, tech, tot in bands:
+            rows.append({
+                'school': school,
+                'MusEns_Musc_score': musc,
+                'MusEns_Tech_score': tech,
+                'MusEns_*Tot_score': tot,
+                'round_guid': round_guid,
+            })
+    return pd.DataFrame(rows)
+
+
+def synthetic_frame() -> pd.DataFrame:
+    page = RecapPage('synthetic', cache=None)
+    page.feed(generate_recap_html(SyntheticConfig(n_bands=12, seed=3)))
+    header_cols = TransformHeader().update_header(page.parse_header())
+    df = pd.DataFrame(page.parse_scores(first_data_row=6), columns=header_cols)
+    df['round_guid'] = 'synthetic'
+    return df
+
+
+def report(name: str, checks: Dict[str, bool]) -> bool:
+    print(name)
+    for check, ok in checks.items():
+        print(f"  {check}: [{'ok' if ok else 'FAIL'}]")
+    return all(checks.values())
+
+
+def main() -> int:
+    ok = True
+
+    real = validate_recaps(real_frame())
+    ok &= report("real", {
+        "judges check found": "judges:MusEns" in real.flags.columns,
+        "every real row valid": bool(real.valid.all()),
+    })
+
+    corrected = real_frame()
+    corrected.loc[1, 'MusEns_*Tot_score'] = 24.588        # typo in a published *Tot
+    corrected.loc[8, 'MusEns_Tech_score'] = 69.0          # shifted judge score
+    flags = flag_invalid_rows(corrected)
+    ok &= report("corrected", {
+        "bad rows flagged": not flags.loc[1, 'valid'] and not flags.loc[8, 'valid'],
+        "only those rows": int((~flags['valid']).sum()) == 2,
+        "failure names the sub-caption": 'judges:MusEns' in flags.loc[1, 'validation_failures'],
+    })
+
+    synthetic = validate_recaps(synthetic_frame())
+    failing = {k: v for k, v in synthetic.summary().items() if v}
+    ok &= report("synthetic", {
+        f"every synthetic row valid {failing or ''}": bool(synthetic.valid.all()),
+    })
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())